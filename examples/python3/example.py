@@ -8,12 +8,15 @@ A simple example showing:
 Requirements:
 - wt_session.py in the same folder (your updated version that supports unauthenticated use + appId)
 - requests installed
+
+WTSession paces its requests and retries those answered with "Limit exceeded.",
+so the example needs no retry logic of its own.
 """
 
 from getpass import getpass
+import logging
 from pprint import pprint
 import sys
-import time
 
 from wt_session import WTSession
 
@@ -42,28 +45,12 @@ def print_get_person_summary(label: str, result):
     print("Privacy:", person.get("Privacy"))
 
 
-def get_person_with_retry(session: WTSession, key: str, tries: int = 3, sleep_seconds: int = 2):
-    """
-    If the API responds with 'Limit exceeded.', pause briefly and retry.
-    This is only for the demo script to reduce confusion when testing.
-    """
-    last = None
-    for attempt in range(1, tries + 1):
-        last = session.get_person(key)
-        if isinstance(last, list) and last and last[0].get("status") == "Limit exceeded.":
-            if attempt < tries:
-                time.sleep(sleep_seconds)
-                continue
-        break
-    return last
-
-
 def main():
     # Create the WikiTree session object (unauthenticated)
     wt_session = WTSession(app_id=APP_ID)
 
     # 1) Unauthenticated call
-    unauth_result = get_person_with_retry(wt_session, KEY)
+    unauth_result = wt_session.get_person(KEY)
     print_get_person_summary("Unauthenticated get_person('Windsor-1')", unauth_result)
 
     # 2) Optional authentication, then call again
@@ -85,9 +72,10 @@ def main():
 
     print("\nLogged in as:", wt_session.user_name, "(UserID:", wt_session.user_id, ")")
 
-    auth_result = get_person_with_retry(wt_session, KEY)
+    auth_result = wt_session.get_person(KEY)
     print_get_person_summary("Authenticated get_person('Windsor-1')", auth_result)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
     main()
@@ -0,0 +1,58 @@
+"""
+Shared fixtures: the tests run against the offline mock API of wt_mock, so
+they need no network.
+"""
+
+# Standard Imports
+import os
+import sys
+
+# Third party imports
+import pytest
+
+# The example modules are not a package; make them importable.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Local imports
+import wt_async  # noqa: E402
+import wt_session  # noqa: E402
+from wt_mock import MockAPIServer  # noqa: E402
+from wt_session import RateLimiter, WTSession  # noqa: E402
+
+# The synthetic tree the tests run against.
+TREE_SIZE = 3000
+TREE_SEED = 3
+
+# A rate high enough that the rate limiter never holds the tests back.
+FAST_RATE = 100000
+
+
+@pytest.fixture(scope="session")
+def mock_server():
+    """A mock API shared by all the tests."""
+    with MockAPIServer(size=TREE_SIZE, seed=TREE_SEED) as server:
+        yield server
+
+
+@pytest.fixture
+def api_url(mock_server, monkeypatch):
+    """Points the sessions at the mock API, and returns its URL."""
+    monkeypatch.setattr(wt_session, "API_URL", mock_server.url)
+    monkeypatch.setattr(wt_async, "API_URL", mock_server.url)
+    return mock_server.url
+
+
+@pytest.fixture
+def make_session(api_url):
+    """Returns a function creating sessions that talk to the mock API."""
+
+    def make(**kwargs) -> WTSession:
+        kwargs.setdefault("rate_limiter", RateLimiter(rate=FAST_RATE, max_rate=FAST_RATE))
+        return WTSession("wt_tests", **kwargs)
+
+    return make
+
+
+def requests_sent(server) -> int:
+    """Returns the number of requests the mock API has answered."""
+    return sum(server.api.counts.values())
@@ -0,0 +1,51 @@
+"""Tests of wt_async.AsyncWTSession."""
+
+# Standard Imports
+import asyncio
+
+# Local imports
+from conftest import FAST_RATE, requests_sent
+from wt_async import AsyncWTSession
+from wt_session import RateLimiter
+
+KEYS = [1, 2, 3, 4, 5]
+
+
+def _session(**kwargs) -> AsyncWTSession:
+    return AsyncWTSession(
+        "wt_tests", rate_limiter=RateLimiter(rate=FAST_RATE, max_rate=FAST_RATE), **kwargs
+    )
+
+
+def test_queries_match_the_blocking_session(make_session, api_url):
+    async def fetch():
+        async with _session(max_concurrency=3) as session:
+            people = await asyncio.gather(*(session.get_person(key) for key in KEYS))
+            return people, await session.get_people(KEYS, fields="Id,Name", ancestors=1)
+
+    people, relatives = asyncio.run(fetch())
+    session = make_session()
+    assert people == [session.get_person(key) for key in KEYS]
+    assert relatives == session.get_people(KEYS, fields="Id,Name", ancestors=1)
+
+
+def test_gathered_calls_are_coalesced(api_url, mock_server):
+    async def fetch():
+        async with _session(coalesce_window=0.05) as session:
+            return await asyncio.gather(*(session.get_person(key, fields="Id") for key in KEYS))
+
+    sent = requests_sent(mock_server)
+    people = asyncio.run(fetch())
+    assert [result[0]["person"]["Id"] for result in people] == KEYS
+    assert requests_sent(mock_server) == sent + 1
+
+
+def test_logged_in_calls(api_url):
+    async def fetch():
+        async with _session() as session:
+            assert await session.get_watchlist(limit=5) == {}
+            assert await session.authenticate("user@example.com", "secret")
+            return await session.get_watchlist(limit=5)
+
+    result = asyncio.run(fetch())
+    assert len(result[0]["watchlist"]) == 5
@@ -0,0 +1,65 @@
+"""Tests of wt_cache.ResponseCache."""
+
+# Local imports
+from conftest import requests_sent
+from wt_cache import ResponseCache
+
+
+class Clock:
+    """A clock the tests move by hand."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_repeated_queries_are_answered_from_memory(make_session, mock_server):
+    cache = ResponseCache()
+    session = make_session(cache=cache)
+    first = session.get_people([1, 2], fields="Id,Name")
+    sent = requests_sent(mock_server)
+    assert session.get_people([2, 1], fields="Name,Id") == first
+    assert requests_sent(mock_server) == sent
+    assert cache.stats.hits == 1 and cache.stats.entries == 1
+
+
+def test_entries_expire(make_session, mock_server):
+    clock = Clock()
+    session = make_session(cache=ResponseCache(ttl=10, action_ttl={}, clock=clock))
+    session.get_person(1)
+    clock.now = 9
+    sent = requests_sent(mock_server)
+    session.get_person(1)
+    assert requests_sent(mock_server) == sent
+    clock.now = 10
+    session.get_person(1)
+    assert requests_sent(mock_server) == sent + 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    for key in (1, 2):
+        cache.put({"action": "getPerson", "key": key}, b"[1]")
+    assert cache.get({"action": "getPerson", "key": 1}) == b"[1]"
+    cache.put({"action": "getPerson", "key": 3}, b"[3]")
+    assert cache.get({"action": "getPerson", "key": 2}) is None
+    cache.put({"action": "getPerson", "key": 4}, b"[4444444]")
+    assert cache.get({"action": "getPerson", "key": 1}) is None
+    assert cache.stats.evictions == 3 and cache.stats.entries == 1
+
+
+def test_logins_and_viewers_are_kept_apart():
+    cache = ResponseCache()
+    cache.put({"action": "clientLogin", "checkLogin": 1}, b"{}")
+    assert cache.get({"action": "clientLogin", "checkLogin": 1}) is None
+    cache.put({"action": "getWatchlist"}, b"[]", viewer="1")
+    assert cache.get({"action": "getWatchlist"}, viewer="2") is None
+    assert cache.get({"action": "getWatchlist"}, viewer="1") == b"[]"
+
+
+def test_the_order_of_connection_keys_matters():
+    cache = ResponseCache()
+    cache.put({"action": "getConnections", "keys": "1,2"}, b"[]")
+    assert cache.get({"action": "getConnections", "keys": "2,1"}) is None
@@ -0,0 +1,88 @@
+"""Tests of wt_cassette record and replay."""
+
+# Third party imports
+import pytest
+
+# Local imports
+from conftest import FAST_RATE
+from wt_cassette import (
+    CASSETTE_MAGIC,
+    CassetteError,
+    CassetteMissError,
+    RecordingTransport,
+    ReplayTransport,
+)
+from wt_session import RateLimiter, WTSession
+
+
+def _calls(session):
+    return [
+        session.get_person(42, fields="Id,Name"),
+        session.get_people(["5", "3", "9"], fields="Id,Name", ancestors=2),
+        # The same request with the keys and fields in another order.
+        session.get_people(["9", "5", "3"], fields="Name,Id", ancestors=2),
+        session.get_person(7, fields="Id,Name,BirthDate"),
+    ]
+
+
+@pytest.fixture
+def cassette(make_session, tmp_path):
+    """Records _calls against the mock API, and returns the cassette and results."""
+    path = str(tmp_path / "calls.cassette")
+    with RecordingTransport(path) as transport:
+        recorded = _calls(make_session(transport=transport))
+    return path, recorded
+
+
+def _replay_session(transport):
+    return WTSession(
+        "wt_tests",
+        rate_limiter=RateLimiter(rate=FAST_RATE, max_rate=FAST_RATE),
+        transport=transport,
+    )
+
+
+def test_replay_returns_the_recorded_answers(cassette):
+    path, recorded = cassette
+    with ReplayTransport(path) as transport:
+        assert _calls(_replay_session(transport)) == recorded
+
+
+def test_requests_not_recorded_are_misses(cassette):
+    path, _ = cassette
+    with ReplayTransport(path) as transport:
+        with pytest.raises(CassetteMissError):
+            _replay_session(transport).get_person(43, fields="Id,Name")
+
+
+@pytest.mark.parametrize("size", [0, 3])
+def test_files_too_short_are_not_cassettes(tmp_path, size):
+    path = str(tmp_path / "short.cassette")
+    with open(path, "wb") as file:
+        file.write(CASSETTE_MAGIC[:size])
+    with pytest.raises(CassetteError):
+        ReplayTransport(path)
+
+
+def test_cut_short_cassettes_are_scanned(cassette, tmp_path):
+    path, recorded = cassette
+    with open(path, "rb") as file:
+        data = file.read()
+    with ReplayTransport(path) as transport:
+        complete = len(transport)
+
+    counts = []
+    for size in (len(CASSETTE_MAGIC), len(CASSETTE_MAGIC) + 4, 40, len(data) // 2, len(data) - 1):
+        cut = str(tmp_path / f"cut-{size}.cassette")
+        with open(cut, "wb") as file:
+            file.write(data[:size])
+        with ReplayTransport(cut) as transport:
+            counts.append(len(transport))
+    assert counts[:3] == [0, 0, 0]
+    assert counts == sorted(counts)
+    # Only the index was cut off the last one.
+    assert counts[-1] == complete
+
+    # The records that made it are replayed.
+    with ReplayTransport(cut) as transport:
+        assert _calls(_replay_session(transport)) == recorded
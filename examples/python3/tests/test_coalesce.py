@@ -0,0 +1,53 @@
+"""Tests of the coalescing of get_person/get_profile calls into getPeople."""
+
+# Standard Imports
+from concurrent.futures import ThreadPoolExecutor
+
+# The fields asked for, which getPeople can answer.
+FIELDS = "Id,Name,BirthDate"
+
+
+def _counts(server) -> dict:
+    return dict(server.api.counts)
+
+
+def _sent(server, before: dict) -> dict:
+    return {
+        action: count - before.get(action, 0)
+        for action, count in server.api.counts.items()
+        if count != before.get(action, 0)
+    }
+
+
+def test_concurrent_calls_make_one_get_people(make_session, mock_server):
+    # getProfile takes Page IDs, so only WikiTree IDs can be coalesced for both.
+    keys = [mock_server.api.tree.name(person_id) for person_id in range(1, 5)]
+    plain = make_session()
+    session = make_session(coalesce_window=0.05)
+    for method in ("get_person", "get_profile"):
+        expected = [getattr(plain, method)(key, fields=FIELDS) for key in keys]
+        before = _counts(mock_server)
+        with ThreadPoolExecutor(len(keys)) as executor:
+            call = getattr(session, method)
+            results = list(executor.map(lambda key, call=call: call(key, fields=FIELDS), keys))
+        assert _sent(mock_server, before) == {"getPeople": 1}
+        assert results == expected
+
+
+def test_each_caller_gets_its_own_status(make_session):
+    session = make_session(coalesce_window=0.05)
+    with ThreadPoolExecutor(2) as executor:
+        found, missing = executor.map(
+            lambda key: session.get_person(key, fields=FIELDS), [5, 999999]
+        )
+    assert found[0]["status"] == 0 and found[0]["person"]["Id"] == 5
+    assert missing[0]["status"] and "person" not in missing[0]
+
+
+def test_calls_getpeople_cannot_answer_are_sent_alone(make_session, mock_server):
+    session = make_session(coalesce_window=0.05)
+    before = _counts(mock_server)
+    session.get_person(1)
+    session.get_person(1, fields="Id,Parents")
+    session.get_profile(1000001, fields="Id")
+    assert _sent(mock_server, before) == {"getPerson": 2, "getProfile": 1}
@@ -0,0 +1,99 @@
+"""Tests of wt_columns.ProfileColumns."""
+
+# Third party imports
+import pytest
+
+# Local imports
+from conftest import TREE_SIZE
+from wt_columns import COLUMN_FIELDS, NO_INDEX, NO_PERSON, ProfileColumns, split_date
+from wt_graph import GENDER_FEMALE, GENDER_MALE, GENDER_UNKNOWN
+
+numpy = pytest.importorskip("numpy")
+
+PROFILES = [
+    {"Id": 1, "Gender": "Male", "BirthDate": "1800-06-15", "DeathDate": "1850-06-14"},
+    {"Id": 2, "Gender": "Female", "BirthDate": "1805-00-00", "DeathDate": "1870-03-00"},
+    {"Id": 3, "Gender": "Male", "Father": 1, "Mother": "2", "BirthDate": "1830-02-01",
+     "DeathDate": "0000-00-00", "Privacy": "60"},
+    {"Id": 4, "Father": 3, "Mother": 99, "BirthDate": "1860"},
+]
+
+
+def test_split_date():
+    assert split_date("1850-06-14") == (1850, 6, 14)
+    assert split_date("1850-00-00") == (1850, 0, 0)
+    assert split_date("1850") == (1850, 0, 0)
+    assert split_date("0000-00-00") == (0, 0, 0)
+    assert split_date(None) == (0, 0, 0)
+
+
+def test_columns_from_profiles():
+    columns = ProfileColumns.from_profiles([{"people": {"1": PROFILES[0]}}, PROFILES[1:]])
+    assert len(columns) == 4
+    assert columns.id.tolist() == [1, 2, 3, 4]
+    assert columns.father.tolist() == [NO_PERSON, NO_PERSON, 1, 3]
+    assert columns.mother.tolist() == [NO_PERSON, NO_PERSON, 2, 99]
+    assert columns.gender.tolist() == [GENDER_MALE, GENDER_FEMALE, GENDER_MALE, GENDER_UNKNOWN]
+    assert columns.privacy.tolist() == [0, 0, 60, 0]
+    assert columns.birth_known.tolist() == [True] * 4
+    assert columns.birth_month_known.tolist() == [True, False, True, False]
+    assert columns.death_known.tolist() == [True, True, False, False]
+    assert columns.death_day_known.tolist() == [True, False, False, False]
+
+
+def test_lifespan_and_generation_gap():
+    columns = ProfileColumns.from_profiles(PROFILES)
+    lifespan = columns.lifespan()
+    # One day short of the 50th birthday; without a birth month, the years.
+    assert lifespan[:2].tolist() == [49, 65]
+    assert numpy.isnan(lifespan[2:]).all()
+
+    gap = columns.generation_gap("father")
+    assert numpy.isnan(gap[:2]).all() and gap[2:].tolist() == [30, 30]
+    gap = columns.generation_gap("mother")
+    assert gap[2] == 25 and numpy.isnan(gap[3])
+    with pytest.raises(ValueError):
+        columns.parent_rows("uncle")
+
+
+def test_index_of_and_take():
+    columns = ProfileColumns.from_profiles(PROFILES[::-1])
+    assert columns.index_of([1, 4, 5]).tolist() == [3, 0, NO_INDEX]
+    assert columns.parent_rows("mother").tolist() == [NO_INDEX, 2, NO_INDEX, NO_INDEX]
+
+    born = columns.take(columns.born_between(1801, 1860))
+    assert sorted(born.id.tolist()) == [2, 3, 4]
+    assert columns.id[columns.died_between(1850, 1860)].tolist() == [1]
+    assert sorted(columns.id[columns.living_in(1860)].tolist()) == [2, 3, 4]
+    empty = columns.take(columns.id < 0)
+    assert len(empty) == 0 and empty.index_of([1]).tolist() == [NO_INDEX]
+
+
+def test_generations_match_the_ancestors(make_session):
+    session = make_session()
+    root = TREE_SIZE
+    ancestors = session.get_ancestors(root, depth=4, fields=COLUMN_FIELDS)[0]["ancestors"]
+    columns = ProfileColumns.from_profiles(ancestors)
+
+    # The nearest generation of each ancestor, walking the parents in Python.
+    by_id = {profile["Id"]: profile for profile in ancestors}
+    expected = {root: 0}
+    frontier = [root]
+    for depth in range(1, 5):
+        parents = [
+            int(by_id[person_id].get(parent) or 0)
+            for person_id in frontier
+            for parent in ("Father", "Mother")
+        ]
+        frontier = [parent for parent in parents if parent in by_id and parent not in expected]
+        expected.update((parent, depth) for parent in frontier)
+    assert len(expected) > 4
+
+    generation = columns.generations(root)
+    assert dict(zip(columns.id.tolist(), generation.tolist())) == {
+        person_id: expected.get(person_id, -1) for person_id in by_id
+    }
+    limited = columns.generations(root, max_depth=1)
+    assert sorted(columns.id[limited >= 0].tolist()) == sorted(
+        person_id for person_id, depth in expected.items() if depth <= 1
+    )
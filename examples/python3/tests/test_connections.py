@@ -0,0 +1,55 @@
+"""Tests of WTSession.get_connections_many."""
+
+# Standard Imports
+import asyncio
+
+# Local imports
+from conftest import FAST_RATE
+from wt_async import AsyncWTSession
+from wt_session import INVERSE_PATH_TYPES, RateLimiter
+
+PAIRS = [(2999, 2990), (2990, 2999), (2999, 2990), (2995, 2980), (2980, 2980)]
+
+
+def _connections_sent(server) -> int:
+    return server.api.counts.get("getConnections", 0)
+
+
+def test_each_pair_is_asked_for_once(make_session, mock_server):
+    session = make_session()
+    sent = _connections_sent(mock_server)
+    results = list(session.get_connections_many(PAIRS, ordered=True))
+    assert _connections_sent(mock_server) == sent + 3
+    assert [result.key for result in results] == PAIRS
+    for result in results:
+        assert result.ok
+        key1, key2 = result.key
+        direct = session.get_connections(key1, key2, nopath=True)[0]
+        assert result.result[0]["pathLength"] == direct["pathLength"]
+        assert (result.result[0]["userid1"], result.result[0]["userid2"]) == (key1, key2)
+
+
+def test_reversed_paths_are_turned_around(make_session):
+    results = {
+        result.key: result.result[0]["path"]
+        for result in make_session().get_connections_many(PAIRS[:2], nopath=False)
+    }
+    forward, backward = results[PAIRS[0]], results[PAIRS[1]]
+    assert len(forward) > 1
+    assert [entry["Id"] for entry in backward] == [entry["Id"] for entry in reversed(forward)]
+    for step, reversed_step in zip(forward[1:], reversed(backward[1:])):
+        assert reversed_step["pathType"] == INVERSE_PATH_TYPES[step["pathType"]]
+
+
+def test_async_pairs(make_session, api_url, mock_server):
+    async def fetch():
+        async with AsyncWTSession(
+            "wt_tests", rate_limiter=RateLimiter(rate=FAST_RATE, max_rate=FAST_RATE)
+        ) as session:
+            return [result async for result in session.get_connections_many(PAIRS)]
+
+    sent = _connections_sent(mock_server)
+    results = asyncio.run(fetch())
+    assert _connections_sent(mock_server) == sent + 3
+    expected = {result.key: result.result for result in make_session().get_connections_many(PAIRS)}
+    assert {result.key: result.result for result in results} == expected
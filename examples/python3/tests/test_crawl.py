@@ -0,0 +1,140 @@
+"""Tests of wt_crawl.Crawler and SharedRateLimiter."""
+
+# Standard Imports
+import multiprocessing
+import sqlite3
+
+# Third party imports
+import pytest
+
+# Local imports
+import wt_session
+from conftest import FAST_RATE, TREE_SEED, TREE_SIZE
+from wt_crawl import DONE, LEASED, PENDING, CrawlError, Crawler, SharedRateLimiter, _get_people
+from wt_mock import MockAPIServer
+from wt_session import RateLimiter, WTSession
+from wt_store import ProfileStore
+
+# The starting profiles: founders of the synthetic tree.
+SEEDS = [1, 2, 3, 4]
+
+# The Crawler options of every test crawl.
+OPTIONS = {
+    "app_id": "wt_tests",
+    "direction": "descendants",
+    "processes": 2,
+    "rate": FAST_RATE,
+    "batch_size": 20,
+    "max_depth": 3,
+}
+
+
+def _done(path):
+    """Returns the Ids done in the crawl at path."""
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute("SELECT id FROM frontier WHERE state = ?", (DONE,))
+        return {row[0] for row in rows}
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def full_crawl(api_url, tmp_path):
+    """The Ids done by a crawl that was never interrupted."""
+    path = str(tmp_path / "full.sqlite")
+    with Crawler(path, **OPTIONS) as crawler:
+        crawler.seed(SEEDS)
+        crawler.run()
+        assert crawler.progress()["pending"] == 0
+    return _done(path)
+
+
+def test_interrupted_crawl_resumes_exactly(full_crawl, tmp_path):
+    path = str(tmp_path / "crawl.sqlite")
+    with Crawler(path, **OPTIONS) as crawler:
+        crawler.seed(SEEDS)
+        stats = crawler.run(max_batches=3)
+        assert stats.batches == 3
+        assert crawler.progress()["pending"] > 0
+
+    # A crash leaves leased Ids behind; they are fetched again on resuming.
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute(
+            "UPDATE frontier SET state = ? WHERE id IN "
+            "(SELECT id FROM frontier WHERE state = ? LIMIT 5)",
+            (LEASED, PENDING),
+        )
+    connection.close()
+
+    with Crawler(path, **OPTIONS) as crawler:
+        assert crawler.progress()["leased"] == 0
+        crawler.run()
+        assert crawler.progress()["pending"] == 0
+    assert _done(path) == full_crawl
+
+    store = ProfileStore(path)
+    try:
+        found, missing = store.get(sorted(full_crawl))
+        assert not missing
+        assert len(found) == len(full_crawl)
+    finally:
+        store.close()
+
+
+def test_a_crawl_keeps_its_direction(api_url, tmp_path):
+    path = str(tmp_path / "crawl.sqlite")
+    Crawler(path, **OPTIONS).close()
+    with pytest.raises(CrawlError):
+        Crawler(path, **dict(OPTIONS, direction="ancestors"))
+
+
+def test_one_crawler_per_file(api_url, tmp_path):
+    path = str(tmp_path / "crawl.sqlite")
+    with Crawler(path, **OPTIONS):
+        with pytest.raises(CrawlError):
+            Crawler(path, **OPTIONS)
+
+
+def test_batches_are_fetched_page_by_page(make_session):
+    session = make_session()
+    # All the founders' descendants: more than one page of them.
+    keys = list(range(1, 7))
+    relation = {"descendants": 30}
+    result_by_key, people = _get_people(session, keys, "Id", relation)
+    assert sorted(result_by_key) == [str(key) for key in keys]
+    expected = {
+        str(profile["Id"]) for profile in session.iter_people(keys, fields="Id", **relation)
+    }
+    assert len(expected) > 2000 and set(people) == expected
+
+
+def test_a_failed_later_page_fails_the_batch(monkeypatch):
+    monkeypatch.setattr(wt_session, "retry_delay", lambda attempt: 0.0)
+    # The second page goes over the mock's rate limit.
+    with MockAPIServer(TREE_SIZE, TREE_SEED, rate_limit=1) as server:
+        monkeypatch.setattr(wt_session, "API_URL", server.url)
+        session = WTSession(
+            "wt_tests", rate_limiter=RateLimiter(rate=FAST_RATE, max_rate=FAST_RATE), retries=0
+        )
+        assert _get_people(session, list(range(1, 7)), "Id", {"descendants": 30}) == ({}, {})
+        assert server.api.counts["getPeople"] == 2
+
+
+def _take_tokens(limiter, count):
+    for _ in range(count):
+        limiter.reserve()
+
+
+@pytest.mark.parametrize("start_method", ["fork", "spawn"])
+def test_the_rate_budget_is_shared_by_processes(start_method):
+    context = multiprocessing.get_context(start_method)
+    limiter = SharedRateLimiter(rate=1.0, max_rate=1.0, context=context)
+    process = context.Process(target=_take_tokens, args=(limiter, 5))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    # The other process took 5 tokens at 1 per second, so ours is at least
+    # 4 seconds away (a few may have refilled in the meantime).
+    assert limiter.reserve() > 3.0
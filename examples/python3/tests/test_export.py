@@ -0,0 +1,90 @@
+"""Tests of wt_export."""
+
+# Standard Imports
+import json
+
+# Third party imports
+import pytest
+
+# Local imports
+from wt_export import ArrowExporter, NDJSONExporter, ParquetExporter, export_profiles
+from wt_records import RecordSet
+
+# The fields the tests export.
+FIELDS = "Id,Name,BirthDate,Father,Mother,Privacy_IsOpen"
+
+
+def read_ndjson(path) -> list:
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def test_ndjson_round_trip(make_session, tmp_path):
+    session = make_session()
+    keys = list(range(1, 41))
+    people = session.get_people(keys, fields=FIELDS)[0]["people"]
+
+    path = tmp_path / "people.ndjson"
+    assert export_profiles(session.iter_people(keys, fields=FIELDS), str(path)) == 40
+    assert {str(profile["Id"]): profile for profile in read_ndjson(path)} == people
+
+
+def test_iterator_of_pages_is_exported_once(make_session, tmp_path):
+    session = make_session()
+    pages = session.get_people(range(1, 11), fields=FIELDS) * 2
+    path = tmp_path / "people.ndjson"
+    with NDJSONExporter(str(path), fields=["Id", "Name"]) as exporter:
+        assert exporter.write_all(iter(pages)) == 20
+    profiles = read_ndjson(path)
+    assert len(profiles) == 20 and all(sorted(profile) == ["Id", "Name"] for profile in profiles)
+
+
+def test_search_results_are_exported(make_session, mock_server, tmp_path):
+    session = make_session()
+    last_name = mock_server.api.tree.name(1).rpartition("-")[0]
+    result = session.search_person(LastName=last_name, fields="Id,Name", limit=25)
+    matches = result[0]["matches"]
+    assert matches
+
+    path = tmp_path / "search.ndjson"
+    assert export_profiles(result, str(path)) == len(matches)
+    assert read_ndjson(path) == matches
+
+
+def test_parquet_row_groups_and_fields(make_session, tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    session = make_session()
+    path = str(tmp_path / "people.parquet")
+    with ParquetExporter(path, fields=FIELDS.split(","), row_group_size=16) as exporter:
+        exporter.write_all(session.iter_people(range(1, 51), fields=FIELDS))
+
+    file = parquet.ParquetFile(path)
+    assert file.metadata.num_rows == 50
+    assert file.metadata.num_row_groups == 4
+    table = file.read()
+    assert sorted(table.column_names) == sorted(FIELDS.split(","))
+    assert str(table.schema.field("Id").type) == "int64"
+    assert str(table.schema.field("Privacy_IsOpen").type) == "bool"
+    assert sorted(table.column("Id").to_pylist()) == list(range(1, 51))
+
+
+def test_arrow_export_of_person_records(make_session, tmp_path):
+    ipc = pytest.importorskip("pyarrow.ipc")
+    session = make_session()
+    records = RecordSet()
+    persons = [records.add(profile) for profile in session.iter_people(range(1, 6), fields=FIELDS)]
+
+    path = str(tmp_path / "people.arrow")
+    assert export_profiles(persons, path, fields=["Id", "Name", "Mother"]) == 5
+    with ipc.open_file(path) as reader:
+        table = reader.read_all()
+    assert table.column_names == ["Id", "Name", "Mother"]
+    rows = {row["Id"]: row for row in table.to_pylist()}
+    for person in persons:
+        assert rows[person.id]["Name"] == person["Name"]
+        assert rows[person.id]["Mother"] == int(person["Mother"])
+
+
+def test_unknown_format_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        export_profiles([], str(tmp_path / "people.csv"), export_format="csv")
@@ -0,0 +1,54 @@
+"""Tests of wt_fields.FieldPlan."""
+
+# Standard Imports
+import json
+
+# Local imports
+from wt_fields import FieldPlan
+from wt_records import RecordSet
+
+
+def test_calls_without_fields_are_narrowed(make_session):
+    session = make_session(field_plan=FieldPlan(["BirthDate", "Parents"]))
+    assert set(session.get_person(1)[0]["person"]) == {"Id", "Name", "BirthDate", "Parents"}
+    people = session.get_people([1, 2])[0]["people"]
+    assert all(set(person) == {"Id", "Name", "BirthDate"} for person in people.values())
+    assert set(session.get_person(1, fields="Gender")[0]["person"]) == {"Gender"}
+
+
+def test_a_recorded_plan_keeps_the_fields_read(make_session):
+    plan = FieldPlan.recording()
+    session = make_session(field_plan=plan)
+    person = session.get_person(1)[0]["person"]
+    assert len(person) > 10
+    assert person["BirthDate"] and "DeathDate" in person
+    plan.freeze()
+    assert plan.fields == {"BirthDate", "DeathDate"}
+    assert set(session.get_person(1)[0]["person"]) == {"Id", "Name", "DeathDate", "BirthDate"}
+
+
+def test_records_made_while_recording_keep_every_field(make_session):
+    plan = FieldPlan.recording()
+    session = make_session(field_plan=plan)
+    records = RecordSet()
+    records.ingest(session.get_person(1))
+    plan.freeze()
+    fresh = RecordSet()
+    fresh.ingest(session.get_person(1))
+    assert fresh[1].to_dict() == records[1].to_dict()
+
+
+def test_copies_and_dumps_read_every_field():
+    for read in (dict, json.dumps, list, lambda profile: profile.items()):
+        plan = FieldPlan.recording()
+        read(plan.wrap([{"Id": 1, "Name": "Vogel-1", "Parents": {}}])[0])
+        assert plan.fields == {"Id", "Name", "Parents"}
+
+
+def test_a_plan_is_saved_and_loaded(tmp_path):
+    plan = FieldPlan(["BirthDate"], actions=["getPeople"])
+    plan.save(str(tmp_path / "plan.json"))
+    loaded = FieldPlan.load(str(tmp_path / "plan.json"))
+    assert loaded.fields == plan.fields
+    assert loaded.fields_for("getPeople") == "BirthDate,Id,Name"
+    assert loaded.fields_for("getPerson") is None
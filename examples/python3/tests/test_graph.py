@@ -0,0 +1,55 @@
+"""Tests of wt_graph.FamilyGraph."""
+
+# Local imports
+from wt_graph import FamilyGraph
+
+
+def _children(graph, key):
+    return [graph.id(child) for child in graph.children(graph.index_of(key))]
+
+
+def test_nested_children_are_linked_by_gender():
+    graph = FamilyGraph()
+    graph.add_person(
+        {"Id": 1, "Gender": "Male", "Children": {"2": {"Id": 2}, "3": {"Id": 3}}, "Spouses": {}}
+    )
+    assert sorted(_children(graph, 1)) == [2, 3]
+    assert graph.is_complete(graph.index_of(1))
+
+
+def test_unlinked_children_do_not_make_a_node_complete():
+    graph = FamilyGraph()
+    graph.add_person({"Id": 1, "Children": {"2": {"Id": 2}}, "Spouses": {}})
+    assert _children(graph, 1) == []
+    assert not graph.is_complete(graph.index_of(1))
+
+
+def test_children_keep_their_own_parents():
+    graph = FamilyGraph()
+    graph.add_person(
+        {
+            "Id": 1,
+            "Gender": "Female",
+            "Children": {"2": {"Id": 2, "Father": 5, "Mother": 1}},
+            "Spouses": {},
+        }
+    )
+    child = graph.index_of(2)
+    assert graph.id(graph.father(child)) == 5
+    assert graph.id(graph.mother(child)) == 1
+    assert graph.is_complete(graph.index_of(1))
+
+
+def test_a_child_of_someone_else_is_not_linked():
+    graph = FamilyGraph()
+    graph.add_person(
+        {"Id": 1, "Gender": "Male", "Children": {"2": {"Id": 2, "Father": 7}}, "Spouses": {}}
+    )
+    assert _children(graph, 1) == []
+    assert not graph.is_complete(graph.index_of(1))
+
+
+def test_missing_spouses_leave_a_node_incomplete():
+    graph = FamilyGraph()
+    graph.add_person({"Id": 1, "Gender": "Male", "Children": {"2": {"Id": 2}}})
+    assert not graph.is_complete(graph.index_of(1))
@@ -0,0 +1,169 @@
+"""Tests of wt_login.SharedLogin."""
+
+# Standard Imports
+import asyncio
+import os
+import time
+
+# Third party imports
+import pytest
+
+# Local imports
+from conftest import FAST_RATE, TREE_SEED, TREE_SIZE
+import wt_async
+import wt_session
+from wt_async import AsyncWTSession
+from wt_login import LoginFile, SharedLogin
+from wt_mock import MockAPIServer
+from wt_session import RateLimiter, WTSession
+
+EMAIL = "tester@example.com"
+PASSWORD = "secret"
+
+# Seconds a login lasts on the mock API.
+SESSION_TTL = 0.3
+
+
+@pytest.fixture
+def expiring_server(monkeypatch):
+    """A mock API whose logins expire after SESSION_TTL seconds."""
+    with MockAPIServer(size=TREE_SIZE, seed=TREE_SEED, session_ttl=SESSION_TTL) as server:
+        monkeypatch.setattr(wt_session, "API_URL", server.url)
+        monkeypatch.setattr(wt_async, "API_URL", server.url)
+        yield server
+
+
+class Clock:
+    """A clock the tests move forward by hand."""
+
+    def __init__(self) -> None:
+        self.now = 1000000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _session(login):
+    return WTSession(
+        "wt_tests", rate_limiter=RateLimiter(rate=FAST_RATE, max_rate=FAST_RATE), login=login
+    )
+
+
+def _watchlist_ok(session) -> bool:
+    result = session.get_watchlist(limit=1, fields="Id")
+    return bool(result) and "watchlistCount" in result[0]
+
+
+def test_processes_share_one_login(expiring_server, tmp_path):
+    path = str(tmp_path / "login.json")
+    first = SharedLogin(LoginFile(path), EMAIL, PASSWORD)
+    second = SharedLogin(LoginFile(path), EMAIL, PASSWORD)
+    assert _watchlist_ok(_session(first))
+    assert _watchlist_ok(_session(second))
+    assert (first.logins, second.logins) == (1, 0)
+    assert expiring_server.api.logins == 1
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_an_old_login_is_not_used(expiring_server, tmp_path):
+    clock = Clock()
+    login = SharedLogin(
+        LoginFile(str(tmp_path / "login.json")),
+        EMAIL,
+        lambda: PASSWORD,
+        check_interval=None,
+        max_age=60,
+        clock=clock,
+    )
+    session = _session(login)
+    assert _watchlist_ok(session)
+    clock.now += 30
+    assert _watchlist_ok(session)
+    assert login.logins == 1
+    clock.now += 31
+    assert _watchlist_ok(session)
+    assert login.logins == 2
+
+
+def test_a_call_is_retried_after_the_login_ended(expiring_server, tmp_path):
+    login = SharedLogin(
+        LoginFile(str(tmp_path / "login.json")), EMAIL, PASSWORD, check_interval=None
+    )
+    session = _session(login)
+    assert _watchlist_ok(session)
+    time.sleep(SESSION_TTL + 0.1)
+    assert _watchlist_ok(session)
+    assert login.logins == 2
+    assert expiring_server.api.logins == 2
+
+
+def test_a_due_check_renews_an_ended_login(expiring_server, tmp_path):
+    clock = Clock()
+    login = SharedLogin(
+        LoginFile(str(tmp_path / "login.json")), EMAIL, PASSWORD, check_interval=10, clock=clock
+    )
+    session = _session(login)
+    assert _watchlist_ok(session)
+    time.sleep(SESSION_TTL + 0.1)
+    clock.now += 11
+    assert _watchlist_ok(session)
+    assert login.logins == 2
+
+
+def test_a_login_file_others_can_read_is_ignored(expiring_server, tmp_path):
+    path = str(tmp_path / "login.json")
+    assert _watchlist_ok(_session(SharedLogin(LoginFile(path), EMAIL, PASSWORD)))
+    assert LoginFile(path).load() is not None
+    os.chmod(path, 0o644)
+    assert LoginFile(path).load() is None
+
+
+def _async_session() -> AsyncWTSession:
+    return AsyncWTSession("wt_tests", rate_limiter=RateLimiter(rate=FAST_RATE, max_rate=FAST_RATE))
+
+
+def test_logins_move_between_blocking_and_async_sessions(expiring_server):
+    session = _session(None)
+    assert session.authenticate(EMAIL, PASSWORD)
+    state = session.export_login()
+
+    async def use_login():
+        async with _async_session() as async_session:
+            assert async_session.export_login() is None
+            assert not await async_session.check_login()
+            async_session.import_login(state)
+            assert await async_session.check_login()
+            result = await async_session.get_watchlist(limit=1, fields="Id")
+            return result, async_session.export_login()
+
+    result, exported = asyncio.run(use_login())
+    assert "watchlistCount" in result[0]
+    assert expiring_server.api.logins == 1
+    assert {cookie["name"]: cookie["value"] for cookie in exported["cookies"]} == {
+        cookie["name"]: cookie["value"] for cookie in state["cookies"]
+    }
+
+    other = _session(None)
+    other.import_login(exported)
+    assert other.check_login() and _watchlist_ok(other)
+    time.sleep(SESSION_TTL + 0.1)
+    assert not other.check_login()
+
+
+def test_an_async_login_outlives_its_connections(expiring_server, tmp_path):
+    async def log_in():
+        session = _async_session()
+        assert await session.authenticate(EMAIL, PASSWORD)
+        await session.close()
+        # The aiohttp session is created again, with the login cookies.
+        assert await session.check_login()
+        await session.close()
+        return session
+
+    session = asyncio.run(log_in())
+    path = str(tmp_path / "login.json")
+    LoginFile(path).save(dict(session.export_login(), email=EMAIL, saved=time.time()))
+
+    login = SharedLogin(LoginFile(path), EMAIL, PASSWORD, check_interval=None)
+    assert _watchlist_ok(_session(login))
+    assert login.logins == 0 and expiring_server.api.logins == 1
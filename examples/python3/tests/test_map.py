@@ -0,0 +1,58 @@
+"""Tests of WTSession.map."""
+
+# Standard Imports
+import asyncio
+
+# Third party imports
+import pytest
+
+# Local imports
+from conftest import FAST_RATE
+from wt_async import AsyncWTSession
+from wt_session import RateLimiter
+
+KEYS = list(range(1, 31))
+
+
+def test_results_follow_the_keys(make_session):
+    progress = []
+
+    def report(done, total):
+        progress.append((done, total))
+
+    session = make_session()
+    results = list(session.map("get_person", KEYS, max_workers=4, progress=report, fields="Id"))
+    assert [result.key for result in results] == KEYS
+    assert all(result.ok and result.result[0]["person"]["Id"] == result.key for result in results)
+    assert progress[-1] == (len(KEYS), len(KEYS))
+
+
+def test_unordered_results_and_failures(make_session):
+    results = list(
+        make_session().map("get_connected_profiles_by_dna_test", iter(KEYS[:5]), ordered=False)
+    )
+    assert sorted(result.key for result in results) == KEYS[:5]
+    assert all(isinstance(result.error, TypeError) for result in results)
+
+
+@pytest.mark.parametrize(
+    "method_name",
+    ["get_people", "stream_descendants", "map", "authenticate", "check_login", "_do_post"],
+)
+def test_only_query_methods_can_be_mapped(make_session, method_name):
+    with pytest.raises(ValueError):
+        make_session().map(method_name, KEYS)
+
+
+def test_async_map(api_url):
+    async def fetch():
+        async with AsyncWTSession(
+            "wt_tests", rate_limiter=RateLimiter(rate=FAST_RATE, max_rate=FAST_RATE)
+        ) as session:
+            return [
+                result
+                async for result in session.map("get_profile", KEYS, max_concurrency=4, fields="Id")
+            ]
+
+    results = asyncio.run(fetch())
+    assert [result.result[0]["profile"]["Id"] for result in results] == KEYS
@@ -0,0 +1,142 @@
+"""Tests of the wt_metrics instrumentation."""
+
+# Standard Imports
+import re
+import urllib.request
+
+# Third party imports
+import pytest
+
+# Local imports
+import wt_session
+from conftest import TREE_SEED, TREE_SIZE
+from wt_cache import ResponseCache
+from wt_metrics import PROMETHEUS_CONTENT_TYPE, HookList, Hooks, Histogram, Metrics
+from wt_mock import MockAPIServer
+from wt_session import RateLimiter, RequestEvent, WTSession
+
+# A line of the Prometheus text format: name, optional labels, value.
+SAMPLE = re.compile(r'^([a-z_]+)(\{(?:[a-z]+="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+
+
+def parse_prometheus(text: str) -> dict:
+    """Returns {(name, labels): value} for the samples, checking every line."""
+    samples = {}
+    types = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, metric_type = line.split(" ")
+            types[name] = metric_type
+            continue
+        if line.startswith("# HELP "):
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.groups()
+        assert re.sub("_(bucket|sum|count)$", "", name) in types, line
+        samples[(name, labels or "")] = float(value)
+    return samples
+
+
+def test_histogram_is_cumulative():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert histogram.total == pytest.approx(3.65) and histogram.count == 4
+
+
+def test_events_are_aggregated_per_action():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.on_request(RequestEvent("getPerson", 0, 200, 100, 2000, 0.01, 0.2, 0.3, 0.01))
+    metrics.on_request(RequestEvent("getPerson", 1, 200, 100, 20, throttled=True,
+                                    limit_exceeded=True))
+    metrics.on_request(RequestEvent("getPeople", 0, error="ConnectionError"))
+    metrics.on_rate_wait("getPerson", 0.5)
+    metrics.on_cache("getPerson", True)
+    metrics.on_cache("getPerson", False)
+
+    person = metrics.snapshot()["getPerson"]
+    assert person["requests"] == 2 and person["status_codes"] == {200: 2}
+    assert (person["request_bytes"], person["response_bytes"]) == (200, 2020)
+    assert (person["throttled"], person["limit_exceeded"]) == (1, 1)
+    assert (person["rate_waits"], person["rate_wait_seconds"]) == (1, 0.5)
+    assert (person["cache_hits"], person["cache_misses"]) == (1, 1)
+    assert metrics.snapshot()["getPeople"]["errors"] == {"ConnectionError": 1}
+
+    samples = parse_prometheus(metrics.to_prometheus())
+    assert samples[("wikitree_api_requests_total", '{action="getPerson",code="200"}')] == 2
+    assert samples[("wikitree_api_requests_total", '{action="getPeople",code="0"}')] == 1
+    assert samples[
+        ("wikitree_api_errors_total", '{action="getPeople",error="ConnectionError"}')
+    ] == 1
+    wait = '{action="getPerson",phase="wait",le="%s"}'
+    assert samples[("wikitree_api_request_seconds_bucket", wait % "0.1")] == 1
+    assert samples[("wikitree_api_request_seconds_bucket", wait % "+Inf")] == 2
+    # Failed requests have no phases to time.
+    assert samples[
+        ("wikitree_api_request_seconds_count", '{action="getPeople",phase="wait"}')
+    ] == 0
+    assert samples[("wikitree_api_rate_wait_seconds_total", '{action="getPerson"}')] == 0.5
+
+    metrics.reset()
+    assert metrics.snapshot() == {}
+
+
+def test_sessions_report_requests_and_cache_lookups(make_session, mock_server):
+    metrics = Metrics()
+    session = make_session(cache=ResponseCache(), hooks=metrics)
+    for _ in range(3):
+        session.get_profile(mock_server.api.tree.name(5), fields="Id,Name")
+    session.get_people([1, 2, 3], fields="Id")
+
+    snapshot = metrics.snapshot()
+    profile = snapshot["getProfile"]
+    assert profile["status_codes"] == {200: 1}
+    assert (profile["cache_hits"], profile["cache_misses"]) == (2, 1)
+    assert profile["request_bytes"] > 0 and profile["response_bytes"] > 0
+    assert profile["seconds"]["wait"] > 0
+    assert snapshot["getPeople"]["requests"] == 1
+
+
+def test_throttled_responses_are_counted(monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr(wt_session, "retry_delay", lambda attempt: 0.0)
+    with MockAPIServer(TREE_SIZE, TREE_SEED, rate_limit=2) as server:
+        monkeypatch.setattr(wt_session, "API_URL", server.url)
+        session = WTSession(
+            "wt_tests", rate_limiter=RateLimiter(rate=1000, max_rate=1000), retries=0,
+            hooks=metrics,
+        )
+        for person_id in (1, 2, 3):
+            session.get_person(person_id, fields="Id")
+    person = metrics.snapshot()["getPerson"]
+    assert person["requests"] == 3
+    assert person["throttled"] == 1 and person["limit_exceeded"] == 1
+
+
+def test_a_failing_hook_does_not_stop_the_others(make_session):
+    class Broken(Hooks):
+        def on_request(self, event):
+            raise RuntimeError("broken")
+
+    metrics = Metrics()
+    session = make_session(hooks=HookList(Broken(), metrics))
+    assert session.get_person(1, fields="Id")[0]["person"]["Id"] == 1
+    assert metrics.snapshot()["getPerson"]["requests"] == 1
+
+
+def test_metrics_are_served_for_scraping():
+    metrics = Metrics()
+    metrics.on_cache("getBio", True)
+    server = metrics.serve(port=0, address="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"] == PROMETHEUS_CONTENT_TYPE
+            text = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert text == metrics.to_prometheus()
+    assert parse_prometheus(text)[("wikitree_api_cache_hits_total", '{action="getBio"}')] == 1
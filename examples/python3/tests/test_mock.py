@@ -0,0 +1,137 @@
+"""Tests of the wt_mock offline API and the wt_bench benchmarks run against it."""
+
+# Standard Imports
+import http.client
+from urllib.parse import urlparse
+
+# Third party imports
+import pytest
+
+# Local imports
+from wt_bench import BenchResult, LatencyRecorder, compare_results, run_benchmarks
+from wt_mock import MAX_KEYS, MockAPI, MockAPIServer, SyntheticTree
+from wt_session import LIMIT_EXCEEDED_STATUS, RequestEvent
+
+# A small tree, quick to generate.
+SIZE = 500
+SEED = 11
+
+
+@pytest.fixture(scope="module")
+def tree():
+    return SyntheticTree(SIZE, SEED)
+
+
+def test_trees_are_generated_from_the_seed(tree):
+    other = SyntheticTree(SIZE, SEED)
+    assert len(tree) == SIZE
+    assert (tree.father, tree.mother, tree.birth) == (other.father, other.mother, other.birth)
+    assert SyntheticTree(SIZE, SEED + 1).birth != tree.birth
+    for person_id in range(1, SIZE + 1):
+        for parent in tree.parents(person_id):
+            assert person_id in tree.children[parent]
+        father = tree.father[person_id]
+        if father and tree.birth[father][0] and tree.birth[person_id][0]:
+            assert tree.birth[father][0] + 20 <= tree.birth[person_id][0]
+    assert tree.resolve(tree.name(42)) == 42 and tree.resolve("Nobody-42") == 0
+
+
+def test_get_people_pages_leave_out_the_starting_profiles(tree):
+    api = MockAPI(tree)
+    keys = [person_id for person_id in range(SIZE, 0, -1) if tree.parents(person_id)][:20]
+    form = {"action": "getPeople", "keys": ",".join(map(str, keys)), "ancestors": "3"}
+    everyone = api.answer(form, {})[2][0]["people"]
+
+    related = set()
+    for start in range(0, len(everyone), 7):
+        page = api.answer(dict(form, start=str(start), limit="7"), {})[2][0]["people"]
+        assert {str(key) for key in keys} <= set(page)
+        related.update(set(page) - {str(key) for key in keys})
+    assert related | {str(key) for key in keys} == set(everyone)
+
+    form = {"action": "getPeople", "keys": ",".join(["1"] * (MAX_KEYS + 1))}
+    assert "Too many keys" in api.answer(form, {})[2][0]["status"]
+
+
+def test_throttling_and_errors(tree):
+    api = MockAPI(tree, rate_limit=1)
+    form = {"action": "getPerson", "key": "1"}
+    assert api.answer(form, {})[2][0]["person"]["Id"] == 1
+    assert api.answer(form, {}) == (200, {}, [{"status": LIMIT_EXCEEDED_STATUS}])
+
+    status, headers, _ = MockAPI(tree, rate_limit=0, throttle_status=429).answer(form, {})
+    assert (status, headers) == (429, {"Retry-After": "1"})
+    assert MockAPI(tree, error_rate=1.0).answer(form, {})[0] == 503
+    assert "Unknown action" in MockAPI(tree).answer({"action": "nope"}, {})[2][0]["status"]
+
+
+def test_login_flow(tree):
+    api = MockAPI(tree)
+    status, headers, _ = api.answer(
+        {"action": "clientLogin", "doLogin": "1", "wpEmail": "a@b.c", "wpPassword": "x"}, {}
+    )
+    assert status == 302
+    authcode = headers["Location"].rpartition("authcode=")[2]
+    _, headers, body = api.answer({"action": "clientLogin", "authcode": authcode}, {})
+    assert body["clientLogin"]["result"] == "Success" and api.logins == 1
+    cookies = dict(cookie.split(";")[0].split("=") for cookie in headers["Set-Cookie"])
+
+    check = {"action": "clientLogin", "checkLogin": str(body["clientLogin"]["userid"])}
+    assert api.answer(check, cookies)[2]["clientLogin"]["result"] == "ok"
+    assert api.answer(check, {})[2]["clientLogin"]["result"] == "error"
+    # An authcode works once.
+    assert api.answer({"action": "clientLogin", "authcode": authcode}, {})[2] == {
+        "clientLogin": {"result": "Failed"}
+    }
+
+
+def test_the_server_says_when_it_closes_the_connection():
+    with MockAPIServer(SIZE, SEED) as server:
+        url = urlparse(server.url)
+        connection = http.client.HTTPConnection(url.hostname, url.port, timeout=5)
+        try:
+            for header, expected in (("keep-alive", None), ("close", "close")):
+                connection.request(
+                    "POST", url.path, body="action=getPerson&key=1",
+                    headers={"Connection": header,
+                             "Content-Type": "application/x-www-form-urlencoded"},
+                )
+                response = connection.getresponse()
+                response.read()
+                assert response.status == 200
+                assert response.getheader("Connection") == expected
+            assert response.will_close
+        finally:
+            connection.close()
+
+
+def test_latency_percentiles():
+    recorder = LatencyRecorder()
+    for latency in range(1, 101):
+        recorder.on_request(RequestEvent("getPerson", 0, 200, wait=latency / 1000))
+    recorder.on_request(RequestEvent("getPerson", 1, error="ConnectionError"))
+    assert len(recorder.latencies) == 100
+    assert recorder.percentile(50) == 0.05 and recorder.percentile(99) == 0.099
+    assert LatencyRecorder().percentile(50) == 0.0
+
+
+def test_compare_results_reports_slowdowns():
+    results = [
+        BenchResult("map", 100, 100, 2.0, 0, 0, 0),
+        BenchResult("async", 100, 100, 1.0, 0, 0, 0),
+    ]
+    baseline = [
+        {"name": "map", "profiles": 100, "seconds": 1.0},
+        {"name": "async", "profiles": 100, "seconds": 1.1},
+    ]
+    regressions = compare_results(results, baseline, tolerance=0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("map: 50 profiles/s")
+
+
+def test_benchmarks_run_against_a_mock_process():
+    results = run_benchmarks(["get_people", "map", "async"], size=SIZE, count=40, workers=4,
+                             memory=False)
+    assert [result.name for result in results] == ["get_people", "map", "async"]
+    for result in results:
+        assert result.profiles == 40 and result.requests > 0 and result.seconds > 0
+        assert 0 < result.p50 <= result.p99
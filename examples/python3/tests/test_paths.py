@@ -0,0 +1,120 @@
+"""Tests of wt_paths.PathSolver."""
+
+# Standard Imports
+from collections import deque
+import random
+
+# Third party imports
+import pytest
+
+# Local imports
+from conftest import requests_sent
+from wt_graph import GENDER_FEMALE, FamilyGraph
+from wt_paths import PATH_FIELDS, IncompleteGraphError, PathSolver
+from wt_session import PATH_CHILD, PATH_PARENT, PATH_SIBLING, PATH_SPOUSE, ConnectionRelation
+
+
+@pytest.fixture
+def graph(mock_server) -> FamilyGraph:
+    return mock_server.api.tree.graph()
+
+
+def _pairs(graph, count=40):
+    rng = random.Random(5)
+    return [(rng.randint(1, len(graph)), rng.randint(1, len(graph))) for _ in range(count)]
+
+
+def _distance(graph, source, target, spouses=True):
+    """The number of profiles on a shortest path, by a plain breadth first search."""
+    source, target = graph.index_of(source), graph.index_of(target)
+    seen = {source: 1}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        if node == target:
+            return seen[node]
+        neighbours = [*graph.parents(node), *graph.children(node), *graph.siblings(node)]
+        if spouses:
+            neighbours.extend(graph.spouses(node))
+        for neighbour in neighbours:
+            if neighbour not in seen:
+                seen[neighbour] = seen[node] + 1
+                queue.append(neighbour)
+    return 0
+
+
+def _check_steps(graph, path):
+    for previous, entry in zip(path, path[1:]):
+        node, other = graph.index_of(previous["Id"]), graph.index_of(entry["Id"])
+        related = {
+            PATH_CHILD: graph.parents(node),
+            PATH_PARENT: graph.children(node),
+            PATH_SIBLING: graph.siblings(node),
+            PATH_SPOUSE: graph.spouses(node),
+        }[entry["pathType"]]
+        assert other in list(related)
+
+
+@pytest.mark.parametrize("relation", [ConnectionRelation.SHORTEST, ConnectionRelation.NO_SPOUSES])
+def test_paths_are_shortest(graph, relation):
+    solver = PathSolver(graph)
+    spouses = relation == ConnectionRelation.SHORTEST
+    found = 0
+    for key1, key2 in _pairs(graph):
+        result = solver.get_connections(key1, key2, relation)[0]
+        assert result["pathLength"] == _distance(graph, key1, key2, spouses)
+        assert result["pathLength"] == len(result["path"])
+        if result["path"]:
+            found += 1
+            assert (result["path"][0]["Id"], result["path"][-1]["Id"]) == (key1, key2)
+            _check_steps(graph, result["path"])
+            assert spouses or PATH_SPOUSE not in [entry.get("pathType") for entry in result["path"]]
+    assert found and solver.stats.local == len(_pairs(graph))
+
+
+def test_common_ancestor_paths_go_up_then_down(graph):
+    solver = PathSolver(graph)
+    found = 0
+    for key1, key2 in _pairs(graph):
+        path = solver.get_connections(key1, key2, ConnectionRelation.COMMON_ANCESTOR)[0]["path"]
+        steps = "".join("u" if entry["pathType"] == PATH_CHILD else "d" for entry in path[1:])
+        assert steps == "u" * steps.count("u") + "d" * steps.count("d")
+        found += bool(path)
+    assert found
+
+
+def test_ignored_profiles_are_avoided(graph):
+    solver = PathSolver(graph)
+    for key1, key2 in _pairs(graph):
+        path = solver.get_connections(key1, key2)[0]["path"]
+        if len(path) > 2:
+            middle = [entry["Id"] for entry in path[1:-1]]
+            detour = solver.get_connections(key1, key2, ignore_ids=middle[:1])[0]
+            assert middle[0] not in [entry["Id"] for entry in detour["path"]]
+            assert detour["pathLength"] == 0 or detour["pathLength"] >= len(path)
+
+
+def test_y_dna_needs_two_men(graph):
+    solver = PathSolver(graph)
+    for key1, key2 in _pairs(graph):
+        genders = {graph.gender(graph.index_of(key)) for key in (key1, key2)}
+        result = solver.get_connections(key1, key2, ConnectionRelation.Y_DNA)[0]
+        if GENDER_FEMALE in genders:
+            assert result["pathLength"] == 0
+        else:
+            assert all(entry.get("pathType") != PATH_SIBLING for entry in result["path"])
+
+
+def test_queries_beyond_the_graph_go_to_the_api(make_session, mock_server):
+    graph = FamilyGraph()
+    graph.add_person({"Id": 2999, "Name": mock_server.api.tree.name(2999)})
+    graph.add_person({"Id": 2998, "Name": mock_server.api.tree.name(2998)})
+    with pytest.raises(IncompleteGraphError):
+        PathSolver(graph).get_connections(2999, 2998)
+
+    session = make_session()
+    solver = PathSolver(graph, session=session)
+    sent = requests_sent(mock_server)
+    result = solver.get_connections(2999, 2998)
+    assert requests_sent(mock_server) == sent + 1 and solver.stats.remote == 1
+    assert result == session.get_connections(2999, 2998, fields=PATH_FIELDS)
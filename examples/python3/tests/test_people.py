@@ -0,0 +1,69 @@
+"""Tests of WTSession.get_people and iter_people."""
+
+# Standard Imports
+import asyncio
+
+# Local imports
+import wt_session
+from conftest import FAST_RATE, requests_sent
+from wt_async import AsyncWTSession
+from wt_session import RateLimiter
+
+KEYS = list(range(1, 21))
+
+
+def _get_people_sent(server) -> int:
+    return server.api.counts.get("getPeople", 0)
+
+
+def test_keys_are_chunked(make_session, mock_server):
+    keys = list(range(1, 2501)) + [1, "2"]
+    sent = _get_people_sent(mock_server)
+    result = make_session().get_people(keys, fields="Id", max_workers=3)
+    assert _get_people_sent(mock_server) == sent + 3
+    assert result[0]["status"] == ""
+    assert sorted(int(person_id) for person_id in result[0]["people"]) == list(range(1, 2501))
+    assert len(result[0]["resultByKey"]) == 2500
+
+
+def test_keys_with_relatives_are_chunked_by_100(make_session, mock_server):
+    sent = _get_people_sent(mock_server)
+    result = make_session().get_people(range(1, 251), fields="Id", ancestors=1)
+    assert _get_people_sent(mock_server) == sent + 3
+    assert len(result[0]["resultByKey"]) == 250
+
+
+def test_chunks_merge_into_a_single_result(make_session, mock_server, monkeypatch):
+    session = make_session()
+    keys = list(range(100, 150)) + [999999]
+    whole = session.get_people(keys, fields="Id,Name,Father")
+    monkeypatch.setattr(wt_session, "GET_PEOPLE_MAX_KEYS", 10)
+    sent = requests_sent(mock_server)
+    assert session.get_people(keys, fields="Id,Name,Father") == whole
+    assert requests_sent(mock_server) == sent + 6
+
+
+def test_pages_end_when_related_profiles_run_out(make_session, mock_server):
+    session = make_session()
+    keys = list(range(1, 61))
+    whole = session.get_people(keys, fields="Id", descendants=2)[0]["people"]
+    sent = _get_people_sent(mock_server)
+    people = list(session.iter_people(keys, fields="Id", descendants=2, page_size=50))
+    assert sorted(person["Id"] for person in people) == sorted(map(int, whole))
+    pages = _get_people_sent(mock_server) - sent
+    assert pages == (len(whole) - len(keys)) // 50 + 1
+
+
+def test_async_pages_end_when_related_profiles_run_out(make_session, api_url):
+    async def fetch():
+        async with AsyncWTSession(
+            "wt_tests", rate_limiter=RateLimiter(rate=FAST_RATE, max_rate=FAST_RATE)
+        ) as session:
+            return [
+                person
+                async for person in session.iter_people(KEYS, fields="Id", nuclear=1, page_size=5)
+            ]
+
+    whole = make_session().get_people(KEYS, fields="Id", nuclear=1)[0]["people"]
+    people = asyncio.run(fetch())
+    assert sorted(person["Id"] for person in people) == sorted(map(int, whole))
@@ -0,0 +1,77 @@
+"""Tests of the adaptive RateLimiter and the retries of throttled requests."""
+
+# Standard Imports
+from contextlib import ExitStack
+
+# Third party imports
+import pytest
+
+# Local imports
+import wt_session
+from conftest import TREE_SEED, TREE_SIZE
+from wt_cache import ResponseCache
+from wt_mock import MockAPIServer
+from wt_session import LIMIT_EXCEEDED_STATUS, CircuitOpenError, RateLimiter, WTSession
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Returns a function starting a mock API with options, used by the sessions."""
+    with ExitStack() as stack:
+
+        def start(**options) -> MockAPIServer:
+            server = stack.enter_context(MockAPIServer(TREE_SIZE, TREE_SEED, **options))
+            monkeypatch.setattr(wt_session, "API_URL", server.url)
+            return server
+
+        monkeypatch.setattr(wt_session, "retry_delay", lambda attempt: 0.0)
+        yield start
+
+
+@pytest.mark.parametrize("throttle_status", [200, 429])
+def test_the_rate_backs_off_until_requests_get_through(serve, throttle_status):
+    serve(rate_limit=2, throttle_status=throttle_status)
+    limiter = RateLimiter(rate=50, max_rate=50, min_rate=1, breaker_threshold=100)
+    session = WTSession("wt_tests", rate_limiter=limiter, retries=20)
+    for person_id in range(1, 5):
+        assert session.get_person(person_id, fields="Id")[0]["person"]["Id"] == person_id
+    assert limiter.rate < 10
+
+
+def test_a_throttled_response_is_returned_but_not_cached(serve):
+    serve(rate_limit=2)
+    cache = ResponseCache()
+    session = WTSession(
+        "wt_tests", rate_limiter=RateLimiter(rate=1000, max_rate=1000), retries=0, cache=cache
+    )
+    results = [session.get_person(person_id, fields="Id") for person_id in (1, 2, 3)]
+    assert results[-1] == [{"status": LIMIT_EXCEEDED_STATUS}]
+    assert cache.stats.entries == 2
+
+
+def test_the_breaker_opens_after_repeated_failures():
+    limiter = RateLimiter(rate=1000, breaker_threshold=3, breaker_timeout=60)
+    limiter.on_throttle()
+    limiter.on_failure()
+    limiter.reserve()
+    limiter.on_failure()
+    assert limiter.is_open
+    with pytest.raises(CircuitOpenError):
+        limiter.reserve()
+
+
+def test_successes_reset_the_breaker_and_raise_the_rate():
+    limiter = RateLimiter(rate=4, max_rate=5, breaker_threshold=2, success_run=2)
+    limiter.on_failure()
+    for _ in range(4):
+        limiter.on_success()
+    limiter.on_failure()
+    assert not limiter.is_open
+    assert limiter.rate == 5
+
+
+def test_tokens_are_spaced_at_the_rate():
+    limiter = RateLimiter(rate=10)
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == pytest.approx(0.1, abs=0.01)
+    assert limiter.reserve() == pytest.approx(0.2, abs=0.01)
@@ -0,0 +1,64 @@
+"""Tests of wt_records.Person and its bios."""
+
+# Local imports
+from conftest import requests_sent
+from wt_bios import BioLoader
+from wt_records import CORE_FIELDS, RecordSet
+
+PROFILE = {
+    "Id": 5,
+    "Name": "Vogel-5",
+    "Gender": "Male",
+    "Father": 0,
+    "Mother": "7",
+    "BirthDate": "1900-01-00",
+    "Privacy": "60",
+    "Touched": "20200101000000",
+    "FirstName": "William",
+}
+
+
+def test_fields_round_trip():
+    person = RecordSet().add(dict(PROFILE))
+    assert person.to_dict() == PROFILE
+    assert person["FirstName"] == "William"
+    assert person.get("DeathDate", "none") == "none"
+    assert "DeathDate" not in person
+    assert person.mother_id == 7
+    assert person.birth_date.year == 1900
+    assert person.is_open
+
+
+def test_updates_merge_fields():
+    records = RecordSet()
+    person = records.add(dict(PROFILE))
+    records.add({"Id": 5, "FirstName": "Bill", "LastNameAtBirth": "Vogel", "Touched": "1"})
+    assert person["FirstName"] == "Bill"
+    assert person["LastNameAtBirth"] == "Vogel"
+    assert person.touched == "1"
+
+
+def test_core_fields_are_not_in_a_dictionary():
+    person = RecordSet().add({field: "1" for field in CORE_FIELDS})
+    assert not hasattr(person, "__dict__")
+    assert person.to_dict() == {field: "1" for field in CORE_FIELDS}
+
+
+def test_bio_in_html_is_fetched_once(make_session, mock_server):
+    session = make_session()
+    records = RecordSet(BioLoader(session, bio_format="html"))
+    records.ingest(session.get_people([5], fields="Id,Name,Touched"))
+    sent = requests_sent(mock_server)
+    bio = records[5].bio
+    assert bio and bio.startswith("<")
+    assert records[5].bio == bio
+    assert requests_sent(mock_server) == sent + 1
+
+
+def test_an_invisible_bio_is_fetched_once(make_session, mock_server):
+    records = RecordSet(BioLoader(make_session()))
+    records.add({"Id": 999999, "Name": "Nobody-999999", "Touched": "1"})
+    sent = requests_sent(mock_server)
+    assert records[999999].bio is None
+    assert records[999999].bio is None
+    assert requests_sent(mock_server) == sent + 1
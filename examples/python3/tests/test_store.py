@@ -0,0 +1,50 @@
+"""Tests of wt_store.ProfileStore."""
+
+# Local imports
+from conftest import requests_sent
+from wt_store import ProfileStore
+
+
+def test_stored_profiles_are_not_fetched_again(make_session, mock_server, tmp_path):
+    path = str(tmp_path / "profiles.sqlite")
+    session = make_session(store=ProfileStore(path))
+    first = session.get_people([1, 2, 3], fields="Id,Name,BirthDate")
+
+    session = make_session(store=ProfileStore(path))
+    sent = requests_sent(mock_server)
+    assert session.get_people([3, 2, 1], fields="BirthDate") == first
+    assert requests_sent(mock_server) == sent
+
+    people = session.get_people([1, 4], fields="Id,Name,DeathDate")[0]["people"]
+    assert requests_sent(mock_server) == sent + 1
+    assert sorted(people) == ["1", "4"] and "DeathDate" in people["1"]
+
+
+def test_lookups_by_name(make_session, mock_server):
+    session = make_session(store=ProfileStore())
+    name = mock_server.api.tree.name(6)
+    session.get_people([6], fields="Id")
+    sent = requests_sent(mock_server)
+    assert session.get_people([name], fields="Id")[0]["resultByKey"] == {name: {"Id": 6}}
+    assert requests_sent(mock_server) == sent
+
+
+def test_revalidate_fetches_only_changed_profiles(make_session):
+    store = ProfileStore()
+    session = make_session(store=store)
+    session.get_people(range(1, 11), fields="Id,Name,BirthDate")
+    person = store.get([5], "BirthDate")[0]["5"]
+    store.put([dict(person, Touched="1", BirthDate="?")], "BirthDate")
+    store.put([{"Id": 999999, "Name": "Nobody-999999", "Touched": "1"}])
+
+    stats = store.revalidate(session, batch_size=4)
+    assert (stats.checked, stats.changed, stats.removed) == (11, 1, 1)
+    assert store.get([5], "BirthDate")[0]["5"] == person
+    assert store.get([999999])[1] == ["999999"]
+
+
+def test_profiles_are_stored_per_viewer():
+    store = ProfileStore()
+    store.put([{"Id": 1, "Name": "Private-1", "Touched": "1"}], viewer="7")
+    assert store.get([1])[1] == ["1"]
+    assert store.get([1], viewer="7")[0]["1"]["Name"] == "Private-1"
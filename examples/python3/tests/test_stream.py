@@ -0,0 +1,76 @@
+"""Tests of wt_stream.JSONStreamDecoder and the streaming session methods."""
+
+# Standard Imports
+import json
+from json import JSONDecoder
+import random
+
+# Third party imports
+import pytest
+
+# Local imports
+import wt_stream
+from wt_stream import JSONStreamDecoder
+
+ITEM = {
+    "status": "",
+    "resultByKey": {"1": {"Id": 1}, "Nobody-1": {"status": "Invalid key"}},
+    "people": {
+        "1": {"Id": 1, "Name": "Vogel-1", "Bio": 'He said "\\\\ hi" é中 \U0001f600'},
+        "2": {"Id": 2, "Spouses": [], "Children": {"3": {"Id": 3}}, "Weight": -1.5e3},
+    },
+}
+
+
+def _decode(body: bytes, sizes) -> tuple:
+    decoder = JSONStreamDecoder()
+    entries = []
+    pos = 0
+    while pos < len(body):
+        size = next(sizes)
+        entries.extend(decoder.feed(body[pos:pos + size]))
+        pos += size
+    entries.extend(decoder.close())
+    return entries, decoder.header
+
+
+@pytest.mark.parametrize("document", [[ITEM], ITEM], ids=["list", "item"])
+def test_any_chunking_gives_the_same_entries(document):
+    body = json.dumps(document, ensure_ascii=False).encode("utf-8")
+    expected = [("people", key, person) for key, person in ITEM["people"].items()]
+    header = {key: value for key, value in ITEM.items() if key != "people"}
+    rng = random.Random(1)
+    for sizes in (iter(lambda: 1, None), iter(lambda: rng.randint(1, 40), None)):
+        assert _decode(body, sizes) == (expected, header)
+
+
+def test_an_entry_split_over_many_chunks_is_decoded_once(monkeypatch):
+    calls = []
+
+    class CountingDecoder(JSONDecoder):
+        def raw_decode(self, s, idx=0):
+            calls.append(idx)
+            return super().raw_decode(s, idx)
+
+    monkeypatch.setattr(wt_stream, "JSONDecoder", CountingDecoder)
+    bio = "=== Biography ===\n" + 'Lorem "ipsum" \\ {dolor} [sit] amet. ' * 20000
+    body = json.dumps([{"status": "", "people": {"1": {"Id": 1, "Bio": bio}}}]).encode()
+    entries, _ = _decode(body, iter(lambda: 1000, None))
+    assert entries == [("people", "1", {"Id": 1, "Bio": bio})]
+    assert len(calls) < 10
+
+
+@pytest.mark.parametrize("body", [b'[{"people": {"1": {"Id": 1}', b'[{"status": "\\"', b"[1, 2"])
+def test_an_incomplete_body_is_an_error(body):
+    with pytest.raises(ValueError):
+        _decode(body, iter(lambda: 3, None))
+
+
+def test_streamed_people_match_get_people(make_session):
+    session = make_session()
+    keys = list(range(1, 41))
+    people = list(session.stream_people(keys, fields="Id,Name,BirthDate", ancestors=2))
+    expected = session.get_people(keys, fields="Id,Name,BirthDate", ancestors=2)[0]["people"]
+    assert {str(person["Id"]): person for person in people} == expected
+    descendants = list(session.stream_descendants(1, depth=3, fields="Id"))
+    assert descendants == session.get_descendants(1, depth=3, fields="Id")[0]["descendants"]
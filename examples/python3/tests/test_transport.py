@@ -0,0 +1,34 @@
+"""Tests of wt_session.HTTPTransport."""
+
+# Standard Imports
+from concurrent.futures import ThreadPoolExecutor
+
+# Local imports
+from wt_session import HTTPTransport
+
+FORM = {"action": "getPerson", "key": 1, "fields": "Id"}
+
+
+def test_connections_are_reused(api_url):
+    transport = HTTPTransport()
+    transport.post(api_url, FORM)
+    assert transport.connect_time > 0
+    response = transport.post(api_url, FORM)
+    assert transport.connect_time == 0
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.json()[0]["person"]["Id"] == 1
+
+
+def test_connections_can_be_closed_after_each_request(api_url):
+    transport = HTTPTransport(keep_alive=False)
+    for _ in range(2):
+        transport.post(api_url, FORM)
+        assert transport.connect_time > 0
+
+
+def test_threads_share_a_small_pool(make_session):
+    session = make_session(transport=HTTPTransport(pool_size=2))
+    keys = list(range(1, 81))
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda key: session.get_person(key, fields="Id"), keys))
+    assert [result[0]["person"]["Id"] for result in results] == keys
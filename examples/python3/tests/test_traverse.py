@@ -0,0 +1,57 @@
+"""Tests of wt_traverse.TreeExpander checkpoints."""
+
+# Standard Imports
+import json
+
+# Third party imports
+import pytest
+
+# Local imports
+from conftest import requests_sent
+from wt_traverse import Direction, TreeExpander
+
+# A late profile of the synthetic tree, with many generations of ancestors.
+START = 2999
+
+
+def test_rerun_resumes_from_the_checkpoint(make_session, mock_server, tmp_path):
+    session = make_session()
+    checkpoint = str(tmp_path / "expansion.json")
+
+    first = TreeExpander(session, Direction.ANCESTORS, max_depth=2, checkpoint_path=checkpoint)
+    first.expand([START])
+    saved = json.load(open(checkpoint, encoding="utf-8"))
+    assert saved["level"] == 2
+    assert saved["frontier"]
+
+    # The same code run again carries on rather than starting over.
+    resumed = TreeExpander(session, Direction.ANCESTORS, checkpoint_path=checkpoint)
+    stats = resumed.expand([START])
+    fresh_expander = TreeExpander(session, Direction.ANCESTORS)
+    fresh = fresh_expander.expand([START])
+    assert stats.nodes == fresh.nodes
+    assert stats.levels == fresh.levels
+    assert resumed.visited == fresh_expander.visited
+
+    # Once it is over, running it again fetches nothing and keeps the result.
+    sent = requests_sent(mock_server)
+    again = TreeExpander(session, Direction.ANCESTORS, checkpoint_path=checkpoint)
+    assert again.expand([START]).nodes == fresh.nodes
+    assert requests_sent(mock_server) == sent
+    assert len(json.load(open(checkpoint, encoding="utf-8"))["visited"]) == fresh.nodes
+
+
+def test_other_keys_do_not_reuse_a_checkpoint(make_session, tmp_path):
+    session = make_session()
+    checkpoint = str(tmp_path / "expansion.json")
+    TreeExpander(session, max_depth=1, checkpoint_path=checkpoint).expand([START])
+    with pytest.raises(ValueError):
+        TreeExpander(session, checkpoint_path=checkpoint).expand([START - 1])
+
+
+def test_resume_without_keys(make_session, tmp_path):
+    session = make_session()
+    checkpoint = str(tmp_path / "expansion.json")
+    TreeExpander(session, max_depth=1, checkpoint_path=checkpoint).expand([START])
+    stats = TreeExpander(session, checkpoint_path=checkpoint).expand()
+    assert stats.nodes == TreeExpander(session).expand([START]).nodes
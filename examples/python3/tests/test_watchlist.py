@@ -0,0 +1,57 @@
+"""Tests of ProfileStore.sync_watchlist."""
+
+# Third party imports
+import pytest
+
+# Local imports
+from wt_store import WATCHLIST_WATERMARK, ProfileStore
+
+FIELDS = "Id,Name,Touched,BirthDate"
+
+
+@pytest.fixture
+def session(make_session):
+    session = make_session()
+    assert session.authenticate("user@example.com", "secret")
+    return session
+
+
+def _watchlist(session) -> list:
+    return session.get_watchlist(limit=10000, fields=FIELDS)[0]["watchlist"]
+
+
+def test_a_sync_fetches_only_what_changed(session, mock_server):
+    store = ProfileStore()
+    watchlist = _watchlist(session)
+    stats = store.sync_watchlist(session, fields=FIELDS, page_size=100)
+    assert stats.changed == len(watchlist) == len(store)
+    assert stats.pages == len(watchlist) // 100 + 1
+    newest = max(person["Touched"] for person in watchlist)
+    assert stats.watermark == store.get_state(WATCHLIST_WATERMARK, str(session.user_id)) == newest
+
+    sent = mock_server.api.counts["getWatchlist"]
+    stats = store.sync_watchlist(session, fields=FIELDS, page_size=100)
+    assert (stats.pages, stats.changed) == (1, 0)
+    assert mock_server.api.counts["getWatchlist"] == sent + 1
+
+
+def test_profiles_touched_since_the_watermark_are_fetched(session):
+    store = ProfileStore()
+    touched = sorted(person["Touched"] for person in _watchlist(session))
+    watermark = touched[-150]
+    store.set_state(WATCHLIST_WATERMARK, watermark, str(session.user_id))
+    stats = store.sync_watchlist(session, fields=FIELDS, page_size=100)
+    assert stats.changed == len([value for value in touched if value > watermark])
+    assert stats.pages == 2
+    ids = [person["Id"] for person in _watchlist(session)]
+    assert len(store.get(ids, FIELDS, str(session.user_id))[0]) == stats.changed
+
+    stats = store.sync_watchlist(session, fields=FIELDS, page_size=100, full=True)
+    assert stats.changed == len(touched)
+
+
+def test_a_failed_sync_keeps_the_watermark(make_session):
+    store = ProfileStore()
+    stats = store.sync_watchlist(make_session(), fields=FIELDS)
+    assert stats.changed == 0
+    assert store.get_state(WATCHLIST_WATERMARK) is None
@@ -0,0 +1,993 @@
+"""
+This module defines an asyncio version of the WTSession class.
+
+AsyncWTSession has the same methods as WTSession, but each of them returns
+an awaitable, so many queries can be in flight at once from a single thread:
+
+    async with AsyncWTSession(app_id="MyApp", max_concurrency=20) as wt_session:
+        people = await asyncio.gather(
+            *(wt_session.get_person(key) for key in keys)
+        )
+
+It requires python3 and the aiohttp library.
+"""
+
+# Standard Imports
+import asyncio
+from collections import deque
+from email.utils import formatdate, parsedate_to_datetime
+from http.cookies import Morsel
+from json import loads
+from json.decoder import JSONDecodeError
+import logging
+import re
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlencode
+
+# Third party imports
+import aiohttp
+from yarl import URL
+
+# Local imports
+from wt_session import (
+    API_URL,
+    CONNECT_TIMEOUT_DEFAULT,
+    CONNECTION_RELATION_DEFAULT,
+    ConnectionRelation,
+    GET_PEOPLE_MAX_KEYS,
+    GET_PEOPLE_MAX_LIMIT,
+    LIMIT_EXCEEDED_STATUS,
+    MapResult,
+    PREFETCH_PAGES_DEFAULT,
+    ProgressCallback,
+    READ_TIMEOUT_DEFAULT,
+    RETRIES_DEFAULT,
+    RateLimiter,
+    WTSession,
+    answer_pairs,
+    count_related,
+    group_pairs,
+    is_throttled,
+    merge_people_results,
+    response_status,
+    retry_delay,
+    split_people_result,
+)
+from wt_stream import STREAM_CHUNK_SIZE, JSONStreamDecoder, StreamEntry
+
+LOGGER = logging.getLogger(__name__)
+
+# The default number of requests allowed in flight at the same time.
+MAX_CONCURRENCY_DEFAULT = 20
+
+
+def _cookie_state(morsel: "Morsel[str]") -> dict:
+    """Returns a cookie of the aiohttp jar in the form export_login saves."""
+    expires = None
+    if morsel["expires"]:
+        try:
+            expires = int(parsedate_to_datetime(morsel["expires"]).timestamp())
+        except (TypeError, ValueError):
+            pass
+    return {
+        "name": morsel.key,
+        "value": morsel.value,
+        "domain": morsel["domain"],
+        "path": morsel["path"] or "/",
+        "expires": expires,
+        "secure": bool(morsel["secure"]),
+    }
+
+
+def _load_cookies(jar: aiohttp.abc.AbstractCookieJar, cookies: Iterable[dict]) -> None:
+    """Puts cookies saved by export_login in an aiohttp jar, as set by the API."""
+    morsels = []
+    for cookie in cookies:
+        morsel: "Morsel[str]" = Morsel()
+        morsel.set(cookie["name"], cookie["value"], cookie["value"])
+        morsel["domain"] = cookie.get("domain") or ""
+        morsel["path"] = cookie.get("path") or "/"
+        if cookie.get("expires"):
+            morsel["expires"] = formatdate(cookie["expires"], usegmt=True)
+        if cookie.get("secure"):
+            morsel["secure"] = True
+        morsels.append((morsel.key, morsel))
+    jar.update_cookies(morsels, response_url=URL(API_URL))
+
+
+async def _on_connection_create_start(_session, context, _params) -> None:
+    """Notes when a request starts opening a connection."""
+    if context.trace_request_ctx is not None:
+        context.trace_request_ctx["connect_started"] = time.perf_counter()
+
+
+async def _on_connection_create_end(_session, context, _params) -> None:
+    """Adds the time taken to open the connection to the request's timing."""
+    timing = context.trace_request_ctx
+    if timing is not None and "connect_started" in timing:
+        timing["connect"] += time.perf_counter() - timing.pop("connect_started")
+
+
+class AsyncRequestCoalescer:
+    """
+    The asyncio version of RequestCoalescer. Collects getPerson/getProfile
+    calls made by different tasks within window seconds of each other and
+    sends them as one getPeople call.
+    """
+
+    def __init__(
+        self,
+        session: "AsyncWTSession",
+        window: float,
+        max_batch: int = GET_PEOPLE_MAX_KEYS,
+    ) -> None:
+        """
+        :param session: The session used to send the getPeople calls.
+        :param window: Seconds to wait for more calls before sending.
+        :param max_batch: Number of calls that triggers an immediate send.
+        """
+        self._session = session
+        self._window = window
+        self._max_batch = max_batch
+        self._pending: Dict[Tuple, List[Tuple[str, asyncio.Future]]] = {}
+
+    async def submit(
+        self,
+        action: str,
+        key: Union[str, int],
+        fields: str,
+        bio_format: Optional[str] = None,
+    ) -> list:
+        """
+        Queues one getPerson/getProfile call and waits for its result.
+
+        :param action: "getPerson" or "getProfile"
+        :param key: Wanted WikiTree_ID or User_ID
+        :param fields: Comma separated list of required fields
+        :param bio_format: "wiki", "html", or "both"
+        """
+        loop = asyncio.get_running_loop()
+        group = (action, fields, bio_format)
+        future = loop.create_future()
+
+        batch = self._pending.get(group)
+        if batch is None:
+            batch = self._pending[group] = []
+            loop.call_later(self._window, self._flush, group, batch)
+        batch.append((str(key), future))
+        if len(batch) >= self._max_batch:
+            self._flush(group, batch)
+
+        return await future
+
+    def _flush(self, group: Tuple, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Schedules the batch, unless it was already sent for being full."""
+        if self._pending.get(group) is not batch:
+            return
+        del self._pending[group]
+        asyncio.ensure_future(self._send(group, batch))
+
+    async def _send(self, group: Tuple, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Sends one getPeople call and hands each caller its result."""
+        action, fields, bio_format = group
+        keys = [key for key, _ in batch]
+        try:
+            result = await self._session.get_people(keys, fields=fields, bio_format=bio_format)
+            results = split_people_result(action, keys, result)
+        except Exception as error:  # pylint: disable=broad-except
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for key, future in batch:
+            if not future.done():
+                future.set_result(results[key])
+
+
+class AsyncWTSession(WTSession):
+    """
+    An asyncio version of WTSession.
+
+    The query methods (get_person, get_profile, get_ancestors, ...) are
+    inherited from WTSession. They build the same post data and hand it
+    to _do_post, which here is a coroutine, so each of them returns an
+    awaitable instead of the decoded result.
+
+    At most max_concurrency requests are sent at the same time. The rest
+    wait their turn on a semaphore.
+    """
+
+    def __init__(
+        self,
+        app_id: str,
+        max_concurrency: int = MAX_CONCURRENCY_DEFAULT,
+        coalesce_window: Optional[float] = None,
+        cache=None,
+        store=None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retries: int = RETRIES_DEFAULT,
+        connect_timeout: float = CONNECT_TIMEOUT_DEFAULT,
+        read_timeout: float = READ_TIMEOUT_DEFAULT,
+        field_plan=None,
+        hooks=None,
+    ) -> None:
+        """
+        :param app_id: The appId to send with every request.
+        :param max_concurrency: The maximum number of requests in flight.
+        :param coalesce_window: If set, getPerson/getProfile calls made within
+                                this many seconds of each other are sent as
+                                one getPeople call.
+        :param cache: An optional response cache, such as
+                      wt_cache.ResponseCache, consulted before each request.
+        :param store: An optional profile store, such as wt_store.ProfileStore,
+                      consulted by get_people before the API.
+        :param rate_limiter: The rate limiter to use. Defaults to the one
+                             shared by all sessions with the same app_id.
+        :param retries: Number of times a throttled or failed request is retried.
+        :param connect_timeout: Seconds allowed to open a connection.
+        :param read_timeout: Seconds allowed between bytes of the response.
+        :param field_plan: An optional field plan, such as wt_fields.FieldPlan,
+                           narrowing the fields of calls made without any.
+        :param hooks: Optional instrumentation hooks, such as wt_metrics.Metrics,
+                      told about every request, rate limit wait and cache lookup.
+        """
+        super().__init__(
+            app_id,
+            cache=cache,
+            store=store,
+            rate_limiter=rate_limiter,
+            retries=retries,
+            field_plan=field_plan,
+            hooks=hooks,
+        )
+
+        # The aiohttp session must be created inside a running event loop,
+        # so we drop the blocking transport and create ours on first use.
+        self._transport.close()
+        self._transport = None
+        self._session = None
+        self._timeout = aiohttp.ClientTimeout(
+            sock_connect=connect_timeout, sock_read=read_timeout
+        )
+
+        self._max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # The login cookies while there is no aiohttp session to hold them,
+        # in the form of export_login.
+        self._login_cookies: Optional[List[dict]] = None
+
+        if coalesce_window is not None:
+            self._coalescer = AsyncRequestCoalescer(self, window=coalesce_window)
+
+    async def __aenter__(self) -> "AsyncWTSession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @property
+    def max_concurrency(self) -> int:
+        """Return the maximum number of requests in flight."""
+        return self._max_concurrency
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the aiohttp session, creating it if necessary."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._max_concurrency)
+            # Connections report how long they took to open to the request's
+            # trace context, see _post.
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_start.append(_on_connection_create_start)
+            trace_config.on_connection_create_end.append(_on_connection_create_end)
+            # By default aiohttp drops cookies set by hosts given as an IP
+            # address, which would lose the login to an API such as wt_mock.
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self._timeout,
+                trace_configs=[trace_config],
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+            )
+            if self._login_cookies:
+                _load_cookies(self._session.cookie_jar, self._login_cookies)
+        return self._session
+
+    async def close(self) -> None:
+        """Close the underlying aiohttp session. A login is kept for later calls."""
+        if self._session is not None and not self._session.closed:
+            if self._authenticated:
+                self._login_cookies = [_cookie_state(morsel) for morsel in self._session.cookie_jar]
+            await self._session.close()
+        self._session = None
+
+    # Saved logins work as with WTSession, but SharedLogin (wt_login) logs
+    # sessions in synchronously, so it cannot be passed to an AsyncWTSession.
+    # Load its saved login with import_login instead.
+
+    def export_login(self) -> Optional[dict]:
+        """
+        Returns the login of the session, to be saved and put in another
+        session with import_login, or None if it is not logged in. It holds
+        the login cookies, which let anyone act as the user: keep it safe.
+        """
+        if not self._authenticated:
+            return None
+        if self._session is not None and not self._session.closed:
+            cookies = [_cookie_state(morsel) for morsel in self._session.cookie_jar]
+        else:
+            cookies = [dict(cookie) for cookie in self._login_cookies or ()]
+        return {"user_id": self._user_id, "user_name": self._user_name, "cookies": cookies}
+
+    def import_login(self, state: dict) -> None:
+        """
+        Logs the session in with a login from export_login, of this or of a
+        WTSession, without any request. Await check_login to find out whether
+        it still works.
+
+        :param state: The login.
+        """
+        self._login_cookies = [dict(cookie) for cookie in state["cookies"]]
+        if self._session is not None and not self._session.closed:
+            self._session.cookie_jar.clear()
+            _load_cookies(self._session.cookie_jar, self._login_cookies)
+        self._wt_cookie = {cookie["name"]: cookie["value"] for cookie in self._login_cookies}
+        self._user_id = state.get("user_id", "")
+        self._user_name = state.get("user_name", "")
+        self._authenticated = True
+
+    async def check_login(self) -> bool:
+        """
+        Uses clientLogin with checkLogin to return whether the API still has
+        the session logged in. Logins end when they expire or the user logs out.
+        """
+        if not self._authenticated:
+            return False
+        post_data = {
+            "action": "clientLogin",
+            "checkLogin": self._user_id,
+            "appId": self._app_id,
+        }
+        session = self._get_session()
+        await asyncio.sleep(self._rate_limiter.reserve())
+        try:
+            async with self._semaphore:
+                async with session.post(API_URL, data=post_data, allow_redirects=False) as response:
+                    data = loads(await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as error:
+            LOGGER.info("checkLogin failed: %s", error)
+            return False
+        result = data.get("clientLogin") if isinstance(data, dict) else None
+        return isinstance(result, dict) and result.get("result") == "ok"
+
+    async def authenticate(self, email: str, password: str) -> bool:
+        """
+        Takes an email address and password and attempts to authenticate. Returns
+        a boolean to indicate success.
+
+        This is the same two-step clientLogin flow as WTSession.authenticate.
+
+        :param email: The email address of the user.
+        :param password: The corresponding password.
+        :returns: Boolean indicating success.
+        """
+        # Start from a fresh cookie jar for the login.
+        await self.close()
+        self._login_cookies = None
+        session = self._get_session()
+
+        # Step 1 - POST the clientLogin action with our member credentials,
+        # without following the redirection, so we can capture the authcode.
+        post_data = {
+            "action": "clientLogin",
+            "doLogin": 1,
+            "wpEmail": email,
+            "wpPassword": password,
+            "appId": self._app_id,
+        }
+        await asyncio.sleep(self._rate_limiter.reserve())
+        async with self._semaphore:
+            async with session.post(API_URL, data=post_data, allow_redirects=False) as response:
+                status = response.status
+                location = response.headers.get("Location")
+
+        if (status != 302) or (location is None):
+            LOGGER.error(
+                "Authentication failed - clientLogin POST did not return expected 302 Redirect."
+            )
+            LOGGER.info("Response status_code = %d", status)
+
+            self._authenticated = False
+            return self._authenticated
+
+        matches = re.search(r"authcode=([^&]+)", location)
+        if matches is None:
+            LOGGER.error(
+                "Authentication failed - clientLogin POST did not return authcode"
+            )
+            LOGGER.info("Response status_code = %d", status)
+
+            self._authenticated = False
+            return self._authenticated
+
+        self._authcode = matches.group(1)
+
+        # Step 2 - POST back the authcode we got. The session cookies end up
+        # in the aiohttp cookie jar.
+        post_data = {
+            "action": "clientLogin",
+            "authcode": self._authcode,
+            "appId": self._app_id,
+        }
+        await asyncio.sleep(self._rate_limiter.reserve())
+        async with self._semaphore:
+            async with session.post(API_URL, data=post_data, allow_redirects=False) as response:
+                status = response.status
+                body = await response.read()
+
+        if status != 200:
+            LOGGER.error(
+                "Authentication failed - clientLogin(authcode) POST did not return SUCCESS."
+            )
+            LOGGER.info("Response status_code = %d", status)
+
+            self._authenticated = False
+            return self._authenticated
+
+        self._wt_cookie = {
+            name: morsel.value
+            for name, morsel in session.cookie_jar.filter_cookies(URL(API_URL)).items()
+        }
+        if not self._wt_cookie:
+            LOGGER.error(
+                "Authentication failed - clientLogin(authcode) returned no Cookies."
+            )
+
+            self._authenticated = False
+            return self._authenticated
+
+        self._authenticated = True
+
+        client_login_response = loads(body).get("clientLogin")
+
+        # Deliberately not storing password as instance variable
+        self._email = email
+        self._user_name = client_login_response.get("username")
+        self._user_id = client_login_response.get("userid")
+
+        LOGGER.debug(
+            f"Authentication succeeded: {self._email}, {self._user_name}, {self._user_id}"
+        )
+
+        return self._authenticated
+
+    async def _do_post(self, post_data: dict, need_auth: bool = False) -> dict:
+        """
+        The coroutine version of WTSession._do_post. Returns empty dictionary
+        if not authenticated and the query specifically needs you to be logged
+        in.
+
+        :param post_data: A dictionary with at least the "action" key and
+                          other keys as necessary.
+        :param need_auth: A flag to say whether the query needs authentication.
+        """
+        data = {}
+
+        if need_auth and not self._authenticated:
+            return data
+
+        post_payload = self._payload(post_data)
+
+        viewer = self._viewer
+        action = post_payload["action"]
+        if self._cache is not None:
+            body = self._cache.get(post_payload, viewer)
+            if self._hooks is not None:
+                self._hooks.on_cache(action, body is not None)
+            if body is not None:
+                return self._planned(loads(body))
+
+        session = self._get_session()
+        for attempt in range(self._retries + 1):
+            timing = {"connect": 0.0}
+            try:
+                async with self._semaphore:
+                    # Reserve with the rate limiter only once we have a slot,
+                    # so at most max_concurrency reservations are outstanding
+                    # and a raised rate takes effect quickly.
+                    await self._acquire_async(action)
+                    started = time.perf_counter()
+                    async with session.post(
+                        API_URL, data=post_payload, trace_request_ctx=timing
+                    ) as response:
+                        headers = time.perf_counter()
+                        status = response.status
+                        body = await response.read()
+                        received = time.perf_counter()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                self._rate_limiter.on_failure()
+                self._report(action, attempt, error=type(error).__name__)
+                if attempt == self._retries:
+                    raise
+                LOGGER.info("Request failed (%s), retrying.", error)
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+
+            error = None
+            try:
+                data = loads(body)
+            except (JSONDecodeError, UnicodeDecodeError) as decode_error:
+                LOGGER.warning(
+                    "%s returned a response that is not JSON (HTTP %s, %d bytes): %s",
+                    action,
+                    status,
+                    len(body),
+                    decode_error,
+                )
+                error = type(decode_error).__name__
+                data = {}
+            if self._hooks is not None:
+                self._report(
+                    action,
+                    attempt,
+                    status_code=status,
+                    request_bytes=len(urlencode(post_payload)),
+                    response_bytes=len(body),
+                    connect=timing["connect"],
+                    wait=max(0.0, headers - started - timing["connect"]),
+                    download=received - headers,
+                    decode=time.perf_counter() - received,
+                    throttled=is_throttled(status, data),
+                    limit_exceeded=response_status(data) == LIMIT_EXCEEDED_STATUS,
+                    error=error,
+                )
+
+            throttled = is_throttled(status, data)
+            if not throttled:
+                self._rate_limiter.on_success()
+                break
+
+            self._rate_limiter.on_throttle()
+            if attempt < self._retries:
+                await asyncio.sleep(retry_delay(attempt))
+
+        if self._cache is not None and data and not throttled and status == 200:
+            self._cache.put(post_payload, body, viewer)
+
+        return self._planned(data)
+
+    async def _acquire_async(self, action: str) -> None:
+        """Waits for the rate limiter, telling the hooks how long it took."""
+        delay = self._rate_limiter.reserve()
+        if delay > 0 and self._hooks is not None:
+            self._hooks.on_rate_wait(action, delay)
+        await asyncio.sleep(delay)
+
+    async def _stream_post(self, post_data: dict) -> AsyncIterator[StreamEntry]:
+        """
+        The asynchronous generator version of WTSession._stream_post. The
+        request keeps its concurrency slot until the response is read.
+
+        :param post_data: A dictionary with at least the "action" key and
+                          other keys as necessary.
+        """
+        post_payload = self._payload(post_data)
+
+        action = post_payload["action"]
+        session = self._get_session()
+        for attempt in range(self._retries + 1):
+            decoder = JSONStreamDecoder()
+            yielded = False
+            timing = {"connect": 0.0}
+            response = None
+            # Only the time spent reading the socket counts as download, not
+            # the time the caller spends between entries.
+            download = 0.0
+            size = 0
+            try:
+                async with self._semaphore:
+                    await self._acquire_async(action)
+                    started = time.perf_counter()
+                    async with session.post(
+                        API_URL, data=post_payload, trace_request_ctx=timing
+                    ) as response:
+                        timing["wait"] = time.perf_counter() - started - timing["connect"]
+                        if not is_throttled(response.status, None):
+                            chunks = aiter(response.content.iter_chunked(STREAM_CHUNK_SIZE))
+                            while True:
+                                started = time.perf_counter()
+                                chunk = await anext(chunks, None)
+                                download += time.perf_counter() - started
+                                if chunk is None:
+                                    break
+                                size += len(chunk)
+                                for container, key, value in decoder.feed(chunk):
+                                    yielded = True
+                                    yield container, key, self._planned(value)
+                            for container, key, value in decoder.close():
+                                yielded = True
+                                yield container, key, self._planned(value)
+                            if yielded or not is_throttled(response.status, decoder.header):
+                                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                self._rate_limiter.on_failure()
+                if response is None:
+                    self._report(action, attempt, error=type(error).__name__)
+                if yielded or attempt == self._retries:
+                    raise
+                LOGGER.info("Request failed (%s), retrying.", error)
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+            finally:
+                if response is not None and self._hooks is not None:
+                    self._report(
+                        action,
+                        attempt,
+                        status_code=response.status,
+                        request_bytes=len(urlencode(post_payload)),
+                        response_bytes=size,
+                        connect=timing["connect"],
+                        wait=max(0.0, timing["wait"]),
+                        download=download,
+                        throttled=is_throttled(response.status, decoder.header),
+                        limit_exceeded=decoder.header.get("status") == LIMIT_EXCEEDED_STATUS,
+                    )
+
+            self._rate_limiter.on_throttle()
+            if attempt == self._retries:
+                LOGGER.error("%s was throttled, giving up.", post_data["action"])
+                return
+            await asyncio.sleep(retry_delay(attempt))
+
+        self._rate_limiter.on_success()
+
+        status = decoder.header.get("status")
+        if status:
+            LOGGER.error("%s failed: %s", post_data["action"], status)
+
+    async def stream_descendants(
+        self,
+        key: Union[str, int],
+        depth: int = 1,
+        fields: Optional[str] = None,
+        bio_format: Optional[str] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        The asynchronous generator version of WTSession.stream_descendants.
+
+        :param key: Wanted WikiTree_ID or User_ID
+        :param depth: Number of generations
+        :param fields: Comma separated list of required fields
+        :param bio_format: "wiki", "html", or "both"
+        """
+        post_data = {
+            "action": "getDescendants",
+            "key": key,
+            "depth": depth,
+            "resolveRedirect": 1,
+        }
+        if fields is not None:
+            post_data["fields"] = fields
+        if bio_format is not None:
+            post_data["bioFormat"] = bio_format
+
+        async for _, _, person in self._stream_post(post_data):
+            yield person
+
+    async def stream_people(
+        self,
+        keys: Iterable[Union[str, int]],
+        fields: Optional[str] = None,
+        bio_format: Optional[str] = None,
+        siblings: bool = False,
+        ancestors: int = 0,
+        descendants: int = 0,
+        nuclear: int = 0,
+        min_generation: Optional[int] = None,
+        limit: Optional[int] = None,
+        start: Optional[int] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        The asynchronous generator version of WTSession.stream_people.
+
+        :param keys: Wanted WikiTree_IDs or User_IDs
+        :param fields: Comma separated list of required fields
+        :param bio_format: "wiki", "html", or "both"
+        :param siblings: Whether to get the siblings
+        :param ancestors: Number of generations of ancestors
+        :param descendants: Number of generations of descendants
+        :param nuclear: Number of generations of nuclear relatives
+        :param min_generation: Generation number to start at for relatives
+        :param limit: Maximum number of related profiles per chunk
+        :param start: Starting position in the related profiles of each chunk
+        """
+        for post_data in self._get_people_post_data(
+            keys,
+            fields=fields,
+            bio_format=bio_format,
+            siblings=siblings,
+            ancestors=ancestors,
+            descendants=descendants,
+            nuclear=nuclear,
+            min_generation=min_generation,
+            limit=limit,
+            start=start,
+        ):
+            async for _, _, person in self._stream_post(post_data):
+                yield person
+
+    async def get_people(
+        self,
+        keys: Iterable[Union[str, int]],
+        fields: Optional[str] = None,
+        bio_format: Optional[str] = None,
+        siblings: bool = False,
+        ancestors: int = 0,
+        descendants: int = 0,
+        nuclear: int = 0,
+        min_generation: Optional[int] = None,
+        limit: Optional[int] = None,
+        start: Optional[int] = None,
+        use_store: bool = True,
+    ) -> list:
+        """
+        The coroutine version of WTSession.get_people. The chunks are all
+        scheduled at once and the semaphore limits how many are in flight.
+
+        :param keys: Wanted WikiTree_IDs or User_IDs
+        :param fields: Comma separated list of required fields
+        :param bio_format: "wiki", "html", or "both"
+        :param siblings: Whether to get the siblings
+        :param ancestors: Number of generations of ancestors
+        :param descendants: Number of generations of descendants
+        :param nuclear: Number of generations of nuclear relatives
+        :param min_generation: Generation number to start at for relatives
+        :param limit: Maximum number of related profiles per chunk
+        :param start: Starting position in the related profiles of each chunk
+        :param use_store: Whether to use the profile store, if there is one
+        """
+        stored = None
+        if (
+            use_store
+            and self._store is not None
+            and bio_format is None
+            and not (siblings or ancestors or descendants or nuclear)
+        ):
+            stored, keys, fields = self._get_stored_people(keys, fields)
+
+        post_data_list = self._get_people_post_data(
+            keys,
+            fields=fields,
+            bio_format=bio_format,
+            siblings=siblings,
+            ancestors=ancestors,
+            descendants=descendants,
+            nuclear=nuclear,
+            min_generation=min_generation,
+            limit=limit,
+            start=start,
+        )
+        results = await asyncio.gather(
+            *(self._do_post(post_data) for post_data in post_data_list)
+        )
+
+        if stored is not None:
+            self._put_stored_people(results, fields)
+            results.append(stored)
+
+        return merge_people_results(results)
+
+    async def _get_people_pages(
+        self,
+        keys: Iterable[Union[str, int]],
+        page_size: int = GET_PEOPLE_MAX_LIMIT,
+        **kwargs,
+    ) -> AsyncIterator[dict]:
+        """
+        The coroutine version of WTSession._get_people_pages.
+        """
+        paged = bool(
+            kwargs.get("ancestors") or kwargs.get("descendants") or kwargs.get("nuclear")
+        )
+        if paged:
+            kwargs["limit"] = page_size
+
+        for post_data in self._get_people_post_data(keys, **kwargs):
+            start = 0
+            while True:
+                if paged:
+                    post_data["start"] = start
+                result = await self._do_post(post_data)
+                if not isinstance(result, list) or not result:
+                    LOGGER.error("getPeople returned no data for: %s", post_data["keys"])
+                    break
+                item = result[0]
+                if item.get("status"):
+                    LOGGER.error("getPeople failed: %s", item["status"])
+                    break
+                yield item
+
+                if not paged or count_related(item) < page_size:
+                    break
+                start += page_size
+
+    async def iter_people(
+        self,
+        keys: Iterable[Union[str, int]],
+        fields: Optional[str] = None,
+        bio_format: Optional[str] = None,
+        siblings: bool = False,
+        ancestors: int = 0,
+        descendants: int = 0,
+        nuclear: int = 0,
+        min_generation: Optional[int] = None,
+        page_size: int = GET_PEOPLE_MAX_LIMIT,
+        prefetch_pages: int = PREFETCH_PAGES_DEFAULT,
+    ) -> AsyncIterator[dict]:
+        """
+        The asynchronous generator version of WTSession.iter_people. Pages are
+        fetched by a background task, at most prefetch_pages ahead of the
+        caller.
+
+        :param keys: Wanted WikiTree_IDs or User_IDs
+        :param fields: Comma separated list of required fields
+        :param bio_format: "wiki", "html", or "both"
+        :param siblings: Whether to get the siblings
+        :param ancestors: Number of generations of ancestors
+        :param descendants: Number of generations of descendants
+        :param nuclear: Number of generations of nuclear relatives
+        :param min_generation: Generation number to start at for relatives
+        :param page_size: Number of related profiles per page, at most 1000
+        :param prefetch_pages: Number of pages fetched ahead of the caller
+        """
+        done = object()
+        pages = asyncio.Queue(maxsize=max(1, prefetch_pages))
+
+        async def produce() -> None:
+            try:
+                async for item in self._get_people_pages(
+                    keys,
+                    page_size=page_size,
+                    fields=fields,
+                    bio_format=bio_format,
+                    siblings=siblings,
+                    ancestors=ancestors,
+                    descendants=descendants,
+                    nuclear=nuclear,
+                    min_generation=min_generation,
+                ):
+                    await pages.put((item, None))
+            except Exception as error:  # pylint: disable=broad-except
+                await pages.put((done, error))
+                return
+            await pages.put((done, None))
+
+        producer = asyncio.ensure_future(produce())
+        seen_ids = set()
+        try:
+            while True:
+                item, error = await pages.get()
+                if item is done:
+                    if error is not None:
+                        raise error
+                    return
+                for person_id, person in (item.get("people") or {}).items():
+                    if person_id in seen_ids:
+                        continue
+                    seen_ids.add(person_id)
+                    yield person
+        finally:
+            producer.cancel()
+
+    async def map(
+        self,
+        method_name: str,
+        keys: Iterable[Union[str, int]],
+        max_concurrency: Optional[int] = None,
+        ordered: bool = True,
+        progress: Optional[ProgressCallback] = None,
+        **kwargs,
+    ) -> AsyncIterator[MapResult]:
+        """
+        The asynchronous generator version of WTSession.map. Calls a query
+        method once for each key and yields a MapResult for each.
+
+        :param method_name: The name of the method, e.g. "get_bio"
+        :param keys: The keys to call it with, passed as its first argument
+        :param max_concurrency: Number of calls made at the same time.
+                                Defaults to the session's max_concurrency.
+        :param ordered: Whether to yield results in the order of the keys
+        :param progress: Called with (done, total) after each call
+        :param kwargs: Other arguments passed to every call
+        """
+        method = self._map_method(method_name)
+        async for result in self._map(
+            lambda key: method(key, **kwargs), keys, max_concurrency, ordered, progress, method_name
+        ):
+            yield result
+
+    async def _map(
+        self,
+        function: Callable[[Any], Awaitable],
+        keys: Iterable,
+        max_concurrency: Optional[int],
+        ordered: bool,
+        progress: Optional[ProgressCallback],
+        name: str,
+    ) -> AsyncIterator[MapResult]:
+        """The engine of map: awaits function(key) for each key, see map."""
+        total = len(keys) if hasattr(keys, "__len__") else None
+        max_pending = max(1, max_concurrency or self._max_concurrency)
+
+        async def call(key) -> MapResult:
+            try:
+                return MapResult(key, await function(key))
+            except Exception as error:  # pylint: disable=broad-except
+                LOGGER.info("%s(%s) failed: %s", name, key, error)
+                return MapResult(key, error=error)
+
+        done_count = 0
+        keys = iter(keys)
+        pending = deque()
+        try:
+            while True:
+                for key in keys:
+                    pending.append(asyncio.ensure_future(call(key)))
+                    if len(pending) >= max_pending:
+                        break
+                if not pending:
+                    break
+
+                if ordered:
+                    finished = [await pending.popleft()]
+                else:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    finished = []
+                    for task in [task for task in pending if task in done]:
+                        pending.remove(task)
+                        finished.append(task.result())
+
+                for result in finished:
+                    done_count += 1
+                    if progress is not None:
+                        progress(done_count, total)
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def get_connections_many(
+        self,
+        pairs: Iterable[Tuple[Union[str, int], Union[str, int]]],
+        relation: Union[ConnectionRelation, int] = CONNECTION_RELATION_DEFAULT,
+        nopath: bool = True,
+        ignore_ids: Optional[Iterable[int]] = None,
+        fields: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        ordered: bool = False,
+        progress: Optional[ProgressCallback] = None,
+    ) -> AsyncIterator[MapResult]:
+        """
+        The asynchronous generator version of WTSession.get_connections_many.
+
+        :param pairs: (key1, key2) pairs of WikiTree_IDs or User_IDs
+        :param relation: The kind of path to find, see ConnectionRelation
+        :param nopath: Whether to return only the pathLength, not the path
+        :param ignore_ids: User_IDs the paths must not go through
+        :param fields: Comma separated list of fields of the path profiles
+        :param max_concurrency: Number of calls made at the same time.
+                                Defaults to the session's max_concurrency.
+        :param ordered: Whether to yield results in the order the pairs first appear
+        :param progress: Called with (done, total) after each call
+        """
+        groups = group_pairs(pairs)
+        ignore_ids = list(ignore_ids or ())
+
+        def call(pair: Tuple) -> Awaitable:
+            return self.get_connections(pair[0], pair[1], relation, ignore_ids, nopath, fields)
+
+        async for map_result in self._map(
+            call, groups, max_concurrency, ordered, progress, "get_connections"
+        ):
+            for result in answer_pairs(map_result, groups[map_result.key]):
+                yield result
@@ -0,0 +1,345 @@
+"""
+This module defines a benchmark suite for the client, run against the
+offline mock API of wt_mock, so results do not depend on the network or on
+api.wikitree.com and can be compared between changes:
+
+    python wt_bench.py --size 20000 --count 500 --latency 0.01
+    python wt_bench.py --json baseline.json
+    python wt_bench.py --compare baseline.json --tolerance 0.2
+
+Each benchmark fetches profiles of the synthetic tree in one way (one
+getPerson at a time, bulk getPeople, paginated iter_people, threaded map,
+asyncio) and reports:
+
+* throughput, in profiles and requests per second,
+* request latency percentiles (p50, p95, p99), from the instrumentation
+  hooks of wt_metrics,
+* peak Python memory, from a second run under tracemalloc (which slows
+  things down, so it is not timed).
+
+The mock runs in a process of its own so that it does not compete with the
+client for the GIL. With --compare, the exit status is 1 if any benchmark is
+slower than the baseline by more than the tolerance.
+"""
+
+# Standard Imports
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+# Local imports
+import wt_async
+from wt_async import AsyncWTSession
+from wt_metrics import Hooks
+from wt_mock import TREE_SEED_DEFAULT, start_mock_process
+import wt_session
+from wt_session import RateLimiter, RequestEvent, WTSession
+
+LOGGER = logging.getLogger(__name__)
+
+# The defaults of the command line options.
+BENCH_SIZE_DEFAULT = 20000
+BENCH_COUNT_DEFAULT = 500
+BENCH_WORKERS_DEFAULT = 8
+
+# The rate of the benchmark sessions' rate limiter; high enough never to wait.
+BENCH_RATE = 100000
+
+# The app id the benchmark sessions send.
+BENCH_APP_ID = "wt_bench"
+
+# The fields the benchmarks ask for.
+BENCH_FIELDS = "Id,Name,BirthDate"
+
+# The percentiles reported.
+PERCENTILES = (50, 95, 99)
+
+# The default slowdown allowed by --compare, as a fraction of the baseline.
+TOLERANCE_DEFAULT = 0.2
+
+
+@dataclass
+class BenchResult:
+    """The measurements of one benchmark."""
+
+    name: str
+    profiles: int
+    requests: int
+    seconds: float
+    p50: float
+    p95: float
+    p99: float
+    peak_memory: int = 0
+
+    @property
+    def profiles_per_second(self) -> float:
+        """Return the throughput in profiles per second."""
+        return self.profiles / self.seconds if self.seconds else 0.0
+
+    @property
+    def requests_per_second(self) -> float:
+        """Return the throughput in requests per second."""
+        return self.requests / self.seconds if self.seconds else 0.0
+
+
+class LatencyRecorder(Hooks):
+    """Keeps the latency of every successful request."""
+
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+
+    def on_request(self, event: RequestEvent) -> None:
+        if event.status_code:
+            # list.append is atomic, so no lock is needed.
+            self.latencies.append(event.connect + event.wait + event.download + event.decode)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Returns a percentile of the latencies, in seconds (nearest rank).
+
+        :param percent: The percentile, from 0 to 100.
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(0, min(len(ordered) - 1, int(round(percent / 100 * len(ordered))) - 1))
+        return ordered[rank]
+
+
+# --- Benchmarks ---
+#
+# Each takes a session, the Ids to fetch and the number of workers, and
+# returns the number of profiles fetched.
+
+
+def bench_get_person(session: WTSession, ids: List[int], workers: int) -> int:
+    """One getPerson call after another."""
+    count = 0
+    for person_id in ids:
+        count += bool(session.get_person(person_id, fields=BENCH_FIELDS)[0].get("person"))
+    return count
+
+
+def bench_get_people(session: WTSession, ids: List[int], workers: int) -> int:
+    """One get_people call for all the Ids, split into parallel chunks."""
+    result = session.get_people(
+        ids, fields=BENCH_FIELDS, max_workers=workers, use_store=False
+    )
+    return len(result[0]["people"])
+
+
+def bench_iter_people(session: WTSession, ids: List[int], workers: int) -> int:
+    """The descendants of the first founders, page by page."""
+    count = 0
+    people = session.iter_people(ids[:2], fields=BENCH_FIELDS, descendants=10, page_size=100)
+    for _ in people:
+        count += 1
+        if count >= len(ids) * 10:
+            break
+    return count
+
+
+def bench_map(session: WTSession, ids: List[int], workers: int) -> int:
+    """getPerson calls on a thread pool."""
+    count = 0
+    for result in session.map("get_person", ids, max_workers=workers, fields=BENCH_FIELDS):
+        count += result.ok
+    return count
+
+
+def bench_async(session: WTSession, ids: List[int], workers: int) -> int:
+    """getPerson calls from asyncio, workers at a time."""
+
+    async def run() -> int:
+        async with AsyncWTSession(
+            BENCH_APP_ID,
+            max_concurrency=workers,
+            rate_limiter=session._rate_limiter,  # pylint: disable=protected-access
+            hooks=session._hooks,  # pylint: disable=protected-access
+        ) as async_session:
+            results = await asyncio.gather(
+                *(async_session.get_person(person_id, fields=BENCH_FIELDS) for person_id in ids)
+            )
+        return sum(1 for result in results if result and result[0].get("person"))
+
+    return asyncio.run(run())
+
+
+# The benchmarks, by name, in the order they run.
+BENCHMARKS: Dict[str, Callable[[WTSession, List[int], int], int]] = {
+    "get_person": bench_get_person,
+    "get_people": bench_get_people,
+    "iter_people": bench_iter_people,
+    "map": bench_map,
+    "async": bench_async,
+}
+
+
+def _session(hooks: Optional[Hooks] = None) -> WTSession:
+    """Returns a session whose rate limiter never holds it back."""
+    return WTSession(
+        BENCH_APP_ID, rate_limiter=RateLimiter(rate=BENCH_RATE, max_rate=BENCH_RATE), hooks=hooks
+    )
+
+
+def run_benchmark(name: str, ids: List[int], workers: int, memory: bool = True) -> BenchResult:
+    """
+    Runs one benchmark against the API_URL set, and returns its measurements.
+
+    :param name: The name of the benchmark, a key of BENCHMARKS.
+    :param ids: The Ids to fetch.
+    :param workers: The number of requests at a time, where that applies.
+    :param memory: Whether to run it again under tracemalloc for the peak memory.
+    """
+    benchmark = BENCHMARKS[name]
+    recorder = LatencyRecorder()
+    session = _session(recorder)
+    start = time.perf_counter()
+    profiles = benchmark(session, ids, workers)
+    seconds = time.perf_counter() - start
+    percentiles = [recorder.percentile(percent) for percent in PERCENTILES]
+    result = BenchResult(name, profiles, len(recorder.latencies), seconds, *percentiles)
+
+    if memory:
+        session = _session()
+        tracemalloc.start()
+        try:
+            benchmark(session, ids, workers)
+            result.peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_benchmarks(
+    names: Optional[List[str]] = None,
+    size: int = BENCH_SIZE_DEFAULT,
+    count: int = BENCH_COUNT_DEFAULT,
+    workers: int = BENCH_WORKERS_DEFAULT,
+    memory: bool = True,
+    **mock_options,
+) -> List[BenchResult]:
+    """
+    Starts a mock API in its own process, runs the benchmarks against it and
+    returns their measurements.
+
+    :param names: The benchmarks to run, all of them by default.
+    :param size: The number of people in the synthetic tree.
+    :param count: The number of profiles each benchmark fetches.
+    :param workers: The number of requests at a time, where that applies.
+    :param memory: Whether to measure the peak memory too.
+    :param mock_options: The options of wt_mock.MockAPI, such as latency.
+    """
+    process, url = start_mock_process(size, TREE_SEED_DEFAULT, **mock_options)
+    api_urls = wt_session.API_URL, wt_async.API_URL
+    wt_session.API_URL = wt_async.API_URL = url
+    # Spread the Ids over the whole tree, founders first.
+    step = max(1, size // count)
+    ids = list(range(1, size + 1, step))[:count]
+    try:
+        results = []
+        for name in names or list(BENCHMARKS):
+            LOGGER.info("Running %s", name)
+            results.append(run_benchmark(name, ids, workers, memory))
+        return results
+    finally:
+        wt_session.API_URL, wt_async.API_URL = api_urls
+        process.terminate()
+        process.join()
+
+
+def format_results(results: List[BenchResult]) -> str:
+    """Returns the measurements as a table."""
+    lines = [
+        f"{'benchmark':<12} {'profiles':>9} {'requests':>9} {'seconds':>8} {'prof/s':>9} "
+        f"{'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak KiB':>9}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.name:<12} {result.profiles:>9} {result.requests:>9} {result.seconds:>8.3f} "
+            f"{result.profiles_per_second:>9.0f} {result.requests_per_second:>8.0f} "
+            f"{result.p50 * 1000:>8.2f} {result.p95 * 1000:>8.2f} {result.p99 * 1000:>8.2f} "
+            f"{result.peak_memory // 1024:>9}"
+        )
+    return "\n".join(lines)
+
+
+def compare_results(
+    results: List[BenchResult], baseline: List[dict], tolerance: float
+) -> List[str]:
+    """
+    Returns a message for each benchmark whose throughput fell below the
+    baseline by more than the tolerance.
+
+    :param results: The new measurements.
+    :param baseline: Earlier measurements, as saved with --json.
+    :param tolerance: The slowdown allowed, as a fraction of the baseline.
+    """
+    before = {entry["name"]: entry for entry in baseline}
+    regressions = []
+    for result in results:
+        entry = before.get(result.name)
+        if entry is None or not entry["seconds"]:
+            continue
+        old = entry["profiles"] / entry["seconds"]
+        if result.profiles_per_second < old * (1 - tolerance):
+            regressions.append(
+                f"{result.name}: {result.profiles_per_second:.0f} profiles/s, "
+                f"baseline {old:.0f} profiles/s"
+            )
+    return regressions
+
+
+def main() -> int:
+    """Runs the benchmarks from the command line and returns the exit status."""
+    parser = argparse.ArgumentParser(description="Benchmarks of the WikiTree API client")
+    parser.add_argument("benchmarks", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--size", type=int, default=BENCH_SIZE_DEFAULT, help="people in the tree")
+    parser.add_argument("--count", type=int, default=BENCH_COUNT_DEFAULT, help="profiles each")
+    parser.add_argument("--workers", type=int, default=BENCH_WORKERS_DEFAULT, help="at a time")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added by the mock")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds")
+    parser.add_argument("--rate-limit", type=float, default=None, help="mock requests per second")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--json", metavar="FILE", help="save the measurements to FILE")
+    parser.add_argument("--compare", metavar="FILE", help="compare with a --json FILE")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_DEFAULT, help="slowdown")
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+
+    logging.basicConfig(level=logging.ERROR)
+    results = run_benchmarks(
+        args.benchmarks,
+        args.size,
+        args.count,
+        args.workers,
+        not args.no_memory,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+    )
+    print(format_results(results))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump([asdict(result) for result in results], file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare_results(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
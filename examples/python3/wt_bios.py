@@ -0,0 +1,197 @@
+"""
+This module defines lazy, batched loading of profile biographies.
+
+Bios are by far the largest part of a profile, and most traversals never
+read them. Fetch profiles without the Bio field, and ask a BioLoader for the
+bios that are actually needed:
+
+    loader = BioLoader(wt_session, bio_format="html")
+    bios = {person["Id"]: loader.request(person["Id"], person["Touched"]) for person in people}
+    ...
+    print(bios[some_id].text)
+
+request() does not send anything. The first read of any requested bio
+fetches every bio requested so far, with getPeople calls that ask for only
+the Bio field, up to 1000 profiles per call. Loaded bios are kept with the
+profile's Touched timestamp, and served again for as long as it matches.
+
+A RecordSet created with a BioLoader loads Person.bio this way.
+"""
+
+# Standard Imports
+from collections import OrderedDict
+from concurrent.futures import Future
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+# Local imports
+from wt_session import MAX_WORKERS_DEFAULT, WTSession
+
+LOGGER = logging.getLogger(__name__)
+
+# The fields bios are fetched with. Touched goes with them into the cache.
+BIO_FETCH_FIELDS = "Id,Touched,Bio"
+
+# The fields of a fetched profile that are not part of the bio.
+NON_BIO_FIELDS = frozenset(["Id", "Name", "Touched"])
+
+# The field holding the rendered bio, with bioFormat "html" or "both".
+BIO_HTML_FIELD = "bioHTML"
+
+# The default number of bios kept in memory.
+BIO_CACHE_ENTRIES_DEFAULT = 10000
+
+
+class LazyBio:
+    """A requested bio. Reading it fetches all bios requested so far."""
+
+    __slots__ = ("_loader", "_future")
+
+    def __init__(self, loader: "BioLoader", future: Future) -> None:
+        self._loader = loader
+        self._future = future
+
+    @property
+    def fields(self) -> dict:
+        """
+        Return the bio fields of the profile (Bio, and bioHTML if asked for),
+        or an empty dictionary if the bio could not be seen.
+        """
+        if not self._future.done():
+            self._loader.flush()
+        return self._future.result()
+
+    @property
+    def text(self) -> Optional[str]:
+        """Return the bio in the loader's format, rendered HTML for "html"."""
+        fields = self.fields
+        if self._loader.bio_format == "html" and BIO_HTML_FIELD in fields:
+            return fields[BIO_HTML_FIELD]
+        return fields.get("Bio")
+
+    def __str__(self) -> str:
+        return self.text or ""
+
+
+class BioLoader:
+    """
+    Loads bios on demand, in batches, and keeps them with the Touched
+    timestamp of their profile. It can be shared between threads.
+    """
+
+    def __init__(
+        self,
+        session: WTSession,
+        bio_format: Optional[str] = None,
+        max_entries: int = BIO_CACHE_ENTRIES_DEFAULT,
+        max_workers: int = MAX_WORKERS_DEFAULT,
+    ) -> None:
+        """
+        :param session: The session used to fetch the bios.
+        :param bio_format: "wiki", "html", or "both"
+        :param max_entries: The number of bios kept in memory.
+        :param max_workers: Number of getPeople calls made at the same time.
+        """
+        self._session = session
+        self._bio_format = bio_format
+        self._max_entries = max_entries
+        self._max_workers = max_workers
+
+        self._lock = threading.Lock()
+        # Id -> Future of the bio fields, for requests not sent yet.
+        self._pending: Dict[int, Future] = {}
+        # Id -> (Touched, bio fields), least recently used first.
+        self._cache: "OrderedDict[int, Tuple[Optional[str], dict]]" = OrderedDict()
+
+    @property
+    def bio_format(self) -> Optional[str]:
+        """Return the bioFormat the bios are fetched with."""
+        return self._bio_format
+
+    def request(self, person_id: Union[str, int], touched: Optional[str] = None) -> LazyBio:
+        """
+        Requests the bio of a profile, without fetching it yet. A bio already
+        loaded is used if its Touched matches, or if touched is not given.
+
+        :param person_id: The Id (User ID) of the profile.
+        :param touched: The Touched timestamp of the profile, if known.
+        """
+        person_id = int(person_id)
+        future = Future()
+        with self._lock:
+            cached = self._cache.get(person_id)
+            if cached is not None and (touched is None or cached[0] == touched):
+                self._cache.move_to_end(person_id)
+                future.set_result(cached[1])
+            elif person_id in self._pending:
+                future = self._pending[person_id]
+            else:
+                self._pending[person_id] = future
+        return LazyBio(self, future)
+
+    def request_many(self, people: Iterable[dict]) -> Dict[int, LazyBio]:
+        """
+        Requests the bios of profiles, by Id.
+
+        :param people: The profiles, with at least Id and preferably Touched.
+        """
+        return {
+            int(person["Id"]): self.request(person["Id"], person.get("Touched"))
+            for person in people
+            if person.get("Id")
+        }
+
+    def get(self, person_id: Union[str, int], touched: Optional[str] = None) -> dict:
+        """
+        Returns the bio fields of a profile, fetching it, and every other
+        requested bio, if needed.
+
+        :param person_id: The Id (User ID) of the profile.
+        :param touched: The Touched timestamp of the profile, if known.
+        """
+        return self.request(person_id, touched).fields
+
+    def flush(self) -> None:
+        """Fetches every requested bio that has not been fetched yet."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if batch:
+            self._fetch(batch)
+
+    def _fetch(self, batch: Dict[int, Future]) -> None:
+        """Fetches a batch of bios and resolves their futures."""
+        LOGGER.debug("Fetching %d bios.", len(batch))
+        try:
+            result = self._session.get_people(
+                list(batch),
+                fields=BIO_FETCH_FIELDS,
+                bio_format=self._bio_format,
+                max_workers=self._max_workers,
+                use_store=False,
+            )
+            result_by_key = result[0]["resultByKey"]
+            people = result[0]["people"]
+        except Exception as error:  # pylint: disable=broad-except
+            for future in batch.values():
+                future.set_exception(error)
+            return
+
+        loaded = []
+        for person_id, future in batch.items():
+            # Follow redirections to the profile actually returned.
+            found_id = (result_by_key.get(str(person_id)) or {}).get("Id", person_id)
+            person = people.get(str(found_id))
+            if person is None:
+                future.set_result({})
+                continue
+            fields = {key: value for key, value in person.items() if key not in NON_BIO_FIELDS}
+            loaded.append((person_id, person.get("Touched"), fields))
+            future.set_result(fields)
+
+        with self._lock:
+            for person_id, touched, fields in loaded:
+                self._cache[person_id] = (touched, fields)
+                self._cache.move_to_end(person_id)
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
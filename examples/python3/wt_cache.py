@@ -0,0 +1,212 @@
+"""
+This module defines an in-memory cache for WikiTree API responses.
+
+Pass a ResponseCache to WTSession (or AsyncWTSession) and repeated queries
+are answered from memory instead of the network:
+
+    wt_session = WTSession(app_id="MyApp", cache=ResponseCache())
+
+Entries are keyed on the normalized post data and on who is logged in, since
+privacy changes what the API returns. Only the read-only actions are cached;
+clientLogin and anything unknown always goes to the network.
+"""
+
+# Standard Imports
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+# The actions whose responses may be cached.
+CACHEABLE_ACTIONS = frozenset(
+    [
+        "getProfile",
+        "getPerson",
+        "getPeople",
+        "getBio",
+        "getPhotos",
+        "getAncestors",
+        "getDescendants",
+        "getRelatives",
+        "getWatchlist",
+        "getDNATestsByTestTaker",
+        "getConnectedProfilesByDNATest",
+        "getConnectedDNATestsByProfile",
+        "getCategories",
+        "getConnections",
+        "searchPerson",
+    ]
+)
+
+# Post data that does not change the response.
+IGNORED_PARAMS = frozenset(["appId"])
+
+# Post data holding comma separated lists, where the order does not matter.
+LIST_PARAMS = frozenset(["fields", "ignoreIds", "keys"])
+
+# Actions where the order of the keys does matter: getConnections returns the
+# path from the first key to the second.
+ORDERED_KEYS_ACTIONS = frozenset(["getConnections"])
+
+# The default time to live of a cache entry, in seconds.
+TTL_DEFAULT = 600.0
+
+# The default time to live of some actions, in seconds. The watchlist is
+# the view most likely to change under us.
+ACTION_TTL_DEFAULT = {"getWatchlist": 60.0}
+
+# The default limits on the number of entries and the bytes of response
+# bodies held in the cache.
+MAX_ENTRIES_DEFAULT = 10000
+MAX_BYTES_DEFAULT = 64 * 1024 * 1024
+
+
+@dataclass
+class CacheStats:
+    """A snapshot of the cache counters."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class ResponseCache:
+    """
+    A thread-safe LRU cache of raw API response bodies, with a time to live
+    per action and bounds on both the number of entries and their total size.
+
+    The raw body is stored, rather than the decoded result, so the size bound
+    is exact and every caller gets its own freshly decoded copy.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES_DEFAULT,
+        max_bytes: int = MAX_BYTES_DEFAULT,
+        ttl: float = TTL_DEFAULT,
+        action_ttl: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param max_entries: The maximum number of cached responses.
+        :param max_bytes: The maximum total size of the cached bodies.
+        :param ttl: Seconds an entry stays valid, unless set per action.
+        :param action_ttl: Seconds an entry stays valid, by action. Defaults
+                           to ACTION_TTL_DEFAULT.
+        :param clock: The time source, in seconds.
+        """
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._action_ttl = dict(ACTION_TTL_DEFAULT if action_ttl is None else action_ttl)
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        # key -> (expiry time, body)
+        self._entries: "OrderedDict[Tuple, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = CacheStats()
+
+    @staticmethod
+    def make_key(post_data: dict, viewer: Optional[str] = None) -> Optional[Tuple]:
+        """
+        Returns the cache key for the post data, or None if the action must
+        not be cached.
+
+        :param post_data: The post data of the request.
+        :param viewer: Who is logged in, or None if nobody is.
+        """
+        if post_data.get("action") not in CACHEABLE_ACTIONS:
+            return None
+
+        ordered_keys = post_data["action"] in ORDERED_KEYS_ACTIONS
+        items = []
+        for name, value in post_data.items():
+            if name in IGNORED_PARAMS:
+                continue
+            value = str(value)
+            if name in LIST_PARAMS and not (name == "keys" and ordered_keys):
+                value = ",".join(sorted(part.strip() for part in value.split(",")))
+            items.append((name, value))
+        items.sort()
+
+        return (viewer, tuple(items))
+
+    def get(self, post_data: dict, viewer: Optional[str] = None) -> Optional[bytes]:
+        """
+        Returns the cached body for the post data, or None.
+
+        :param post_data: The post data of the request.
+        :param viewer: Who is logged in, or None if nobody is.
+        """
+        key = self.make_key(post_data, viewer)
+        if key is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            expiry, body = entry
+            if expiry <= self._clock():
+                self._remove(key)
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return body
+
+    def put(self, post_data: dict, body: bytes, viewer: Optional[str] = None) -> None:
+        """
+        Stores the body for the post data, evicting the least recently used
+        entries as needed.
+
+        :param post_data: The post data of the request.
+        :param body: The raw response body.
+        :param viewer: Who is logged in, or None if nobody is.
+        """
+        key = self.make_key(post_data, viewer)
+        if key is None or len(body) > self._max_bytes:
+            return
+
+        ttl = self._action_ttl.get(post_data["action"], self._ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + ttl, body)
+            self._bytes += len(body)
+
+            while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats.evictions += 1
+
+    def _remove(self, key: Tuple) -> None:
+        """Removes one entry. The lock must be held."""
+        _, body = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def clear(self) -> None:
+        """Removes all entries. The counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                expirations=self._stats.expirations,
+                entries=len(self._entries),
+                bytes=self._bytes,
+            )
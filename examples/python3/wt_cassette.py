@@ -0,0 +1,418 @@
+"""
+This module defines record and replay transports for WTSession, to run a
+pipeline against real API responses at full speed, with no network, and the
+same way every time.
+
+Record a run once:
+
+    with RecordingTransport("run.cassette") as transport:
+        wt_session = WTSession(app_id="MyApp", transport=transport)
+        ...
+
+and replay it as often as needed:
+
+    with ReplayTransport("run.cassette") as transport:
+        wt_session = WTSession(app_id="MyApp", transport=transport)
+        ...
+
+Every request the session posts, streamed or not, retries and logins
+included, is recorded with its response. Requests are matched on their
+normalized post data (as for wt_cache.ResponseCache), with the appId and
+the login credentials left out, and on who is logged in. A request recorded
+more than once gets its responses back in the order they were recorded, and
+the last one after that. A request that is not in the cassette raises
+CassetteMissError.
+
+A cassette is a single file: the records, each body compressed with zlib
+against a dictionary of the profile field names, followed by an index sorted
+by request hash. The replay transport memory-maps the file and looks requests
+up in the index by binary search, so opening a cassette takes the same time
+whatever its size, and only the responses replayed are read and decompressed.
+
+The login cookies that would let someone else act as the user (the session
+and token cookies) and the authcode are not written to the cassette.
+
+It requires the requests library, as wt_session does.
+"""
+
+# Standard Imports
+from datetime import timedelta
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+import zlib
+
+# Third party imports
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Local imports
+from wt_cache import IGNORED_PARAMS, LIST_PARAMS, ORDERED_KEYS_ACTIONS
+from wt_export import PROFILE_SCHEMA
+from wt_session import HTTPTransport
+
+LOGGER = logging.getLogger(__name__)
+
+# The first bytes of a cassette, and the last bytes of its index footer.
+CASSETTE_MAGIC = b"WTCASS1\n"
+INDEX_MAGIC = b"WTCIDX1\n"
+
+# A record: request hash, HTTP status, length of the metadata JSON and of the
+# compressed body. The metadata and the body follow.
+RECORD_HEADER = struct.Struct("<16sHII")
+
+# An index entry: request hash, sequence number of the recording of that
+# request, offset of the record.
+INDEX_ENTRY = struct.Struct("<16sIQ")
+
+# The footer: offset of the index, number of entries, INDEX_MAGIC.
+FOOTER = struct.Struct("<QI8s")
+
+# The size of a request hash.
+DIGEST_SIZE = 16
+
+# Post data that is left out of the match: the credentials of clientLogin.
+CREDENTIAL_PARAMS = frozenset(["wpEmail", "wpPassword", "authcode"])
+
+# Response headers kept in the cassette.
+RECORDED_HEADERS = ("Content-Type", "Location", "Retry-After")
+
+# Login cookies whose values are not written to the cassette.
+SECRET_COOKIES = frozenset(["wikitree_wtb__session", "wikitree_wtb_Token"])
+
+# What secret values are replaced with.
+REDACTED = "redacted"
+
+# The cookie that tells who is logged in.
+USER_ID_COOKIE = "wikitree_wtb_UserID"
+
+# The zlib compression level of the bodies.
+COMPRESS_LEVEL = 6
+
+# The preset zlib dictionary: what most response bodies are made of. Changing
+# it makes existing cassettes unreadable, so it goes with CASSETTE_MAGIC.
+ZDICT = json.dumps(
+    {
+        "status": 0,
+        "people": {},
+        "resultByKey": {},
+        "person": {field: "" for field, _ in PROFILE_SCHEMA},
+        "Parents": {},
+        "Children": {},
+        "Siblings": {},
+        "Spouses": {},
+    }
+).encode("utf-8")
+
+
+class CassetteError(Exception):
+    """Raised when a file is not a cassette, or a broken one."""
+
+
+class CassetteMissError(LookupError):
+    """Raised on replay for a request that is not in the cassette."""
+
+
+def request_digest(post_data: dict, viewer: Optional[str] = None) -> bytes:
+    """
+    Returns the hash a request is matched on: that of its normalized post
+    data, without the appId and credentials, and of who is logged in.
+
+    :param post_data: The post data of the request.
+    :param viewer: The user id of who is logged in, or None if nobody is.
+    """
+    ordered_keys = post_data.get("action") in ORDERED_KEYS_ACTIONS
+    items = []
+    for name, value in post_data.items():
+        if name in IGNORED_PARAMS or name in CREDENTIAL_PARAMS:
+            continue
+        value = str(value)
+        if name in LIST_PARAMS and not (name == "keys" and ordered_keys):
+            value = ",".join(sorted(part.strip() for part in value.split(",")))
+        items.append((name, value))
+    items.sort()
+    key = json.dumps([viewer, items], separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(key, digest_size=DIGEST_SIZE).digest()
+
+
+def _viewer(cookies: requests.cookies.RequestsCookieJar) -> Optional[str]:
+    """Returns who the cookies are logged in as, or None."""
+    return cookies.get(USER_ID_COOKIE)
+
+
+def _redact_location(location: str) -> str:
+    """Returns a Location header with the authcode taken out."""
+    start = location.find("authcode=")
+    if start < 0:
+        return location
+    start += len("authcode=")
+    end = location.find("&", start)
+    return location[:start] + REDACTED + (location[end:] if end >= 0 else "")
+
+
+class RecordingTransport:
+    """
+    A transport that sends requests with another transport and writes every
+    request and response to a cassette. Use it as a context manager, or call
+    close() at the end: the index is written then, and without it the
+    cassette has to be scanned when it is replayed.
+
+    Streamed responses are read whole before they are handed on, so they are
+    not streamed while recording.
+    """
+
+    def __init__(self, path: str, transport: Optional[HTTPTransport] = None) -> None:
+        """
+        :param path: The cassette file. An existing one is overwritten.
+        :param transport: The transport to send the requests with. Defaults to
+                          an HTTPTransport with the default pool and timeouts.
+        """
+        self._path = path
+        self._transport = transport if transport is not None else HTTPTransport()
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")  # pylint: disable=consider-using-with
+        self._file.write(CASSETTE_MAGIC)
+        # (request hash, sequence number, offset) of every record.
+        self._index: List[Tuple[bytes, int, int]] = []
+        self._sequences: Dict[bytes, int] = {}
+
+    @property
+    def cookies(self) -> requests.cookies.RequestsCookieJar:
+        """Return the cookie jar of the wrapped transport."""
+        return self._transport.cookies
+
+    @property
+    def connect_time(self) -> float:
+        """Return the connect time of the wrapped transport's last post()."""
+        return getattr(self._transport, "connect_time", 0.0)
+
+    @property
+    def records(self) -> int:
+        """Return the number of requests recorded so far."""
+        return len(self._index)
+
+    def post(
+        self, url: str, data: dict, allow_redirects: bool = True, stream: bool = False
+    ) -> requests.Response:
+        """
+        POSTs the data with the wrapped transport, records the exchange and
+        returns the response.
+
+        :param url: The URL to post to.
+        :param data: The form data.
+        :param allow_redirects: Whether to follow redirections.
+        :param stream: Whether the caller reads the body with iter_content.
+        """
+        digest = request_digest(data, _viewer(self.cookies))
+        response = self._transport.post(
+            url, data=data, allow_redirects=allow_redirects, stream=stream
+        )
+        # Reading the body makes iter_content hand out the read copy.
+        body = response.content
+
+        headers = {}
+        for name in RECORDED_HEADERS:
+            if name in response.headers:
+                headers[name] = response.headers[name]
+        if "Location" in headers:
+            headers["Location"] = _redact_location(headers["Location"])
+        cookies = {
+            cookie.name: REDACTED if cookie.name in SECRET_COOKIES else cookie.value
+            for cookie in response.cookies
+        }
+        meta = json.dumps(
+            {"action": data.get("action"), "headers": headers, "cookies": cookies},
+            separators=(",", ":"),
+        ).encode("utf-8")
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zdict=ZDICT)
+        compressed = compressor.compress(body) + compressor.flush()
+
+        with self._lock:
+            if self._file is None:
+                raise ValueError("The cassette is closed")
+            offset = self._file.tell()
+            self._file.write(
+                RECORD_HEADER.pack(digest, response.status_code, len(meta), len(compressed))
+            )
+            self._file.write(meta)
+            self._file.write(compressed)
+            sequence = self._sequences.get(digest, 0)
+            self._sequences[digest] = sequence + 1
+            self._index.append((digest, sequence, offset))
+        return response
+
+    def close(self) -> None:
+        """Writes the index, closes the cassette and the wrapped transport."""
+        with self._lock:
+            if self._file is None:
+                return
+            index_offset = self._file.tell()
+            self._index.sort()
+            for digest, sequence, offset in self._index:
+                self._file.write(INDEX_ENTRY.pack(digest, sequence, offset))
+            self._file.write(FOOTER.pack(index_offset, len(self._index), INDEX_MAGIC))
+            self._file.close()
+            self._file = None
+        self._transport.close()
+        LOGGER.info("Recorded %d requests to %s.", len(self._index), self._path)
+
+    def __enter__(self) -> "RecordingTransport":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ReplayTransport:
+    """
+    A transport that answers requests from a cassette, without any network.
+    Thread safe; lookups are a binary search of the memory-mapped index.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: The cassette file.
+        """
+        self._path = path
+        self._cookies = requests.cookies.RequestsCookieJar()
+        self._lock = threading.Lock()
+        # How many times each request has been replayed.
+        self._replays: Dict[bytes, int] = {}
+
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size < len(CASSETTE_MAGIC):
+                raise CassetteError(f"{path} is not a cassette")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(CASSETTE_MAGIC)] != CASSETTE_MAGIC:
+            self._map.close()
+            raise CassetteError(f"{path} is not a cassette")
+
+        # A cassette cut short may be too small to have a footer at all.
+        index_offset, count, magic = 0, 0, None
+        if len(self._map) >= len(CASSETTE_MAGIC) + FOOTER.size:
+            index_offset, count, magic = FOOTER.unpack_from(
+                self._map, len(self._map) - FOOTER.size
+            )
+        index_end = index_offset + count * INDEX_ENTRY.size
+        if magic == INDEX_MAGIC and index_end <= len(self._map) - FOOTER.size:
+            self._index = memoryview(self._map)[index_offset:index_end]
+            self._count = count
+        else:
+            LOGGER.warning("%s has no index, it was not closed after recording; scanning it.", path)
+            self._index, self._count = self._scan()
+
+    def _scan(self) -> Tuple[bytes, int]:
+        """Builds the index of a cassette whose recording was cut short."""
+        sequences: Dict[bytes, int] = {}
+        entries = []
+        offset = len(CASSETTE_MAGIC)
+        size = len(self._map)
+        while offset + RECORD_HEADER.size <= size:
+            digest, _, meta_size, body_size = RECORD_HEADER.unpack_from(self._map, offset)
+            end = offset + RECORD_HEADER.size + meta_size + body_size
+            if end > size:
+                break
+            sequence = sequences.get(digest, 0)
+            sequences[digest] = sequence + 1
+            entries.append((digest, sequence, offset))
+            offset = end
+        entries.sort()
+        index = b"".join(INDEX_ENTRY.pack(*entry) for entry in entries)
+        return index, len(entries)
+
+    @property
+    def cookies(self) -> requests.cookies.RequestsCookieJar:
+        """Return the cookie jar, which holds the replayed login cookies."""
+        return self._cookies
+
+    @property
+    def connect_time(self) -> float:
+        """Return 0, replays open no connections."""
+        return 0.0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _find(self, digest: bytes, sequence: int) -> Optional[int]:
+        """
+        Returns the offset of the record of a request with the highest
+        sequence number up to the one given, or None if it was not recorded.
+        """
+        low, high = 0, self._count
+        # The first entry not below (digest, sequence + 1).
+        while low < high:
+            middle = (low + high) // 2
+            entry_digest, entry_sequence, _ = INDEX_ENTRY.unpack_from(
+                self._index, middle * INDEX_ENTRY.size
+            )
+            if (entry_digest, entry_sequence) <= (digest, sequence):
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+        entry_digest, _, offset = INDEX_ENTRY.unpack_from(self._index, (low - 1) * INDEX_ENTRY.size)
+        return offset if entry_digest == digest else None
+
+    def post(
+        self, url: str, data: dict, allow_redirects: bool = True, stream: bool = False
+    ) -> requests.Response:
+        """
+        Returns the recorded response to the data.
+
+        :param url: The URL, which is not matched on.
+        :param data: The form data.
+        :param allow_redirects: Not used, the recorded response is returned.
+        :param stream: Not used, iter_content works on every response.
+        """
+        digest = request_digest(data, _viewer(self._cookies))
+        with self._lock:
+            sequence = self._replays.get(digest, 0)
+            self._replays[digest] = sequence + 1
+        offset = self._find(digest, sequence)
+        if offset is None:
+            raise CassetteMissError(f"{data.get('action')} request not in {self._path}: {data}")
+
+        _, status, meta_size, body_size = RECORD_HEADER.unpack_from(self._map, offset)
+        start = offset + RECORD_HEADER.size
+        meta = json.loads(self._map[start:start + meta_size])
+        start += meta_size
+        decompressor = zlib.decompressobj(zdict=ZDICT)
+        body = decompressor.decompress(self._map[start:start + body_size]) + decompressor.flush()
+
+        for name, value in meta["cookies"].items():
+            self._cookies.set(name, value)
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.url = url
+        response.encoding = "utf-8"
+        response.elapsed = timedelta(0)
+        # The body is already read, as if it had been; iter_content slices it.
+        response._content = body  # pylint: disable=protected-access
+        response._content_consumed = True  # pylint: disable=protected-access
+        request = requests.models.PreparedRequest()
+        request.method = "POST"
+        request.url = url
+        request.body = urlencode(data)
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        """Unmaps the cassette."""
+        if isinstance(self._index, memoryview):
+            self._index.release()
+        self._map.close()
+
+    def __enter__(self) -> "ReplayTransport":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
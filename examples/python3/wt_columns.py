@@ -0,0 +1,329 @@
+"""
+This module defines NumPy column views over sets of profiles, for analysis.
+
+Looping over thousands of profile dictionaries in Python to get at birth
+years, lifespans or genders is slow. ProfileColumns reads the profiles once
+into NumPy arrays, one per field, and the analysis then runs on whole columns:
+
+    columns = ProfileColumns.from_profiles(wt_session.iter_people(keys, fields=COLUMN_FIELDS))
+    born = columns.born_between(1800, 1850)
+    print(numpy.nanmean(columns.lifespan()[born]))
+
+Dates become separate year, month and day columns, with 0 where a part is
+unknown (as in "1850-00-00", or "0000-00-00" for no date at all); the
+*_known masks tell which are set.
+
+It needs NumPy.
+"""
+
+# Standard Imports
+from array import array
+import logging
+from typing import Any, Iterable, Optional, Tuple, Union
+
+# Third party imports
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Local imports
+from wt_export import iter_export_profiles
+from wt_graph import GENDER_CODES, GENDER_UNKNOWN, relative_id
+
+LOGGER = logging.getLogger(__name__)
+
+# The fields to request for profiles that go into ProfileColumns.
+COLUMN_FIELDS = "Id,Name,Gender,BirthDate,DeathDate,Father,Mother,Privacy"
+
+# The value of an unknown parent, and of a person not in the columns.
+NO_PERSON = 0
+NO_INDEX = -1
+
+
+def split_date(date: Optional[str]) -> Tuple[int, int, int]:
+    """
+    Splits a "YYYY-MM-DD", "YYYY-MM" or "YYYY" date into (year, month, day),
+    with 0 for the parts that are unknown or unparsable.
+
+    :param date: The date, as returned by the API.
+    """
+    if not date:
+        return 0, 0, 0
+    parts = str(date).split("-", 2)
+    values = []
+    for part in parts:
+        try:
+            values.append(int(part))
+        except ValueError:
+            values.append(0)
+    values += [0] * (3 - len(values))
+    return values[0], values[1], values[2]
+
+
+class ProfileColumns:
+    """
+    A set of profiles as NumPy columns, one row per profile:
+
+    * id, father, mother (int64, NO_PERSON when there is none)
+    * gender (int8, the GENDER_ codes of wt_graph)
+    * privacy (int16, 0 when not returned)
+    * birth_year, birth_month, birth_day, death_year, death_month, death_day
+      (int16, 0 when unknown)
+    """
+
+    def __init__(self, **columns: Any) -> None:
+        """
+        :param columns: The columns, as NumPy arrays of the same length.
+        """
+        if numpy is None:
+            raise ImportError("ProfileColumns needs numpy (pip install numpy)")
+        self.id = columns["id"]
+        self.father = columns["father"]
+        self.mother = columns["mother"]
+        self.gender = columns["gender"]
+        self.privacy = columns["privacy"]
+        self.birth_year = columns["birth_year"]
+        self.birth_month = columns["birth_month"]
+        self.birth_day = columns["birth_day"]
+        self.death_year = columns["death_year"]
+        self.death_month = columns["death_month"]
+        self.death_day = columns["death_day"]
+        # The rows in Id order, and the Ids in that order, built when first needed.
+        self._id_order = None
+        self._sorted_ids = None
+        # The row numbers of the fathers and mothers, built when first needed.
+        self._parent_rows = {}
+
+    @classmethod
+    def from_profiles(cls, source: Any) -> "ProfileColumns":
+        """
+        Reads profiles into columns. Later versions of a profile with the
+        same Id are kept as separate rows; pass each profile once.
+
+        :param source: Profiles, API results, or an iterable of them (as for
+            wt_export).
+        """
+        if numpy is None:
+            raise ImportError("ProfileColumns needs numpy (pip install numpy)")
+        ids = array("q")
+        fathers = array("q")
+        mothers = array("q")
+        genders = array("b")
+        privacies = array("h")
+        births = array("h")
+        deaths = array("h")
+
+        for profile in iter_export_profiles(source):
+            person_id = relative_id(profile.get("Id"))
+            if person_id is None:
+                continue
+            ids.append(person_id)
+            fathers.append(relative_id(profile.get("Father")) or NO_PERSON)
+            mothers.append(relative_id(profile.get("Mother")) or NO_PERSON)
+            genders.append(GENDER_CODES.get(profile.get("Gender"), GENDER_UNKNOWN))
+            try:
+                privacies.append(int(profile.get("Privacy") or 0))
+            except ValueError:
+                privacies.append(0)
+            births.extend(split_date(profile.get("BirthDate")))
+            deaths.extend(split_date(profile.get("DeathDate")))
+
+        birth = numpy.frombuffer(births, dtype=numpy.int16).reshape(-1, 3)
+        death = numpy.frombuffer(deaths, dtype=numpy.int16).reshape(-1, 3)
+        LOGGER.debug("Read %d profiles into columns.", len(ids))
+        return cls(
+            id=numpy.frombuffer(ids, dtype=numpy.int64),
+            father=numpy.frombuffer(fathers, dtype=numpy.int64),
+            mother=numpy.frombuffer(mothers, dtype=numpy.int64),
+            gender=numpy.frombuffer(genders, dtype=numpy.int8),
+            privacy=numpy.frombuffer(privacies, dtype=numpy.int16),
+            birth_year=birth[:, 0],
+            birth_month=birth[:, 1],
+            birth_day=birth[:, 2],
+            death_year=death[:, 0],
+            death_month=death[:, 1],
+            death_day=death[:, 2],
+        )
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def take(self, rows) -> "ProfileColumns":
+        """
+        Returns the columns of some rows only.
+
+        :param rows: A boolean mask, or an array of row numbers.
+        """
+        return ProfileColumns(
+            id=self.id[rows],
+            father=self.father[rows],
+            mother=self.mother[rows],
+            gender=self.gender[rows],
+            privacy=self.privacy[rows],
+            birth_year=self.birth_year[rows],
+            birth_month=self.birth_month[rows],
+            birth_day=self.birth_day[rows],
+            death_year=self.death_year[rows],
+            death_month=self.death_month[rows],
+            death_day=self.death_day[rows],
+        )
+
+    # --- Masks ---
+
+    @property
+    def birth_known(self):
+        """Return the mask of the rows with a known birth year."""
+        return self.birth_year > 0
+
+    @property
+    def birth_month_known(self):
+        """Return the mask of the rows with a known birth month."""
+        return self.birth_month > 0
+
+    @property
+    def birth_day_known(self):
+        """Return the mask of the rows with a known birth day."""
+        return self.birth_day > 0
+
+    @property
+    def death_known(self):
+        """Return the mask of the rows with a known death year."""
+        return self.death_year > 0
+
+    @property
+    def death_month_known(self):
+        """Return the mask of the rows with a known death month."""
+        return self.death_month > 0
+
+    @property
+    def death_day_known(self):
+        """Return the mask of the rows with a known death day."""
+        return self.death_day > 0
+
+    # --- Lookups ---
+
+    def index_of(self, ids: Union[int, Iterable[int]]):
+        """
+        Returns the row numbers of Ids, NO_INDEX for those not in the columns.
+
+        :param ids: An Id, or an array of Ids.
+        """
+        if self._id_order is None:
+            self._id_order = numpy.argsort(self.id, kind="stable")
+            self._sorted_ids = self.id[self._id_order]
+        wanted = numpy.asarray(ids, dtype=numpy.int64)
+        sorted_ids = self._sorted_ids
+        if not len(sorted_ids):
+            return numpy.full(wanted.shape, NO_INDEX, dtype=numpy.int64)
+        positions = numpy.searchsorted(sorted_ids, wanted)
+        positions = numpy.minimum(positions, len(sorted_ids) - 1)
+        found = sorted_ids[positions] == wanted
+        return numpy.where(found, self._id_order[positions], NO_INDEX)
+
+    def parent_rows(self, parent: str = "father"):
+        """
+        Returns the row number of each row's father (or mother), NO_INDEX
+        where the parent is unknown or not in the columns.
+
+        :param parent: "father" or "mother"
+        """
+        if parent not in ("father", "mother"):
+            raise ValueError(f"Unknown parent {parent!r}")
+        if parent not in self._parent_rows:
+            self._parent_rows[parent] = self.index_of(getattr(self, parent))
+        return self._parent_rows[parent]
+
+    # --- Analysis ---
+
+    def lifespan(self):
+        """
+        Returns the age at death in whole years, as floats, NaN where the
+        birth or death year is unknown. When the months (and days) of both
+        dates are known they are taken into account, otherwise it is the
+        difference of the years.
+        """
+        known = self.birth_known & self.death_known
+        years = self.death_year.astype(numpy.float64) - self.birth_year
+        # One year less if the birthday had not come yet in the year of death.
+        precise = known & self.birth_month_known & self.death_month_known
+        birthday = self.birth_month.astype(numpy.int32) * 100 + self.birth_day
+        deathday = self.death_month.astype(numpy.int32) * 100 + self.death_day
+        days = self.birth_day_known & self.death_day_known
+        birthday = numpy.where(days, birthday, birthday // 100 * 100)
+        deathday = numpy.where(days, deathday, deathday // 100 * 100)
+        years -= precise & (deathday < birthday)
+        years[~known] = numpy.nan
+        return years
+
+    def generation_gap(self, parent: str = "father"):
+        """
+        Returns the difference between the birth years of each person and
+        their father (or mother), NaN where either is unknown or the parent
+        is not in the columns.
+
+        :param parent: "father" or "mother"
+        """
+        parents = self.parent_rows(parent)
+        has_parent = parents != NO_INDEX
+        parent_year = numpy.where(has_parent, self.birth_year[parents], 0)
+        gap = (self.birth_year - parent_year).astype(numpy.float64)
+        gap[~(has_parent & self.birth_known & (parent_year > 0))] = numpy.nan
+        return gap
+
+    def generations(self, root: int, max_depth: Optional[int] = None):
+        """
+        Returns the generation of each row relative to the root, as ancestors:
+        0 for the root, 1 for the parents, 2 for the grandparents, ... and -1
+        for rows that are not ancestors of the root. A person reached by more
+        than one line gets the nearest generation.
+
+        :param root: The Id of the root profile.
+        :param max_depth: The number of generations to go up, or None for all.
+        """
+        generation = numpy.full(len(self), -1, dtype=numpy.int32)
+        fathers = self.parent_rows("father")
+        mothers = self.parent_rows("mother")
+        frontier = self.index_of([root])
+        frontier = frontier[frontier != NO_INDEX]
+        generation[frontier] = 0
+        depth = 0
+        while len(frontier) and (max_depth is None or depth < max_depth):
+            parents = numpy.concatenate((fathers[frontier], mothers[frontier]))
+            parents = parents[parents != NO_INDEX]
+            # Marking the new rows in place drops duplicates without sorting.
+            generation[parents[generation[parents] < 0]] = depth + 1
+            frontier = numpy.flatnonzero(generation == depth + 1)
+            depth += 1
+        return generation
+
+    def born_between(self, start: int, end: int):
+        """
+        Returns the mask of the rows born from the start year to the end year,
+        both included. Unknown birth years never match.
+
+        :param start: The first year.
+        :param end: The last year.
+        """
+        return self.birth_known & (self.birth_year >= start) & (self.birth_year <= end)
+
+    def died_between(self, start: int, end: int):
+        """
+        Returns the mask of the rows that died from the start year to the end
+        year, both included. Unknown death years never match.
+
+        :param start: The first year.
+        :param end: The last year.
+        """
+        return self.death_known & (self.death_year >= start) & (self.death_year <= end)
+
+    def living_in(self, year: int):
+        """
+        Returns the mask of the rows born in or before the year and not dead
+        before it. Rows without a birth year never match; those without a
+        death year are taken as alive.
+
+        :param year: The year.
+        """
+        alive = ~self.death_known | (self.death_year >= year)
+        return self.birth_known & (self.birth_year <= year) & alive
@@ -0,0 +1,667 @@
+"""
+This module defines a crawler for very large parts of WikiTree (a whole
+project, a surname, millions of profiles) that runs on a pool of processes
+and survives being stopped at any point.
+
+    crawler = Crawler("hamill.sqlite", app_id="MyApp", direction=Direction.NUCLEAR,
+                      fields="Id,Name,BirthDate,DeathDate", processes=8, rate=20)
+    crawler.seed(["Hamill-277"])
+    stats = crawler.run()
+
+Everything lives in one SQLite file:
+
+* the frontier: every profile Id reached, with how deep it is and whether
+  it is pending, leased to a worker, done, missing or failed,
+* the profiles fetched, in the profiles table of wt_store, so that the file
+  can be opened as a ProfileStore once the crawl is over.
+
+The crawler process leases batches of pending Ids, deepest last, to worker
+processes. Each worker has its own WTSession and fetches its batch with
+getPeople, with the parents (ancestors) or the relatives (descendants,
+nuclear) of each profile. The worker sends the profiles back, and the
+crawler writes them, marks the batch done and adds the Ids newly reached to
+the frontier, all in one transaction. A crawl stopped at any point (killed,
+crashed, interrupted) has lost at most the batches that were in flight, and
+run() on the same file carries on from there: leased Ids go back to pending
+and are fetched again.
+
+All workers share one rate budget: a RateLimiter whose token bucket lives
+in shared memory, so the rate, the slowing down when throttled and the
+circuit breaker apply to the crawl as a whole, whatever the number of
+processes.
+
+Only one crawler may run on a file at a time (on systems with fcntl this is
+enforced with a lock file).
+"""
+
+# Standard Imports
+import argparse
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+import functools
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# Third party imports
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Local imports
+from wt_store import ALL_FIELDS, INSERT_PROFILE, SCHEMA, normalize_fields, profile_rows
+from wt_session import (
+    GET_PEOPLE_MAX_KEYS,
+    GET_PEOPLE_MAX_KEYS_WITH_RELATIVES,
+    GET_PEOPLE_MAX_LIMIT,
+    RATE_DEFAULT,
+    CircuitOpenError,
+    RateLimiter,
+    WTSession,
+    count_related,
+)
+from wt_traverse import REQUIRED_FIELDS, Direction
+
+LOGGER = logging.getLogger(__name__)
+
+# The states of an Id in the frontier.
+PENDING = 0
+LEASED = 1
+DONE = 2
+# The API answered that there is no such profile, or that it is not visible.
+MISSING = 3
+# Fetching the batch failed max_attempts times.
+FAILED = 4
+
+# The names of the states, for progress().
+STATE_NAMES = {
+    PENDING: "pending",
+    LEASED: "leased",
+    DONE: "done",
+    MISSING: "missing",
+    FAILED: "failed",
+}
+
+# The default number of worker processes.
+PROCESSES_DEFAULT = 4
+
+# The default number of times a batch is tried before its Ids are failed.
+MAX_ATTEMPTS_DEFAULT = 3
+
+# The number of batches leased per worker process, so that a worker has its
+# next batch queued while the crawler writes the results of its last one.
+BATCHES_PER_PROCESS = 2
+
+# Seconds between progress log messages.
+PROGRESS_INTERVAL = 30.0
+
+# Seconds the SQLite connection waits for a lock held by a reader.
+BUSY_TIMEOUT = 30.0
+
+# The state entries holding the settings of a crawl, checked when it resumes.
+DIRECTION_STATE = "crawl_direction"
+FIELDS_STATE = "crawl_fields"
+
+FRONTIER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    id INTEGER PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    state INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS frontier_state ON frontier (state, depth, id);
+"""
+
+
+class CrawlError(Exception):
+    """Raised when a crawl cannot start or resume."""
+
+
+def _shared_slot(index: int) -> property:
+    """Returns a property kept in slot index of the shared state array."""
+
+    def get(self) -> float:
+        return self._state[index]
+
+    def put(self, value: float) -> None:
+        self._state[index] = value
+
+    return property(get, put)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    A RateLimiter shared by processes: the token bucket, the rate and the
+    circuit breaker are kept in shared memory and guarded by a lock shared by
+    the processes, so the limit holds for all of them together.
+
+    Create it before the worker processes and hand it to them when they
+    start (as with any multiprocessing lock, it cannot be sent afterwards).
+    """
+
+    # Each piece of RateLimiter's state is a slot of the shared array.
+    _rate = _shared_slot(0)
+    _tokens = _shared_slot(1)
+    _updated = _shared_slot(2)
+    _successes = _shared_slot(3)
+    _failures = _shared_slot(4)
+    _open_until = _shared_slot(5)
+
+    def __init__(self, *args, context=None, **kwargs) -> None:
+        """
+        Takes the arguments of RateLimiter, and:
+
+        :param context: The multiprocessing context of the worker processes.
+        """
+        self._state = (context or multiprocessing).Array("d", 6)
+        super().__init__(*args, **kwargs)
+        # The lock of the array, instead of RateLimiter's thread lock. It is
+        # reentrant, as each slot takes it too.
+        self._lock = self._state.get_lock()
+
+    @property
+    def closes_in(self) -> float:
+        """Return the seconds until the circuit breaker lets requests through."""
+        return max(0.0, self._open_until - time.monotonic())
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = self._state.get_lock()
+
+
+@dataclass
+class CrawlStats:
+    """The outcome of Crawler.run."""
+
+    # Batches fetched and written.
+    batches: int = 0
+    # Profiles written, including relatives fetched along with a batch.
+    profiles: int = 0
+    # Ids added to the frontier.
+    discovered: int = 0
+    # Ids the API had no profile for.
+    missing: int = 0
+    # Batches that failed, and were retried or given up on.
+    errors: int = 0
+    # Seconds the run took.
+    seconds: float = 0.0
+
+
+# The state of a worker process: its session and the shared rate limiter.
+_worker_session: Optional[WTSession] = None
+_worker_limiter: Optional[SharedRateLimiter] = None
+
+
+def _start_worker(
+    session_factory: Callable[..., WTSession], rate_limiter: SharedRateLimiter
+) -> None:
+    """Creates the session of a worker process."""
+    global _worker_session, _worker_limiter  # pylint: disable=global-statement
+    _worker_session = session_factory(rate_limiter=rate_limiter)
+    _worker_limiter = rate_limiter
+
+
+def _fetch_batch(
+    ids: List[int], fields: str, direction: str
+) -> Tuple[Dict[str, dict], Dict[str, dict], Optional[str]]:
+    """
+    Fetches a batch in a worker process. Returns the getPeople resultByKey
+    and people, and who is logged in.
+    """
+    session = _worker_session
+    relation = {} if direction == Direction.ANCESTORS.value else {direction: 1}
+    while True:
+        try:
+            result_by_key, people = _get_people(session, ids, fields, relation)
+            break
+        except CircuitOpenError as error:
+            # The breaker is shared: wait for it rather than burn an attempt.
+            LOGGER.warning("%s", error)
+            time.sleep(_worker_limiter.closes_in)
+    viewer = str(session.user_id) if session.authenticated else None
+    return result_by_key, people, viewer
+
+
+def _get_people(
+    session: WTSession, ids: List[int], fields: str, relation: Dict[str, int]
+) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+    """
+    Returns the resultByKey and people of getPeople, every page of them, or
+    nothing when a page after the first failed.
+    """
+    result_by_key: Dict[str, dict] = {}
+    people: Dict[str, dict] = {}
+    item = None
+    pages = session._get_people_pages(  # pylint: disable=protected-access
+        ids, fields=fields, **relation
+    )
+    for item in pages:
+        result_by_key.update(item["resultByKey"])
+        people.update(item["people"])
+    # The pages end with a short one, unless one failed: then fetch the
+    # whole batch again.
+    if relation and item is not None and count_related(item) >= GET_PEOPLE_MAX_LIMIT:
+        return {}, {}
+    return result_by_key, people
+
+
+def _crawl_fields(fields: Optional[str]) -> str:
+    """Returns the fields to fetch: those wanted, plus what the crawl needs."""
+    if fields is not None and fields.strip() == ALL_FIELDS:
+        return ALL_FIELDS
+    return normalize_fields(",".join([fields or "", *REQUIRED_FIELDS]))
+
+
+def _parent_ids(person: dict) -> List[int]:
+    """Returns the known father and mother Ids of a profile."""
+    ids = []
+    for key in ("Father", "Mother"):
+        try:
+            parent = int(person.get(key) or 0)
+        except (TypeError, ValueError):
+            continue
+        if parent > 0:
+            ids.append(parent)
+    return ids
+
+
+class Crawler:
+    """
+    Crawls from a set of starting profiles, following ancestors,
+    descendants or nuclear relatives, with a pool of worker processes, and
+    keeps its frontier and results in a SQLite file it can resume from.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        app_id: Optional[str] = None,
+        direction: Union[Direction, str] = Direction.ANCESTORS,
+        fields: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        processes: int = PROCESSES_DEFAULT,
+        batch_size: Optional[int] = None,
+        rate: float = RATE_DEFAULT,
+        max_attempts: int = MAX_ATTEMPTS_DEFAULT,
+        session_factory: Optional[Callable[..., WTSession]] = None,
+        context=None,
+    ) -> None:
+        """
+        :param path: The SQLite file of the crawl, created if necessary.
+        :param app_id: The appId the sessions send. Not needed with a
+                       session_factory.
+        :param direction: Which relatives to follow. A crawl keeps the
+                          direction and fields it was started with.
+        :param fields: Comma separated list of fields to fetch for each profile.
+                       Id, Name, Touched, Father and Mother are always added.
+        :param max_depth: Number of generations (steps from a starting
+                          profile) to crawl, or None for all.
+        :param processes: Number of worker processes.
+        :param batch_size: Number of Ids per getPeople call. Defaults to the
+                           most getPeople allows for the direction.
+        :param rate: The rate, in requests per second, of all workers together.
+                     It adapts to throttling as with RateLimiter, up to
+                     twice this.
+        :param max_attempts: Number of times a batch is tried before its Ids
+                             are marked failed.
+        :param session_factory: Creates the session of each worker, called
+                                with a rate_limiter keyword argument. Use it to
+                                log in, for instance with functools.partial
+                                and a wt_login.SharedLogin. With the spawn
+                                start method it must be picklable.
+        :param context: The multiprocessing context, or None for the default.
+        """
+        if session_factory is None:
+            if app_id is None:
+                raise ValueError("Crawler needs an app_id or a session_factory")
+            session_factory = functools.partial(WTSession, app_id)
+        self._direction = Direction(direction)
+        self._fields = _crawl_fields(fields)
+        self._max_depth = max_depth
+        self._processes = processes
+        if batch_size is None:
+            batch_size = (
+                GET_PEOPLE_MAX_KEYS
+                if self._direction == Direction.ANCESTORS
+                else GET_PEOPLE_MAX_KEYS_WITH_RELATIVES
+            )
+        self._batch_size = batch_size
+        self._max_attempts = max_attempts
+        self._session_factory = session_factory
+        self._context = context or multiprocessing.get_context()
+        self._rate_limiter = SharedRateLimiter(
+            rate=rate, max_rate=rate * 2, context=self._context
+        )
+
+        self._path = path
+        self._lock_handle = self._acquire_file(path)
+        self._connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        try:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # WAL commits survive a crash of the process; only a power cut
+            # can lose the last few, which are then crawled again.
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SCHEMA + FRONTIER_SCHEMA)
+            self._check_settings()
+        except BaseException:
+            self.close()
+            raise
+        with self._connection:
+            released = self._connection.execute(
+                "UPDATE frontier SET state = ? WHERE state = ?", (PENDING, LEASED)
+            ).rowcount
+        if released:
+            LOGGER.info(
+                "Resuming %s: %d Ids in flight when it stopped are pending again.", path, released
+            )
+
+    @staticmethod
+    def _acquire_file(path: str):
+        """Takes the lock file of the crawl, or raises CrawlError if it is taken."""
+        if fcntl is None:
+            return None
+        handle = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError as error:
+            os.close(handle)
+            raise CrawlError(f"Another crawler is running on {path}") from error
+        return handle
+
+    def _check_settings(self) -> None:
+        """Saves the direction and fields of a new crawl, or checks them on resuming."""
+        settings = {DIRECTION_STATE: self._direction.value, FIELDS_STATE: self._fields}
+        with self._connection:
+            for name, value in settings.items():
+                row = self._connection.execute(
+                    "SELECT value FROM state WHERE viewer = '' AND name = ?", (name,)
+                ).fetchone()
+                if row is None:
+                    self._connection.execute(
+                        "INSERT INTO state VALUES ('', ?, ?)", (name, value)
+                    )
+                elif row[0] != value:
+                    raise CrawlError(f"{self._path} is a crawl with {name} {row[0]}, not {value}")
+
+    def close(self) -> None:
+        """Close the database and release the crawl."""
+        self._connection.close()
+        if self._lock_handle is not None:
+            os.close(self._lock_handle)
+            self._lock_handle = None
+
+    def __enter__(self) -> "Crawler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def rate_limiter(self) -> SharedRateLimiter:
+        """Return the rate limiter shared by the workers."""
+        return self._rate_limiter
+
+    # --- The frontier ---
+
+    def seed(self, keys: Iterable[Union[str, int]], depth: int = 0) -> int:
+        """
+        Adds starting profiles to the frontier. Ids already in it are left
+        as they are. WikiTree IDs are looked up with one getPeople call per
+        1000. Returns the number of Ids added.
+
+        :param keys: WikiTree IDs or Ids of the starting profiles.
+        :param depth: The depth they are at.
+        """
+        ids = []
+        names = []
+        for key in keys:
+            key = str(key).strip()
+            if key.isdigit():
+                ids.append(int(key))
+            elif key:
+                names.append(key)
+
+        if names:
+            session = self._session_factory(rate_limiter=self._rate_limiter)
+            result = session.get_people(names, fields="Id", use_store=False)[0]
+            for name in names:
+                answer = result["resultByKey"].get(name) or {}
+                if answer.get("Id"):
+                    ids.append(int(answer["Id"]))
+                else:
+                    LOGGER.warning("Not seeding %s: %s", name, answer.get("status", "no answer"))
+
+        with self._connection:
+            return self._connection.executemany(
+                "INSERT OR IGNORE INTO frontier (id, depth, state) VALUES (?, ?, ?)",
+                [(person_id, depth, PENDING) for person_id in ids],
+            ).rowcount
+
+    def progress(self) -> Dict[str, int]:
+        """Returns the number of Ids in each state, by state name."""
+        counts = dict.fromkeys(STATE_NAMES.values(), 0)
+        for state, count in self._connection.execute(
+            "SELECT state, COUNT(*) FROM frontier GROUP BY state"
+        ):
+            counts[STATE_NAMES[state]] = count
+        return counts
+
+    def retry_failed(self) -> int:
+        """Puts the failed Ids back in the frontier. Returns how many there were."""
+        with self._connection:
+            return self._connection.execute(
+                "UPDATE frontier SET state = ?, attempts = 0 WHERE state = ?", (PENDING, FAILED)
+            ).rowcount
+
+    def _lease(self) -> List[Tuple[int, int]]:
+        """Leases the next batch of pending Ids, all at the lowest depth pending."""
+        with self._connection:
+            rows = self._connection.execute(
+                "SELECT id, depth FROM frontier WHERE state = ? AND depth = "
+                "(SELECT MIN(depth) FROM frontier WHERE state = ?) ORDER BY id LIMIT ?",
+                (PENDING, PENDING, self._batch_size),
+            ).fetchall()
+            self._connection.executemany(
+                "UPDATE frontier SET state = ? WHERE id = ?",
+                [(LEASED, person_id) for person_id, _ in rows],
+            )
+        return rows
+
+    def _discovered(self, person: dict, batch: Dict[int, int]) -> List[int]:
+        """Returns the Ids a profile leads to, for the direction crawled."""
+        if self._direction == Direction.ANCESTORS:
+            return _parent_ids(person) if int(person["Id"]) in batch else []
+        return [int(person["Id"])]
+
+    def _write(
+        self,
+        batch: Dict[int, int],
+        result_by_key: Dict[str, dict],
+        people: Dict[str, dict],
+        viewer: Optional[str],
+        stats: CrawlStats,
+    ) -> None:
+        """
+        Writes the profiles of a batch, marks its Ids done and adds the Ids
+        it leads to, in one transaction. Ids the API did not answer for are
+        tried again, up to max_attempts.
+        """
+        depth = min(batch.values())
+        done = []
+        missing = []
+        unanswered = []
+        for person_id in batch:
+            answer = result_by_key.get(str(person_id))
+            if answer is None:
+                unanswered.append(person_id)
+            elif answer.get("Id") and str(answer["Id"]) in people:
+                done.append(person_id)
+            else:
+                missing.append(person_id)
+
+        new_ids = {}
+        if self._max_depth is None or depth < self._max_depth:
+            for person in people.values():
+                for person_id in self._discovered(person, batch):
+                    if person_id not in batch:
+                        new_ids[person_id] = None
+
+        with self._connection:
+            self._connection.executemany(
+                INSERT_PROFILE, profile_rows(people.values(), self._fields, viewer)
+            )
+            self._connection.executemany(
+                "UPDATE frontier SET state = ? WHERE id = ?",
+                [(DONE, person_id) for person_id in done]
+                + [(MISSING, person_id) for person_id in missing],
+            )
+            stats.discovered += self._connection.executemany(
+                "INSERT OR IGNORE INTO frontier (id, depth, state) VALUES (?, ?, ?)",
+                [(person_id, depth + 1, PENDING) for person_id in new_ids],
+            ).rowcount
+            if unanswered:
+                self._give_back(unanswered)
+
+        stats.batches += 1
+        stats.profiles += len(people)
+        stats.missing += len(missing)
+        if unanswered:
+            stats.errors += 1
+
+    def _give_back(self, ids: List[int]) -> None:
+        """Returns Ids whose fetch failed to pending, or fails them after max_attempts."""
+        self._connection.executemany(
+            "UPDATE frontier SET attempts = attempts + 1, "
+            "state = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END WHERE id = ?",
+            [(self._max_attempts, FAILED, PENDING, person_id) for person_id in ids],
+        )
+
+    # --- Crawling ---
+
+    def run(self, max_batches: Optional[int] = None) -> CrawlStats:
+        """
+        Crawls until the frontier has no pending Ids left (or max_batches
+        have been written), and returns what was done. May be interrupted
+        at any point, and called again to carry on.
+
+        :param max_batches: Number of batches to write before stopping, or
+                            None to crawl everything.
+        """
+        stats = CrawlStats()
+        start = time.monotonic()
+        last_report = start
+        # Future -> the Ids of its batch, with their depths.
+        in_flight: Dict[Future, Dict[int, int]] = {}
+        leased = 0
+        executor = ProcessPoolExecutor(
+            max_workers=self._processes,
+            mp_context=self._context,
+            initializer=_start_worker,
+            initargs=(self._session_factory, self._rate_limiter),
+        )
+        try:
+            while True:
+                while len(in_flight) < self._processes * BATCHES_PER_PROCESS and (
+                    max_batches is None or leased < max_batches
+                ):
+                    rows = self._lease()
+                    if not rows:
+                        break
+                    future = executor.submit(
+                        _fetch_batch,
+                        [person_id for person_id, _ in rows],
+                        self._fields,
+                        self._direction.value,
+                    )
+                    in_flight[future] = dict(rows)
+                    leased += 1
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch = in_flight.pop(future)
+                    try:
+                        result_by_key, people, viewer = future.result()
+                    except Exception as error:  # pylint: disable=broad-except
+                        LOGGER.error("A batch of %d Ids failed: %r", len(batch), error)
+                        with self._connection:
+                            self._give_back(list(batch))
+                        stats.errors += 1
+                        continue
+                    self._write(batch, result_by_key, people, viewer, stats)
+
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    LOGGER.info(
+                        "Crawl: %s, %.1f profiles/s, rate %.1f/s",
+                        self.progress(),
+                        stats.profiles / (last_report - start),
+                        self._rate_limiter.rate,
+                    )
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            # Whatever was still in flight is crawled again next time.
+            if in_flight:
+                with self._connection:
+                    self._connection.executemany(
+                        "UPDATE frontier SET state = ? WHERE id = ? AND state = ?",
+                        [
+                            (PENDING, person_id, LEASED)
+                            for batch in in_flight.values()
+                            for person_id in batch
+                        ],
+                    )
+            stats.seconds = time.monotonic() - start
+
+        LOGGER.info("Crawled %s in %.0fs: %s", self._path, stats.seconds, stats)
+        return stats
+
+
+def main() -> int:
+    """Runs a crawl from the command line and returns the exit status."""
+    parser = argparse.ArgumentParser(description="Resumable crawl of WikiTree profiles")
+    parser.add_argument("path", help="the SQLite file of the crawl")
+    parser.add_argument("seeds", nargs="*", help="WikiTree IDs or Ids to start from")
+    parser.add_argument("--app-id", required=True, help="the appId to send")
+    parser.add_argument(
+        "--direction", choices=[direction.value for direction in Direction], default="ancestors"
+    )
+    parser.add_argument("--fields", help="comma separated fields to fetch")
+    parser.add_argument("--max-depth", type=int, help="generations to crawl")
+    parser.add_argument("--processes", type=int, default=PROCESSES_DEFAULT, help="workers")
+    parser.add_argument("--rate", type=float, default=RATE_DEFAULT, help="requests per second")
+    parser.add_argument("--retry-failed", action="store_true", help="try failed Ids again")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    with Crawler(
+        args.path,
+        app_id=args.app_id,
+        direction=args.direction,
+        fields=args.fields,
+        max_depth=args.max_depth,
+        processes=args.processes,
+        rate=args.rate,
+    ) as crawler:
+        if args.seeds:
+            crawler.seed(args.seeds)
+        if args.retry_failed:
+            crawler.retry_failed()
+        crawler.run()
+        print(crawler.progress())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
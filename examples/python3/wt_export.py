@@ -0,0 +1,371 @@
+"""
+This module defines the export of fetched profiles to files for analysis.
+
+Profiles come from many places: getPeople pages, TreeExpander output, search
+results, streamed responses. An exporter takes any of them, a profile or a
+result at a time, and writes them out as they come:
+
+    with ParquetExporter("people.parquet") as exporter:
+        exporter.write_all(wt_session.iter_people(keys, fields="*"))
+
+or, in one go:
+
+    export_profiles(wt_session.stream_people(keys, fields="*"), "people.ndjson")
+
+NDJSON (one JSON profile per line) needs nothing but the standard library.
+Parquet and Arrow IPC files need pyarrow; they have a fixed schema, the
+profile fields listed in getProfile.md, and are written a row group at a
+time, so memory use is bounded by the row group size however many profiles
+are exported.
+"""
+
+# Standard Imports
+import json
+import logging
+from typing import IO, Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Third party imports
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Local imports
+from wt_graph import iter_profiles
+
+LOGGER = logging.getLogger(__name__)
+
+# Column types.
+TYPE_INT = "int"
+TYPE_STR = "str"
+TYPE_BOOL = "bool"
+TYPE_JSON = "json"  # nested values, stored as JSON text
+
+# The pyarrow types of the column types.
+ARROW_TYPES = (
+    {
+        TYPE_INT: pyarrow.int64,
+        TYPE_STR: pyarrow.string,
+        TYPE_BOOL: pyarrow.bool_,
+        TYPE_JSON: pyarrow.string,
+    }
+    if pyarrow is not None
+    else {}
+)
+
+# The profile fields of getProfile.md, in order, with their column types.
+PROFILE_SCHEMA: Tuple[Tuple[str, str], ...] = (
+    ("Id", TYPE_INT),
+    ("PageId", TYPE_INT),
+    ("Name", TYPE_STR),
+    ("IsPerson", TYPE_INT),
+    ("FirstName", TYPE_STR),
+    ("MiddleName", TYPE_STR),
+    ("MiddleInitial", TYPE_STR),
+    ("LastNameAtBirth", TYPE_STR),
+    ("LastNameCurrent", TYPE_STR),
+    ("Nicknames", TYPE_STR),
+    ("LastNameOther", TYPE_STR),
+    ("RealName", TYPE_STR),
+    ("Prefix", TYPE_STR),
+    ("Suffix", TYPE_STR),
+    ("BirthDate", TYPE_STR),
+    ("DeathDate", TYPE_STR),
+    ("BirthLocation", TYPE_STR),
+    ("DeathLocation", TYPE_STR),
+    ("BirthDateDecade", TYPE_STR),
+    ("DeathDateDecade", TYPE_STR),
+    ("Gender", TYPE_STR),
+    ("Photo", TYPE_STR),
+    ("IsLiving", TYPE_INT),
+    ("Created", TYPE_STR),
+    ("Touched", TYPE_STR),
+    ("Privacy", TYPE_INT),
+    ("Privacy_IsPrivate", TYPE_BOOL),
+    ("Privacy_IsPublic", TYPE_BOOL),
+    ("Privacy_IsOpen", TYPE_BOOL),
+    ("Privacy_IsAtLeastPublic", TYPE_BOOL),
+    ("Privacy_IsSemiPrivate", TYPE_BOOL),
+    ("Privacy_IsSemiPrivateBio", TYPE_BOOL),
+    ("Manager", TYPE_INT),
+    ("Creator", TYPE_INT),
+    ("Father", TYPE_INT),
+    ("Mother", TYPE_INT),
+    ("BioFather", TYPE_INT),
+    ("BioMother", TYPE_INT),
+    ("HasChildren", TYPE_INT),
+    ("NoChildren", TYPE_INT),
+    ("IsRedirect", TYPE_INT),
+    ("DataStatus", TYPE_JSON),
+    ("PhotoData", TYPE_JSON),
+    ("Connected", TYPE_INT),
+    ("Bio", TYPE_STR),
+    ("IsMember", TYPE_INT),
+    ("EditCount", TYPE_INT),
+    ("ResearchStatus", TYPE_INT),
+)
+
+# The default number of profiles per row group.
+ROW_GROUP_SIZE_DEFAULT = 10000
+
+# Export formats, by file extension.
+FORMAT_NDJSON = "ndjson"
+FORMAT_PARQUET = "parquet"
+FORMAT_ARROW = "arrow"
+FORMAT_EXTENSIONS = {
+    ".ndjson": FORMAT_NDJSON,
+    ".jsonl": FORMAT_NDJSON,
+    ".parquet": FORMAT_PARQUET,
+    ".arrow": FORMAT_ARROW,
+    ".feather": FORMAT_ARROW,
+}
+
+# A file name, or an open file.
+Sink = Union[str, IO]
+
+
+def iter_export_profiles(source: Any) -> Iterator[dict]:
+    """
+    Yields the profiles in anything an exporter accepts: a profile, an API
+    result, an iterable of either, of streamed entries or of Person records.
+
+    :param source: The profiles.
+    """
+    if isinstance(source, dict) or not isinstance(source, Iterable):
+        source = (source,)
+    for item in source:
+        if hasattr(item, "to_dict"):
+            yield item.to_dict()
+        else:
+            yield from iter_profiles(item)
+
+
+def convert_value(value: Any, column_type: str) -> Any:
+    """
+    Returns a field value as the type of its column, or None if it has no
+    value of that type.
+
+    :param value: The value, as returned by the API.
+    :param column_type: One of the TYPE_ constants.
+    """
+    if value is None:
+        return None
+    if column_type == TYPE_INT:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if column_type == TYPE_BOOL:
+        if isinstance(value, str):
+            return value.strip().lower() not in ("", "0", "false")
+        return bool(value)
+    if column_type == TYPE_JSON:
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+
+class ProfileExporter:
+    """
+    The base of the exporters. Subclasses write the profiles given to write().
+    Use them as context managers, or call close() when done.
+    """
+
+    def __init__(
+        self,
+        sink: Sink,
+        fields: Optional[Iterable[str]] = None,
+        row_group_size: int = ROW_GROUP_SIZE_DEFAULT,
+    ) -> None:
+        """
+        :param sink: The file name, or an open (binary for pyarrow formats) file.
+        :param fields: The fields to export, or None for all of them.
+        :param row_group_size: Number of profiles written at a time.
+        """
+        self._sink = sink
+        self._fields = None if fields is None else list(fields)
+        self._row_group_size = row_group_size
+        self._rows = 0
+
+    @property
+    def rows(self) -> int:
+        """Return the number of profiles written so far."""
+        return self._rows
+
+    def write(self, profile: dict) -> None:
+        """
+        Writes one profile.
+
+        :param profile: The profile, as returned by the API.
+        """
+        raise NotImplementedError
+
+    def write_all(self, source: Any) -> int:
+        """
+        Writes every profile in the source and returns how many were written.
+
+        :param source: Profiles, API results, or an iterable of them.
+        """
+        count = 0
+        for profile in iter_export_profiles(source):
+            self.write(profile)
+            count += 1
+        return count
+
+    def close(self) -> None:
+        """Writes what is left and closes the file."""
+
+    def __enter__(self) -> "ProfileExporter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class NDJSONExporter(ProfileExporter):
+    """Writes profiles as newline delimited JSON, one profile per line."""
+
+    def __init__(
+        self,
+        sink: Sink,
+        fields: Optional[Iterable[str]] = None,
+        row_group_size: int = ROW_GROUP_SIZE_DEFAULT,
+    ) -> None:
+        """
+        :param sink: The file name, or an open text file.
+        :param fields: The fields to export, or None for the whole profile.
+        :param row_group_size: Unused, lines are written as they come.
+        """
+        super().__init__(sink, fields, row_group_size)
+        if isinstance(sink, str):
+            self._file = open(sink, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+        else:
+            self._file = sink
+
+    def write(self, profile: dict) -> None:
+        if self._fields is not None:
+            profile = {field: profile[field] for field in self._fields if field in profile}
+        self._file.write(json.dumps(profile, ensure_ascii=False, separators=(",", ":")))
+        self._file.write("\n")
+        self._rows += 1
+
+    def close(self) -> None:
+        if self._file is not self._sink:
+            self._file.close()
+        else:
+            self._file.flush()
+
+
+class _ColumnarExporter(ProfileExporter):
+    """Buffers a row group of profiles in columns and hands it to pyarrow."""
+
+    def __init__(
+        self,
+        sink: Sink,
+        fields: Optional[Iterable[str]] = None,
+        row_group_size: int = ROW_GROUP_SIZE_DEFAULT,
+    ) -> None:
+        if pyarrow is None:
+            raise ImportError("Parquet and Arrow export need pyarrow (pip install pyarrow)")
+        super().__init__(sink, fields, row_group_size)
+        wanted = None if self._fields is None else set(self._fields)
+        self._columns: List[Tuple[str, str]] = [
+            (field, column_type)
+            for field, column_type in PROFILE_SCHEMA
+            if wanted is None or field in wanted
+        ]
+        self._schema = pyarrow.schema(
+            [(field, ARROW_TYPES[column_type]()) for field, column_type in self._columns]
+        )
+        self._buffers: List[list] = [[] for _ in self._columns]
+        self._writer = self._open_writer()
+
+    def _open_writer(self):
+        raise NotImplementedError
+
+    @property
+    def schema(self):
+        """Return the pyarrow schema of the file."""
+        return self._schema
+
+    def write(self, profile: dict) -> None:
+        for buffer, (field, column_type) in zip(self._buffers, self._columns):
+            buffer.append(convert_value(profile.get(field), column_type))
+        self._rows += 1
+        if len(self._buffers[0]) >= self._row_group_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Writes the buffered profiles as one row group."""
+        if not self._buffers or not self._buffers[0]:
+            return
+        table = pyarrow.Table.from_arrays(
+            [
+                pyarrow.array(buffer, type=field.type)
+                for buffer, field in zip(self._buffers, self._schema)
+            ],
+            schema=self._schema,
+        )
+        self._writer.write_table(table)
+        LOGGER.debug("Wrote a row group of %d profiles.", table.num_rows)
+        self._buffers = [[] for _ in self._columns]
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+class ParquetExporter(_ColumnarExporter):
+    """Writes profiles to a Parquet file, one row group at a time. Needs pyarrow."""
+
+    def _open_writer(self):
+        return pyarrow.parquet.ParquetWriter(self._sink, self._schema)
+
+
+class ArrowExporter(_ColumnarExporter):
+    """Writes profiles to an Arrow IPC (Feather v2) file, one batch at a time. Needs pyarrow."""
+
+    def _open_writer(self):
+        return pyarrow.ipc.new_file(self._sink, self._schema)
+
+
+# Exporter classes, by format.
+EXPORTERS = {
+    FORMAT_NDJSON: NDJSONExporter,
+    FORMAT_PARQUET: ParquetExporter,
+    FORMAT_ARROW: ArrowExporter,
+}
+
+
+def export_profiles(
+    source: Any,
+    sink: Sink,
+    export_format: Optional[str] = None,
+    fields: Optional[Iterable[str]] = None,
+    row_group_size: int = ROW_GROUP_SIZE_DEFAULT,
+) -> int:
+    """
+    Writes every profile in the source to a file and returns how many were
+    written. The source is consumed lazily, so it can be a generator of pages
+    or a stream.
+
+    :param source: Profiles, API results, or an iterable of them.
+    :param sink: The file name, or an open file.
+    :param export_format: "ndjson", "parquet" or "arrow", or None to go by
+        the file name extension.
+    :param fields: The fields to export, or None for all of them.
+    :param row_group_size: Number of profiles written at a time.
+    """
+    if export_format is None:
+        name = sink if isinstance(sink, str) else getattr(sink, "name", "")
+        extension = name[name.rfind("."):].lower() if "." in name else ""
+        export_format = FORMAT_EXTENSIONS.get(extension, FORMAT_NDJSON)
+    if export_format not in EXPORTERS:
+        raise ValueError(f"Unknown export format {export_format!r}")
+
+    with EXPORTERS[export_format](sink, fields, row_group_size) as exporter:
+        exporter.write_all(source)
+    LOGGER.debug("Exported %d profiles to %s.", exporter.rows, sink)
+
+    return exporter.rows
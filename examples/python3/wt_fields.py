@@ -0,0 +1,208 @@
+"""
+This module defines field plans: the set of profile fields a job actually
+reads, used to narrow the "fields" of every request.
+
+Left to its defaults, getPerson returns nearly every field of a profile,
+which most jobs never look at. Give WTSession a FieldPlan and each call made
+without explicit fields asks for only the fields in the plan:
+
+    plan = FieldPlan(["BirthDate", "DeathDate", "Father", "Mother"])
+    wt_session = WTSession(app_id="MyApp", field_plan=plan)
+
+A plan can also be recorded: in a warm-up run the profiles in the results
+note which of their fields are read, and freeze() turns what was read into
+the plan for the rest of the run. save() and load() keep it for later runs:
+
+    plan = FieldPlan.recording()
+    wt_session = WTSession(app_id="MyApp", field_plan=plan)
+    run_job(wt_session, sample_keys)
+    plan.freeze()
+    plan.save("job.fields.json")
+
+The plan is applied before the response cache is consulted, so the fields
+are part of the cache key and a response fetched with a narrower plan is
+never served for a wider request.
+"""
+
+# Standard Imports
+import json
+import threading
+from typing import Any, Iterable, Optional
+
+# Local imports
+from wt_session import RELATIVE_FIELDS
+
+# The actions whose "fields" a plan narrows.
+PLANNED_ACTIONS = frozenset(
+    [
+        "getPerson",
+        "getProfile",
+        "getPeople",
+        "getAncestors",
+        "getDescendants",
+        "getRelatives",
+        "getWatchlist",
+        "searchPerson",
+    ]
+)
+
+# The fields always asked for: results are keyed on them.
+REQUIRED_FIELDS = frozenset(["Id", "Name"])
+
+# Fields an action does not accept.
+EXCLUDED_FIELDS = {"getPeople": RELATIVE_FIELDS}
+
+
+class RecordingDict(dict):
+    """
+    A profile dictionary that notes the fields read from it in a FieldPlan.
+    Iterating over it or copying it (items(), dict(profile), json.dumps, ...)
+    counts as reading every field it has.
+    """
+
+    __slots__ = ("_plan",)
+
+    def __init__(self, profile: dict, plan: "FieldPlan") -> None:
+        super().__init__(profile)
+        self._plan = plan
+
+    def _read_all(self) -> None:
+        self._plan.add(*super().keys())
+
+    def __iter__(self):
+        self._read_all()
+        return super().__iter__()
+
+    def keys(self):
+        self._read_all()
+        return super().keys()
+
+    def values(self):
+        self._read_all()
+        return super().values()
+
+    def items(self):
+        self._read_all()
+        return super().items()
+
+    def copy(self) -> dict:
+        self._read_all()
+        return super().copy()
+
+    def __getitem__(self, field):
+        self._plan.add(field)
+        return super().__getitem__(field)
+
+    def get(self, field, default=None):
+        self._plan.add(field)
+        return super().get(field, default)
+
+    def __contains__(self, field) -> bool:
+        self._plan.add(field)
+        return super().__contains__(field)
+
+
+class FieldPlan:
+    """
+    The fields a job reads from profiles. While recording, the plan does not
+    narrow anything and instead collects the fields read from results.
+    """
+
+    def __init__(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        actions: Iterable[str] = PLANNED_ACTIONS,
+        recording: bool = False,
+    ) -> None:
+        """
+        :param fields: The fields the job reads.
+        :param actions: The actions whose fields are narrowed.
+        :param recording: Whether to record the fields read instead.
+        """
+        self._lock = threading.Lock()
+        self._fields = set(fields or ())
+        self._actions = frozenset(actions)
+        self._recording = recording
+
+    @classmethod
+    def recording(cls, actions: Iterable[str] = PLANNED_ACTIONS) -> "FieldPlan":
+        """Returns an empty plan that records the fields read from results."""
+        return cls(actions=actions, recording=True)
+
+    @classmethod
+    def load(cls, path: str) -> "FieldPlan":
+        """
+        Returns the plan saved in a file by save().
+
+        :param path: The file.
+        """
+        with open(path, encoding="utf-8") as file:
+            state = json.load(file)
+        return cls(state["fields"], state["actions"])
+
+    def save(self, path: str) -> None:
+        """
+        Saves the plan to a file.
+
+        :param path: The file.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"fields": sorted(self.fields), "actions": sorted(self._actions)}, file)
+
+    @property
+    def is_recording(self) -> bool:
+        """Return whether the plan is recording the fields read."""
+        return self._recording
+
+    @property
+    def fields(self) -> frozenset:
+        """Return the fields in the plan."""
+        with self._lock:
+            return frozenset(self._fields)
+
+    def add(self, *fields: str) -> None:
+        """Adds fields to the plan."""
+        with self._lock:
+            self._fields.update(field for field in fields if isinstance(field, str))
+
+    def freeze(self) -> None:
+        """Stops recording. From now on the plan narrows the fields of requests."""
+        self._recording = False
+
+    def fields_for(self, action: str) -> Optional[str]:
+        """
+        Returns the "fields" parameter for a request, or None to leave the
+        request as it is: while recording, for actions not in the plan, and
+        while the plan is empty.
+
+        :param action: The action of the request.
+        """
+        if self._recording or action not in self._actions:
+            return None
+        with self._lock:
+            if not self._fields:
+                return None
+            fields = (self._fields | REQUIRED_FIELDS) - EXCLUDED_FIELDS.get(action, frozenset())
+        return ",".join(sorted(fields))
+
+    def wrap(self, data: Any) -> Any:
+        """
+        Returns the API result with every profile in it replaced by a
+        RecordingDict, if the plan is recording, and unchanged otherwise.
+
+        :param data: The decoded API result.
+        """
+        if not self._recording:
+            return data
+        return self._wrap(data)
+
+    def _wrap(self, data: Any) -> Any:
+        if isinstance(data, list):
+            return [self._wrap(item) for item in data]
+        if isinstance(data, dict):
+            wrapped = {key: self._wrap(value) for key, value in data.items()}
+            # Anything with an Id is a profile, including nested relatives.
+            if "Id" in data:
+                return RecordingDict(wrapped, self)
+            return wrapped
+        return data
@@ -0,0 +1,522 @@
+"""
+This module defines a compact, in-memory family graph built from WikiTree API
+results.
+
+Profiles come back from the API as nested dictionaries keyed by Id, which
+costs a lot of memory per person. FamilyGraph instead numbers the people 0, 1,
+2, ... ("nodes") and keeps everything in flat typed arrays: the parents of each
+node, the children and spouses as CSR (compressed sparse row) adjacency
+arrays, and a handful of core fields as columns.
+
+    graph = FamilyGraph()
+    graph.ingest(wt_session.get_people(keys, fields=GRAPH_FIELDS, ancestors=5))
+    node = graph.index_of("Hamill-277")
+    for parent in graph.parents(node):
+        print(graph.name(parent), graph.birth_date(parent))
+
+It only uses the python standard library.
+"""
+
+# Standard Imports
+from array import array
+from collections import deque
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# The fields to request for profiles that go into a FamilyGraph.
+GRAPH_FIELDS = "Id,Name,FirstName,LastNameAtBirth,Gender,BirthDate,DeathDate,Father,Mother"
+
+# The node number used for "no such person", e.g. an unknown father.
+NO_NODE = -1
+
+# Gender codes.
+GENDER_UNKNOWN = 0
+GENDER_MALE = 1
+GENDER_FEMALE = 2
+
+GENDER_CODES = {"Male": GENDER_MALE, "Female": GENDER_FEMALE}
+GENDER_NAMES = {GENDER_MALE: "Male", GENDER_FEMALE: "Female"}
+
+# Node flags.
+FLAG_LOADED = 1  # The profile itself was ingested, not just referenced.
+FLAG_COMPLETE = 2  # All of the children and spouses are known.
+
+# The keys of a profile that hold more profiles.
+RELATIVE_KEYS = ("Parents", "Children", "Siblings", "Spouses")
+
+
+def date_to_int(date: Optional[str]) -> int:
+    """
+    Packs a "YYYY-MM-DD" date into the integer YYYYMMDD. Unknown parts stay
+    zero, and a missing or unparsable date is 0.
+
+    :param date: The date, as returned by the API.
+    """
+    if not date:
+        return 0
+    try:
+        year, month, day = date.split("-")
+        return int(year) * 10000 + int(month) * 100 + int(day)
+    except ValueError:
+        return 0
+
+
+def int_to_date(value: int) -> Optional[str]:
+    """
+    Unpacks a YYYYMMDD integer back into "YYYY-MM-DD", or None for 0.
+
+    :param value: The packed date.
+    """
+    if not value:
+        return None
+    return f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}"
+
+
+def _zeros(typecode: str, length: int) -> array:
+    """Returns a typed array of length zeros."""
+    return array(typecode, bytes(array(typecode).itemsize * length))
+
+
+def relative_id(value) -> Optional[int]:
+    """Returns a Father/Mother value as an Id, or None if there isn't one."""
+    try:
+        person_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    # Zero is "empty" and negative Ids are privacy placeholders.
+    return person_id if person_id > 0 else None
+
+
+class FamilyGraph:
+    """
+    People and their parent, child and spouse links, held in typed arrays.
+
+    Every person gets a node number. A person referenced as a father, mother
+    or spouse before their own profile is ingested gets a node too, with only
+    its Id known until the profile arrives.
+
+    The children and spouse adjacency is kept in CSR form and rebuilt, when
+    needed, after new profiles have been ingested.
+    """
+
+    def __init__(self) -> None:
+        # Links, by node.
+        self._ids = array("q")
+        self._father = array("i")
+        self._mother = array("i")
+        self._flags = array("B")
+
+        # Core fields, by node.
+        self._gender = array("b")
+        self._birth_date = array("i")
+        self._death_date = array("i")
+        self._name: List[Optional[str]] = []
+        self._first_name: List[Optional[str]] = []
+        self._last_name_at_birth: List[Optional[str]] = []
+
+        self._index_by_id: Dict[int, int] = {}
+        self._index_by_name: Dict[str, int] = {}
+
+        # Spouse links, as a flat list of node pairs, and the CSR arrays,
+        # which are None until built.
+        self._spouse_pairs = array("i")
+        self._children_offsets: Optional[array] = None
+        self._children_nodes: Optional[array] = None
+        self._spouse_offsets: Optional[array] = None
+        self._spouse_nodes: Optional[array] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, key: Union[str, int]) -> bool:
+        return self.index_of(key) != NO_NODE
+
+    # --- Building ---
+
+    def _node(self, person_id: int) -> int:
+        """Returns the node of the Id, adding an empty one if necessary."""
+        node = self._index_by_id.get(person_id)
+        if node is None:
+            node = len(self._ids)
+            self._index_by_id[person_id] = node
+            self._ids.append(person_id)
+            self._father.append(NO_NODE)
+            self._mother.append(NO_NODE)
+            self._flags.append(0)
+            self._gender.append(GENDER_UNKNOWN)
+            self._birth_date.append(0)
+            self._death_date.append(0)
+            self._name.append(None)
+            self._first_name.append(None)
+            self._last_name_at_birth.append(None)
+            self._invalidate()
+        return node
+
+    def _invalidate(self) -> None:
+        """Drops the CSR arrays after a change."""
+        self._children_offsets = None
+        self._children_nodes = None
+        self._spouse_offsets = None
+        self._spouse_nodes = None
+
+    def add_person(self, person: dict, person_id: Optional[int] = None) -> int:
+        """
+        Adds or updates one profile, and any relatives nested in it (Parents,
+        Children, Siblings, Spouses), and returns its node.
+
+        Nested children without a Father or Mother field are linked to the
+        profile by its Gender. The profile is only marked complete if its
+        Children and Spouses are both present and every child is linked.
+
+        :param person: The profile, as returned by the API.
+        :param person_id: The Id, if the profile itself doesn't have one.
+        """
+        person_id = relative_id(person.get("Id", person_id))
+        if person_id is None:
+            return NO_NODE
+        node = self._node(person_id)
+        self._flags[node] |= FLAG_LOADED
+
+        name = person.get("Name")
+        if name:
+            self._name[node] = name
+            self._index_by_name[name] = node
+        if "FirstName" in person:
+            self._first_name[node] = person["FirstName"]
+        if person.get("LastNameAtBirth"):
+            self._last_name_at_birth[node] = sys.intern(person["LastNameAtBirth"])
+        if "Gender" in person:
+            self._gender[node] = GENDER_CODES.get(person["Gender"], GENDER_UNKNOWN)
+        if "BirthDate" in person:
+            self._birth_date[node] = date_to_int(person["BirthDate"])
+        if "DeathDate" in person:
+            self._death_date[node] = date_to_int(person["DeathDate"])
+
+        for key, links in (("Father", self._father), ("Mother", self._mother)):
+            if key in person:
+                parent_id = relative_id(person[key])
+                new_parent = NO_NODE if parent_id is None else self._node(parent_id)
+                if links[node] != new_parent:
+                    links[node] = new_parent
+                    self._invalidate()
+
+        # Whether every listed child is linked to this node.
+        children_linked = True
+        for key in RELATIVE_KEYS:
+            relatives = person.get(key)
+            if not isinstance(relatives, dict):
+                continue
+            for relative_key, relative in relatives.items():
+                if not isinstance(relative, dict):
+                    continue
+                relative_node = self.add_person(relative, relative_id(relative_key))
+                if relative_node == NO_NODE:
+                    continue
+                if key == "Spouses":
+                    self.add_spouses(node, relative_node)
+                elif key == "Children" and not self._link_child(node, relative_node):
+                    children_linked = False
+
+        # With both lists present, and every child linked, we know every
+        # child and spouse.
+        if (
+            isinstance(person.get("Children"), dict)
+            and isinstance(person.get("Spouses"), dict)
+            and children_linked
+        ):
+            self._flags[node] |= FLAG_COMPLETE
+
+        return node
+
+    def _link_child(self, node: int, child: int) -> bool:
+        """
+        Makes node a parent of child, as its father or mother by the gender
+        of node, unless the child already has that parent. Returns whether
+        node is a parent of child.
+        """
+        if node in (self._father[child], self._mother[child]):
+            return True
+        links = {GENDER_MALE: self._father, GENDER_FEMALE: self._mother}.get(self._gender[node])
+        if links is None or links[child] != NO_NODE:
+            return False
+        links[child] = node
+        self._invalidate()
+        return True
+
+    def add_spouses(self, node: int, other: int) -> None:
+        """
+        Records a marriage between two nodes.
+
+        :param node: One spouse.
+        :param other: The other spouse.
+        """
+        self._spouse_pairs.append(node)
+        self._spouse_pairs.append(other)
+        self._spouse_offsets = None
+        self._spouse_nodes = None
+
+    def mark_complete(self, node: int) -> None:
+        """
+        Records that all of the children and spouses of a node are known.
+
+        :param node: The node.
+        """
+        self._flags[node] |= FLAG_COMPLETE
+
+    def ingest(self, payload) -> int:
+        """
+        Adds every profile in an API result and returns how many were added.
+        Understands the results of getPeople, getAncestors, getDescendants,
+        getRelatives, getPerson, getProfile and getWatchlist, as well as a
+        single profile or any iterable of profiles.
+
+        :param payload: The API result.
+        """
+        count = 0
+        for person in iter_profiles(payload):
+            if self.add_person(person) != NO_NODE:
+                count += 1
+        return count
+
+    # --- Lookup ---
+
+    def index_of(self, key: Union[str, int]) -> int:
+        """
+        Returns the node of an Id or WikiTree ID, or NO_NODE.
+
+        :param key: Wanted WikiTree_ID or User_ID
+        """
+        if isinstance(key, int) or (isinstance(key, str) and key.isdigit()):
+            return self._index_by_id.get(int(key), NO_NODE)
+        return self._index_by_name.get(key, NO_NODE)
+
+    def id(self, node: int) -> int:
+        """Returns the Id of a node."""
+        return self._ids[node]
+
+    def name(self, node: int) -> Optional[str]:
+        """Returns the WikiTree ID of a node, if known."""
+        return self._name[node]
+
+    def first_name(self, node: int) -> Optional[str]:
+        """Returns the first name of a node, if known."""
+        return self._first_name[node]
+
+    def last_name_at_birth(self, node: int) -> Optional[str]:
+        """Returns the last name at birth of a node, if known."""
+        return self._last_name_at_birth[node]
+
+    def gender(self, node: int) -> int:
+        """Returns the gender code of a node."""
+        return self._gender[node]
+
+    def birth_date(self, node: int) -> Optional[str]:
+        """Returns the birth date of a node as "YYYY-MM-DD", if known."""
+        return int_to_date(self._birth_date[node])
+
+    def death_date(self, node: int) -> Optional[str]:
+        """Returns the death date of a node as "YYYY-MM-DD", if known."""
+        return int_to_date(self._death_date[node])
+
+    def is_loaded(self, node: int) -> bool:
+        """Returns whether the profile of a node was ingested."""
+        return bool(self._flags[node] & FLAG_LOADED)
+
+    def is_complete(self, node: int) -> bool:
+        """Returns whether all of the children and spouses of a node are known."""
+        return bool(self._flags[node] & FLAG_COMPLETE)
+
+    def person(self, node: int) -> dict:
+        """
+        Returns the core fields of a node as a profile dictionary, with the
+        same field names the API uses.
+
+        :param node: The node.
+        """
+        father = self._father[node]
+        mother = self._mother[node]
+        return {
+            "Id": self._ids[node],
+            "Name": self._name[node],
+            "FirstName": self._first_name[node],
+            "LastNameAtBirth": self._last_name_at_birth[node],
+            "Gender": GENDER_NAMES.get(self._gender[node], ""),
+            "BirthDate": self.birth_date(node),
+            "DeathDate": self.death_date(node),
+            "Father": self._ids[father] if father != NO_NODE else 0,
+            "Mother": self._ids[mother] if mother != NO_NODE else 0,
+        }
+
+    # --- Relatives ---
+
+    def father(self, node: int) -> int:
+        """Returns the father's node, or NO_NODE."""
+        return self._father[node]
+
+    def mother(self, node: int) -> int:
+        """Returns the mother's node, or NO_NODE."""
+        return self._mother[node]
+
+    def parents(self, node: int) -> Iterator[int]:
+        """Yields the known parents of a node."""
+        for parent in (self._father[node], self._mother[node]):
+            if parent != NO_NODE:
+                yield parent
+
+    def children(self, node: int) -> array:
+        """Returns the known children of a node."""
+        if self._children_offsets is None:
+            self._build_children()
+        return self._children_nodes[self._children_offsets[node]:self._children_offsets[node + 1]]
+
+    def spouses(self, node: int) -> array:
+        """Returns the known spouses of a node."""
+        if self._spouse_offsets is None:
+            self._build_spouses()
+        return self._spouse_nodes[self._spouse_offsets[node]:self._spouse_offsets[node + 1]]
+
+    def siblings(self, node: int) -> List[int]:
+        """Returns the known siblings (full and half) of a node."""
+        siblings = []
+        for parent in self.parents(node):
+            for child in self.children(parent):
+                if child != node and child not in siblings:
+                    siblings.append(child)
+        return siblings
+
+    def ancestors(self, node: int, depth: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        """
+        Yields (node, generation) for each known ancestor, breadth first.
+        Each ancestor is yielded once, at its nearest generation.
+
+        :param node: The starting node.
+        :param depth: The number of generations, or None for all.
+        """
+        return self._walk(node, depth, self.parents)
+
+    def descendants(self, node: int, depth: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        """
+        Yields (node, generation) for each known descendant, breadth first.
+        Each descendant is yielded once, at its nearest generation.
+
+        :param node: The starting node.
+        :param depth: The number of generations, or None for all.
+        """
+        return self._walk(node, depth, self.children)
+
+    def _walk(self, node: int, depth: Optional[int], step) -> Iterator[Tuple[int, int]]:
+        """Breadth first walk from node along step."""
+        seen = {node}
+        frontier = deque([(node, 0)])
+        while frontier:
+            current, generation = frontier.popleft()
+            if depth is not None and generation >= depth:
+                continue
+            for relative in step(current):
+                if relative not in seen:
+                    seen.add(relative)
+                    frontier.append((relative, generation + 1))
+                    yield relative, generation + 1
+
+    # --- CSR ---
+
+    def _build_children(self) -> None:
+        """Builds the children CSR arrays from the parent links."""
+        count = len(self._ids)
+        offsets = _zeros("q", count + 1)
+        for links in (self._father, self._mother):
+            for parent in links:
+                if parent != NO_NODE:
+                    offsets[parent + 1] += 1
+        for node in range(count):
+            offsets[node + 1] += offsets[node]
+
+        nodes = _zeros("i", offsets[count])
+        fill = array("q", offsets)
+        for links in (self._father, self._mother):
+            for child, parent in enumerate(links):
+                if parent != NO_NODE:
+                    nodes[fill[parent]] = child
+                    fill[parent] += 1
+
+        self._children_offsets = offsets
+        self._children_nodes = nodes
+
+    def _build_spouses(self) -> None:
+        """Builds the spouse CSR arrays from the recorded marriages."""
+        count = len(self._ids)
+        pairs = set()
+        for index in range(0, len(self._spouse_pairs), 2):
+            node, other = self._spouse_pairs[index], self._spouse_pairs[index + 1]
+            if node != other:
+                pairs.add((node, other))
+                pairs.add((other, node))
+        # Keep the pair list itself free of duplicates too.
+        self._spouse_pairs = array("i", (node for pair in pairs if pair[0] < pair[1] for node in pair))
+
+        offsets = _zeros("q", count + 1)
+        for node, _ in pairs:
+            offsets[node + 1] += 1
+        for node in range(count):
+            offsets[node + 1] += offsets[node]
+
+        nodes = _zeros("i", len(pairs))
+        fill = array("q", offsets)
+        for node, other in sorted(pairs):
+            nodes[fill[node]] = other
+            fill[node] += 1
+
+        self._spouse_offsets = offsets
+        self._spouse_nodes = nodes
+
+    def memory_usage(self) -> int:
+        """
+        Returns the approximate number of bytes held by the graph, not counting
+        the strings themselves, which are usually shared.
+        """
+        arrays = [
+            self._ids,
+            self._father,
+            self._mother,
+            self._flags,
+            self._gender,
+            self._birth_date,
+            self._death_date,
+            self._spouse_pairs,
+            self._children_offsets,
+            self._children_nodes,
+            self._spouse_offsets,
+            self._spouse_nodes,
+        ]
+        total = sum(item.itemsize * len(item) for item in arrays if item is not None)
+        total += sum(
+            sys.getsizeof(column)
+            for column in (self._name, self._first_name, self._last_name_at_birth)
+        )
+        total += sys.getsizeof(self._index_by_id) + sys.getsizeof(self._index_by_name)
+        return total
+
+
+def iter_profiles(payload) -> Iterator[dict]:
+    """Yields the profiles found in an API result."""
+    if isinstance(payload, dict):
+        if "Id" in payload:
+            yield payload
+            return
+        if isinstance(payload.get("people"), dict):
+            yield from payload["people"].values()
+        for key in ("ancestors", "descendants", "watchlist", "matches"):
+            if isinstance(payload.get(key), list):
+                yield from payload[key]
+        for key in ("person", "profile"):
+            if isinstance(payload.get(key), dict):
+                yield payload[key]
+        if isinstance(payload.get("items"), list):
+            for item in payload["items"]:
+                yield from iter_profiles(item)
+        return
+
+    if isinstance(payload, Iterable) and not isinstance(payload, (str, bytes)):
+        for item in payload:
+            if isinstance(item, dict):
+                yield from iter_profiles(item)
@@ -0,0 +1,355 @@
+"""
+This module defines a login that is saved and shared, so that processes do
+not each go through clientLogin.
+
+authenticate() posts twice to the API, and a fleet of short-lived workers
+that each log in at startup adds that latency to every worker and sends
+bursts of logins. A SharedLogin keeps the login cookies in a file (or the
+system keyring) instead; the first worker logs in and saves them, the others
+load them:
+
+    login = SharedLogin(LoginFile("~/.wikitree/login.json"), email, password)
+    wt_session = WTSession(app_id="MyApp", login=login)
+    wt_session.get_watchlist()
+
+Only one process logs in at a time: the others wait on a lock file and then
+use the cookies it saved. A saved login is not used once its cookies have
+expired or it is older than max_age, and is checked with clientLogin's
+checkLogin every check_interval seconds. When a call that needs a login
+fails and checkLogin says the user is logged out, the session logs in again
+and the call is retried once. The password is only held in memory, never
+saved; pass a function returning it to avoid even that.
+
+The login file is written atomically, readable by its owner only, and is not
+used if anyone else can read it. The keyring storage needs the keyring
+package.
+"""
+
+# Standard Imports
+from contextlib import contextmanager
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from typing import Callable, Iterator, Optional, Union
+
+# Third party imports
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import keyring
+except ImportError:
+    keyring = None
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds between checks, with checkLogin, that a saved login still works.
+CHECK_INTERVAL_DEFAULT = 300.0
+
+# Seconds a saved login is used before logging in again. The API does not
+# document how long a login lasts; checkLogin catches an earlier logout.
+MAX_AGE_DEFAULT = 24 * 3600.0
+
+# The keyring service name the logins are saved under.
+KEYRING_SERVICE = "wikitree-api"
+
+# The permission bits of the login file and its lock file, and of a directory
+# created for them.
+FILE_MODE = 0o600
+DIRECTORY_MODE = 0o700
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Holds an exclusive lock on a lock file, waiting for other processes."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, mode=DIRECTORY_MODE, exist_ok=True)
+    handle = os.open(path, os.O_RDWR | os.O_CREAT, FILE_MODE)
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        os.close(handle)
+
+
+class LoginFile:
+    """
+    Saves a login in a JSON file readable by its owner only, and locks it
+    across processes with a lock file next to it (on systems with fcntl).
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: The file. Its directory is created if necessary.
+        """
+        self._path = os.path.expanduser(path)
+        self._lock_path = self._path + ".lock"
+
+    @property
+    def path(self) -> str:
+        """Return the path of the file."""
+        return self._path
+
+    def load(self) -> Optional[dict]:
+        """Returns the saved login, or None if there is none usable."""
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                info = os.fstat(file.fileno())
+                if hasattr(os, "getuid") and (
+                    info.st_uid != os.getuid() or info.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+                ):
+                    LOGGER.warning(
+                        "Not using %s: it must belong to you and only be readable by you.",
+                        self._path,
+                    )
+                    return None
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            LOGGER.warning("Could not read %s: %s", self._path, error)
+            return None
+
+    def save(self, state: dict) -> None:
+        """
+        Saves a login, replacing the file in one step so that readers never
+        see half of it.
+
+        :param state: The login, as from SharedLogin.
+        """
+        directory = os.path.dirname(self._path) or "."
+        os.makedirs(directory, mode=DIRECTORY_MODE, exist_ok=True)
+        # mkstemp creates the file readable by its owner only.
+        handle, temporary = tempfile.mkstemp(dir=directory, prefix=".login-")
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as file:
+                json.dump(state, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self._path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def clear(self) -> None:
+        """Removes the saved login."""
+        try:
+            os.unlink(self._path)
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Holds the lock shared with other processes using the file."""
+        if fcntl is None:
+            yield
+            return
+        with _file_lock(self._lock_path):
+            yield
+
+
+class KeyringLogin:
+    """
+    Saves a login in the system keyring. Needs the keyring package.
+    Processes share the lock file given, if any.
+    """
+
+    def __init__(
+        self, email: str, service: str = KEYRING_SERVICE, lock_path: Optional[str] = None
+    ) -> None:
+        """
+        :param email: The email address the login is saved under.
+        :param service: The keyring service name.
+        :param lock_path: A lock file for processes to log in one at a time,
+                          or None not to coordinate them.
+        """
+        if keyring is None:
+            raise ImportError("KeyringLogin needs keyring (pip install keyring)")
+        self._email = email
+        self._service = service
+        self._lock_path = lock_path
+
+    def load(self) -> Optional[dict]:
+        """Returns the saved login, or None if there is none usable."""
+        secret = keyring.get_password(self._service, self._email)
+        if not secret:
+            return None
+        try:
+            return json.loads(secret)
+        except ValueError:
+            LOGGER.warning("The login saved in the keyring is not valid JSON.")
+            return None
+
+    def save(self, state: dict) -> None:
+        """
+        Saves a login.
+
+        :param state: The login, as from SharedLogin.
+        """
+        keyring.set_password(self._service, self._email, json.dumps(state))
+
+    def clear(self) -> None:
+        """Removes the saved login."""
+        try:
+            keyring.delete_password(self._service, self._email)
+        except keyring.errors.PasswordDeleteError:
+            pass
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Holds the lock file, if there is one."""
+        if self._lock_path is None or fcntl is None:
+            yield
+            return
+        with _file_lock(self._lock_path):
+            yield
+
+
+class SharedLogin:
+    """
+    Logs a WTSession in with a saved login where possible, and with the
+    credentials only when there is no usable saved login. One SharedLogin
+    may serve any number of sessions and threads.
+    """
+
+    def __init__(
+        self,
+        storage,
+        email: str,
+        password: Union[str, Callable[[], str]],
+        check_interval: float = CHECK_INTERVAL_DEFAULT,
+        max_age: Optional[float] = MAX_AGE_DEFAULT,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        :param storage: Where the login is saved, a LoginFile or KeyringLogin.
+        :param email: The email address of the user.
+        :param password: The password, or a function returning it.
+        :param check_interval: Seconds between checks that the login still
+                               works, or None never to check.
+        :param max_age: Seconds a login is used before logging in again, or
+                        None to use it until it stops working.
+        :param clock: The time source, in seconds since the epoch.
+        """
+        self._storage = storage
+        self._email = email
+        self._password = password
+        self._check_interval = check_interval
+        self._max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        # The saved login last used, so that calls need not read the storage.
+        self._state: Optional[dict] = None
+        # The number of times this object logged in with the credentials.
+        self.logins = 0
+
+    def _usable(self, state: Optional[dict]) -> bool:
+        """Returns whether a saved login may be used without checking it."""
+        if not state or not state.get("cookies") or state.get("email") != self._email:
+            return False
+        now = self._clock()
+        if self._max_age is not None and now - state.get("saved", 0) > self._max_age:
+            return False
+        for cookie in state["cookies"]:
+            if cookie.get("expires") and cookie["expires"] <= now:
+                return False
+        return True
+
+    def _due(self, state: dict) -> bool:
+        """Returns whether a saved login should be checked before it is used."""
+        if self._check_interval is None:
+            return False
+        return self._clock() - state.get("checked", 0) > self._check_interval
+
+    def ensure(self, session) -> bool:
+        """
+        Makes sure the session is logged in, with the saved login or by
+        logging in. Returns whether it is.
+
+        :param session: The WTSession.
+        """
+        with self._lock:
+            current = session.export_login()
+            state = self._state
+            if current is not None and state is not None and self._same(current, state):
+                if not self._due(state) and self._usable(state):
+                    return True
+            return self._restore(session, self._storage.load(), stale=None)
+
+    def renew(self, session) -> bool:
+        """
+        Logs the session in again after its login stopped working, unless
+        another process already did. Returns whether it is logged in.
+
+        :param session: The WTSession.
+        """
+        with self._lock:
+            return self._restore(session, self._storage.load(), stale=session.export_login())
+
+    def logged_out(self, session, data) -> bool:
+        """
+        Returns whether a call that needed a login failed because the session
+        is not logged in any more. Calls that succeeded are taken at their
+        word; for failed ones the API is asked with checkLogin.
+
+        :param session: The WTSession.
+        :param data: The decoded response of the call.
+        """
+        item = data[0] if isinstance(data, list) and data else data
+        status = item.get("status") if isinstance(item, dict) else None
+        if not status or not isinstance(status, str):
+            return False
+        return not session.check_login()
+
+    @staticmethod
+    def _same(one: dict, other: dict) -> bool:
+        """Returns whether two logins have the same cookies."""
+        return {cookie["name"]: cookie["value"] for cookie in one.get("cookies", ())} == {
+            cookie["name"]: cookie["value"] for cookie in other.get("cookies", ())
+        }
+
+    def _restore(self, session, state: Optional[dict], stale: Optional[dict]) -> bool:
+        """
+        Uses the saved login if it works, or logs in (one process at a time)
+        and saves the new login. The lock must be held.
+        """
+        if self._try(session, state, stale):
+            return True
+
+        with self._storage.lock():
+            # Another process may have logged in while we waited.
+            state = self._storage.load()
+            if self._try(session, state, stale):
+                return True
+
+            password = self._password() if callable(self._password) else self._password
+            self.logins += 1
+            if not session.authenticate(self._email, password):
+                return False
+            state = session.export_login()
+            now = self._clock()
+            state.update(email=self._email, saved=now, checked=now)
+            self._storage.save(state)
+            self._state = state
+            LOGGER.info("Logged in as %s and saved the login.", state.get("user_name"))
+            return True
+
+    def _try(self, session, state: Optional[dict], stale: Optional[dict]) -> bool:
+        """Puts a saved login in the session if it is usable, and checks it if due."""
+        if not self._usable(state) or (stale is not None and self._same(state, stale)):
+            return False
+        session.import_login(state)
+        if self._due(state):
+            if not session.check_login():
+                LOGGER.info("The saved login no longer works.")
+                return False
+            state["checked"] = self._clock()
+            self._storage.save(state)
+        self._state = state
+        return True
@@ -0,0 +1,350 @@
+"""
+This module defines instrumentation for WTSession: hooks that are told about
+every request, and Metrics, which aggregates them per API action and exposes
+them in the Prometheus text format.
+
+    metrics = Metrics()
+    wt_session = WTSession(app_id="MyApp", cache=cache, hooks=metrics)
+    ...
+    print(metrics.to_prometheus())
+
+or, for Prometheus to scrape:
+
+    metrics.serve(port=9464)
+
+Metrics records, per action: requests by HTTP status, latency histograms for
+connecting, waiting for the server and downloading the body, JSON decode
+time, request and response bytes, throttled and "Limit exceeded." responses,
+time spent waiting for the rate limiter, and cache hits and misses.
+
+Other hooks subclass Hooks and override what they need. HookList passes
+events on to several hooks at once.
+
+It only uses the python standard library.
+"""
+
+# Standard Imports
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+# Local imports
+from wt_session import RequestEvent
+
+LOGGER = logging.getLogger(__name__)
+
+# The upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The phases of a request that get a latency histogram.
+PHASES = ("connect", "wait", "download", "decode")
+
+# The prefix of the exported metric names.
+METRIC_PREFIX = "wikitree_api"
+
+# The per-action counters exported, with their help text.
+COUNTERS = (
+    ("request_bytes", "Bytes of request bodies sent."),
+    ("response_bytes", "Bytes of response bodies received."),
+    ("throttled", "Responses asking to slow down."),
+    ("limit_exceeded", 'Responses with the "Limit exceeded." status.'),
+    ("rate_waits", "Requests delayed by the rate limiter."),
+    ("rate_wait_seconds", "Seconds spent waiting for the rate limiter."),
+    ("cache_hits", "Responses served from the cache."),
+    ("cache_misses", "Cache lookups that went to the API."),
+)
+
+# The content type of the Prometheus text format.
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Hooks:
+    """
+    Instrumentation hooks of a WTSession. Every method does nothing; override
+    the ones you need. They are called from the threads (or the event loop)
+    that send the requests, so they must be quick and thread safe.
+    """
+
+    def on_request(self, event: RequestEvent) -> None:
+        """
+        Called after every request sent, including retries and failures.
+
+        :param event: What happened.
+        """
+
+    def on_rate_wait(self, action: str, seconds: float) -> None:
+        """
+        Called when a request had to wait for the rate limiter.
+
+        :param action: The API action.
+        :param seconds: How long it waited.
+        """
+
+    def on_cache(self, action: str, hit: bool) -> None:
+        """
+        Called after each response cache lookup.
+
+        :param action: The API action.
+        :param hit: Whether the response was in the cache.
+        """
+
+
+class HookList(Hooks):
+    """
+    Passes events on to several hooks. A hook that raises is logged and
+    does not stop the others, or the request.
+    """
+
+    def __init__(self, *hooks: Hooks) -> None:
+        """
+        :param hooks: The hooks.
+        """
+        self._hooks: List[Hooks] = list(hooks)
+
+    def add(self, hook: Hooks) -> None:
+        """Adds a hook."""
+        self._hooks.append(hook)
+
+    def _call(self, method: str, *args) -> None:
+        for hook in self._hooks:
+            try:
+                getattr(hook, method)(*args)
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("Instrumentation hook %r failed.", hook)
+
+    def on_request(self, event: RequestEvent) -> None:
+        self._call("on_request", event)
+
+    def on_rate_wait(self, action: str, seconds: float) -> None:
+        self._call("on_rate_wait", action, seconds)
+
+    def on_cache(self, action: str, hit: bool) -> None:
+        self._call("on_cache", action, hit)
+
+
+class Histogram:
+    """A cumulative histogram with fixed buckets, as Prometheus has them."""
+
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """
+        :param buckets: The upper bounds of the buckets, in increasing order.
+        """
+        self.buckets = buckets
+        # The last count is the +Inf bucket.
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Adds a value."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> Iterable[Tuple[str, int]]:
+        """Yields (le, count of values up to le), ending with "+Inf"."""
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            yield _format_number(bound), running
+        yield "+Inf", self.count
+
+
+class _ActionStats:
+    """The counters of one action."""
+
+    __slots__ = (
+        "requests",
+        "errors",
+        "phases",
+        "request_bytes",
+        "response_bytes",
+        "throttled",
+        "limit_exceeded",
+        "rate_waits",
+        "rate_wait_seconds",
+        "cache_hits",
+        "cache_misses",
+    )
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.requests: Dict[int, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.phases = {phase: Histogram(buckets) for phase in PHASES}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.throttled = 0
+        self.limit_exceeded = 0
+        self.rate_waits = 0
+        self.rate_wait_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class Metrics(Hooks):
+    """Aggregates the events of one or more sessions per API action."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """
+        :param buckets: The upper bounds, in seconds, of the latency buckets.
+        """
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._actions: Dict[str, _ActionStats] = {}
+
+    def _stats(self, action: str) -> _ActionStats:
+        """Returns the counters of an action. The lock must be held."""
+        stats = self._actions.get(action)
+        if stats is None:
+            stats = self._actions[action] = _ActionStats(self._buckets)
+        return stats
+
+    def on_request(self, event: RequestEvent) -> None:
+        with self._lock:
+            stats = self._stats(event.action)
+            stats.requests[event.status_code] = stats.requests.get(event.status_code, 0) + 1
+            if event.error is not None:
+                stats.errors[event.error] = stats.errors.get(event.error, 0) + 1
+            if event.status_code:
+                for phase in PHASES:
+                    stats.phases[phase].observe(getattr(event, phase))
+            stats.request_bytes += event.request_bytes
+            stats.response_bytes += event.response_bytes
+            stats.throttled += event.throttled
+            stats.limit_exceeded += event.limit_exceeded
+
+    def on_rate_wait(self, action: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._stats(action)
+            stats.rate_waits += 1
+            stats.rate_wait_seconds += seconds
+
+    def on_cache(self, action: str, hit: bool) -> None:
+        with self._lock:
+            stats = self._stats(action)
+            if hit:
+                stats.cache_hits += 1
+            else:
+                stats.cache_misses += 1
+
+    def reset(self) -> None:
+        """Forgets everything recorded so far."""
+        with self._lock:
+            self._actions.clear()
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        Returns the totals per action: requests, errors, bytes, throttled,
+        limit_exceeded, rate waits, cache hits and misses, and the count and
+        total seconds of each phase.
+        """
+        with self._lock:
+            return {
+                action: {
+                    "requests": sum(stats.requests.values()),
+                    "status_codes": dict(stats.requests),
+                    "errors": dict(stats.errors),
+                    "request_bytes": stats.request_bytes,
+                    "response_bytes": stats.response_bytes,
+                    "throttled": stats.throttled,
+                    "limit_exceeded": stats.limit_exceeded,
+                    "rate_waits": stats.rate_waits,
+                    "rate_wait_seconds": stats.rate_wait_seconds,
+                    "cache_hits": stats.cache_hits,
+                    "cache_misses": stats.cache_misses,
+                    "seconds": {
+                        phase: histogram.total for phase, histogram in stats.phases.items()
+                    },
+                }
+                for action, stats in self._actions.items()
+            }
+
+    def to_prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def family(name: str, metric_type: str, text: str) -> str:
+            name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            return name
+
+        with self._lock:
+            actions = sorted(self._actions.items())
+
+            name = family("requests_total", "counter", "Requests sent, by action and HTTP status.")
+            for action, stats in actions:
+                for code, count in sorted(stats.requests.items()):
+                    lines.append(f"{name}{_labels(action=action, code=code)} {count}")
+
+            name = family("errors_total", "counter", "Requests without a usable response.")
+            for action, stats in actions:
+                for error, count in sorted(stats.errors.items()):
+                    lines.append(f"{name}{_labels(action=action, error=error)} {count}")
+
+            name = family("request_seconds", "histogram", "Time spent per phase of a request.")
+            for action, stats in actions:
+                for phase, histogram in stats.phases.items():
+                    for bound, count in histogram.cumulative():
+                        labels = _labels(action=action, phase=phase, le=bound)
+                        lines.append(f"{name}_bucket{labels} {count}")
+                    labels = _labels(action=action, phase=phase)
+                    lines.append(f"{name}_sum{labels} {_format_number(histogram.total)}")
+                    lines.append(f"{name}_count{labels} {histogram.count}")
+
+            for attribute, text in COUNTERS:
+                name = family(f"{attribute}_total", "counter", text)
+                for action, stats in actions:
+                    value = _format_number(getattr(stats, attribute))
+                    lines.append(f"{name}{_labels(action=action)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, address: str = "") -> ThreadingHTTPServer:
+        """
+        Serves the metrics over HTTP, at any path, from a daemon thread.
+        Returns the server; stop it with shutdown().
+
+        :param port: The port to listen on.
+        :param address: The address to listen on, all of them by default.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # pylint: disable=invalid-name
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        server = ThreadingHTTPServer((address, port), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        LOGGER.info("Serving metrics on port %d.", server.server_address[1])
+        return server
+
+
+def _format_number(value: float) -> str:
+    """Formats a value for the Prometheus text format."""
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    """Formats labels for the Prometheus text format."""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
@@ -0,0 +1,1002 @@
+"""
+This module defines an offline stand-in for the WikiTree API, for testing and
+load-testing clients without touching api.wikitree.com.
+
+MockAPIServer serves a synthetic family tree of any size, generated from a
+seed, so every run sees the same people:
+
+    with MockAPIServer(size=100000, latency=0.02) as server:
+        wt_session_module.API_URL = server.url
+        ...
+
+or from the command line:
+
+    python wt_mock.py --size 100000 --port 8080 --latency 0.02 --rate-limit 50
+
+It answers getPerson, getProfile, getPeople (with ancestors, descendants,
+nuclear, siblings, minGeneration and start/limit pagination), getAncestors,
+getDescendants, getRelatives, getConnections, searchPerson and getWatchlist,
+plus the two steps of clientLogin, in the shapes documented in the *.md files
+and swagger/wikitreeAPI.yaml. Profiles carry the fields of the getProfile.md
+list (wt_export.PROFILE_SCHEMA), and "fields" and "bioFormat" are honoured.
+
+Latency, throttling ("Limit exceeded." or HTTP 429 beyond a request rate)
+and server errors can be injected, to see how a client copes.
+
+Apart from the other modules here, it only uses the python standard library.
+"""
+
+# Standard Imports
+import argparse
+from collections import deque
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import multiprocessing
+import random
+import secrets
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+# Local imports
+from wt_export import PROFILE_SCHEMA
+from wt_graph import FamilyGraph
+from wt_paths import PathSolver
+from wt_session import LIMIT_EXCEEDED_STATUS, RELATIVE_FIELDS
+
+LOGGER = logging.getLogger(__name__)
+
+# The default number of people in the synthetic tree, and its seed.
+TREE_SIZE_DEFAULT = 10000
+TREE_SEED_DEFAULT = 1
+
+# The year the youngest generation is born around.
+YOUNGEST_YEAR = 1990
+
+# One founding couple per this many people.
+PEOPLE_PER_FOUNDER = 1000
+
+# Added to an Id to make its PageId.
+PAGE_ID_OFFSET = 1000000
+
+# getPeople limits.
+MAX_KEYS = 1000
+MAX_LIMIT = 1000
+
+# Every WATCHLIST_EVERY-th profile is on the watchlist of the logged in user.
+WATCHLIST_EVERY = 7
+
+# The methods of MockAPI that answer each action.
+ACTIONS = {
+    "getPerson": "_get_person",
+    "getProfile": "_get_profile",
+    "getPeople": "_get_people",
+    "getAncestors": "_get_ancestors",
+    "getDescendants": "_get_descendants",
+    "getRelatives": "_get_relatives",
+    "getConnections": "_get_connections",
+    "searchPerson": "_search_person",
+    "getWatchlist": "_get_watchlist",
+}
+
+# The path the mock answers on.
+API_PATH = "/api.php"
+
+SURNAMES = (
+    "Adams", "Baker", "Clark", "Davies", "Evans", "Fischer", "Garcia", "Hughes", "Ito",
+    "Jensen", "Kowalski", "Larsen", "Martin", "Nielsen", "Olsen", "Petit", "Quinn", "Rossi",
+    "Schmidt", "Taylor", "Ueda", "Vogel", "Walker", "Young", "Zimmermann",
+)
+MALE_NAMES = (
+    "John", "William", "James", "Thomas", "Henry", "Peter", "Carl", "Hans", "Luca", "Paul",
+)
+FEMALE_NAMES = (
+    "Mary", "Anna", "Elizabeth", "Sarah", "Margaret", "Emma", "Ida", "Marie", "Sofia", "Jane",
+)
+PLACES = (
+    "London, England", "Boston, Massachusetts", "Hamburg, Germany", "Oslo, Norway", "Lyon, France",
+)
+
+MALE = 1
+FEMALE = 2
+
+# The fields returned when none are asked for: all but the bio, children and
+# spouses for profiles, and just Id and Name for getPeople.
+PROFILE_FIELDS = tuple(field for field, _ in PROFILE_SCHEMA)
+DEFAULT_FIELDS = frozenset(PROFILE_FIELDS + ("Parents", "Siblings")) - {"Bio"}
+DEFAULT_PEOPLE_FIELDS = frozenset(["Id", "Name"])
+
+
+class SyntheticTree:
+    """
+    A generated family tree. Ids run from 1 to size. Founding couples have
+    children, who marry each other or people from outside the tree, and so on
+    down the generations until the tree has size people.
+    """
+
+    def __init__(self, size: int = TREE_SIZE_DEFAULT, seed: int = TREE_SEED_DEFAULT) -> None:
+        """
+        :param size: The number of people.
+        :param seed: The seed of the random generator; the same seed gives the same tree.
+        """
+        self.size = size
+        rng = random.Random(seed)
+        self._rng = rng
+
+        # Index 0 is unused, so that lists are indexed by Id.
+        self.father = [0]
+        self.mother = [0]
+        self.gender = [0]
+        self.surname = [0]
+        self.first_name = [0]
+        self.birth = [(0, 0, 0)]
+        self.death = [(0, 0, 0)]
+        self.privacy = [0]
+        self.spouses: List[List[int]] = [[]]
+        self.children: List[List[int]] = [[]]
+
+        self._generate()
+        self.by_surname: Dict[str, List[int]] = {}
+        for person_id in range(1, len(self.father)):
+            self.by_surname.setdefault(SURNAMES[self.surname[person_id]], []).append(person_id)
+        self._graph: Optional[FamilyGraph] = None
+        self._graph_lock = threading.Lock()
+
+    def _add(self, father: int, mother: int, gender: int, surname: int, year: int) -> int:
+        """Adds a person and returns the Id."""
+        rng = self._rng
+        person_id = len(self.father)
+        self.father.append(father)
+        self.mother.append(mother)
+        self.gender.append(gender)
+        self.surname.append(surname)
+        self.first_name.append(rng.randrange(len(MALE_NAMES)))
+        # Some dates are only partly known, or not at all.
+        precision = rng.random()
+        if precision < 0.05:
+            birth = (0, 0, 0)
+        elif precision < 0.25:
+            birth = (year, 0, 0)
+        else:
+            birth = (year, rng.randint(1, 12), rng.randint(1, 28))
+        self.birth.append(birth)
+        self.death.append((year + rng.randint(1, 95), 0, 0) if year else (0, 0, 0))
+        self.privacy.append(rng.choice((60, 60, 60, 50, 50, 40, 20)))
+        self.spouses.append([])
+        self.children.append([])
+        if father:
+            self.children[father].append(person_id)
+        if mother:
+            self.children[mother].append(person_id)
+        return person_id
+
+    def _marry(self, one: int, other: int) -> None:
+        self.spouses[one].append(other)
+        self.spouses[other].append(one)
+
+    def _full(self) -> bool:
+        return len(self.father) > self.size
+
+    def _generate(self) -> None:
+        """Generates the tree, one generation at a time."""
+        rng = self._rng
+        couples: List[Tuple[int, int, int]] = []
+        # Years are relative to the founders, and shifted at the end.
+        for _ in range(max(1, self.size // PEOPLE_PER_FOUNDER)):
+            if len(self.father) + 2 > self.size + 1:
+                break
+            husband = self._add(0, 0, MALE, rng.randrange(len(SURNAMES)), 1)
+            wife = self._add(0, 0, FEMALE, rng.randrange(len(SURNAMES)), 1)
+            self._marry(husband, wife)
+            couples.append((husband, wife, 1))
+        if not couples and not self._full():
+            self._add(0, 0, MALE, 0, 1)
+
+        while couples and not self._full():
+            generation = []
+            for husband, wife, year in couples:
+                for _ in range(rng.choice((1, 2, 2, 3, 3, 4, 5))):
+                    if self._full():
+                        break
+                    child_year = year + rng.randint(20, 40)
+                    gender = rng.choice((MALE, FEMALE))
+                    generation.append(
+                        self._add(husband, wife, gender, self.surname[husband], child_year)
+                    )
+            rng.shuffle(generation)
+
+            women = [person for person in generation if self.gender[person] == FEMALE]
+            couples = []
+            for person in generation:
+                if self._full():
+                    break
+                if self.gender[person] != MALE:
+                    continue
+                year = self._year(person)
+                wife = women.pop() if women and rng.random() < 0.6 else 0
+                if wife and self.father[wife] == self.father[person]:
+                    women.insert(0, wife)
+                    wife = 0
+                if not wife and rng.random() < 0.8:
+                    wife = self._add(0, 0, FEMALE, rng.randrange(len(SURNAMES)), year)
+                if wife:
+                    self._marry(person, wife)
+                    couples.append((person, wife, year))
+            for wife in women:
+                if self._full():
+                    break
+                if rng.random() < 0.5:
+                    year = self._year(wife)
+                    husband = self._add(0, 0, MALE, rng.randrange(len(SURNAMES)), year)
+                    self._marry(husband, wife)
+                    couples.append((husband, wife, year))
+
+        # Shift the years so that the youngest are born around YOUNGEST_YEAR.
+        # Dates in the future, and deaths of people born recently, are dropped.
+        shift = YOUNGEST_YEAR - max(year for year, _, _ in self.birth)
+        for person_id in range(1, len(self.birth)):
+            year, month, day = self.birth[person_id]
+            if year:
+                self.birth[person_id] = (year + shift, month, day)
+            death_year = self.death[person_id][0]
+            if death_year:
+                death_year += shift
+                living = death_year > 2020 or year + shift > 1940
+                self.death[person_id] = (0, 0, 0) if living else (death_year, 0, 0)
+
+    def _year(self, person_id: int) -> int:
+        """Returns the birth year, or a guess when it is not known."""
+        year = self.birth[person_id][0]
+        if year:
+            return year
+        father = self.father[person_id]
+        return (self._year(father) + 30) if father else 1
+
+    # --- Lookups ---
+
+    def __len__(self) -> int:
+        return len(self.father) - 1
+
+    def name(self, person_id: int) -> str:
+        """Returns the WikiTree ID."""
+        return f"{SURNAMES[self.surname[person_id]]}-{person_id}"
+
+    def resolve(self, key) -> int:
+        """Returns the Id of a key (Id, PageId-less WikiTree ID), or 0."""
+        key = str(key).strip()
+        if key.isdigit():
+            person_id = int(key)
+        else:
+            surname, _, number = key.replace(" ", "_").rpartition("-")
+            if not number.isdigit():
+                return 0
+            person_id = int(number)
+            if not 0 < person_id <= len(self) or SURNAMES[self.surname[person_id]] != surname:
+                return 0
+        return person_id if 0 < person_id <= len(self) else 0
+
+    def parents(self, person_id: int) -> List[int]:
+        """Returns the Ids of the known parents."""
+        return [parent for parent in (self.father[person_id], self.mother[person_id]) if parent]
+
+    def siblings(self, person_id: int) -> List[int]:
+        """Returns the Ids of the siblings, full and half."""
+        siblings = []
+        for parent in self.parents(person_id):
+            for child in self.children[parent]:
+                if child != person_id and child not in siblings:
+                    siblings.append(child)
+        return siblings
+
+    def walk(self, start: int, depth: int, step) -> List[Tuple[int, int]]:
+        """
+        Returns (Id, generation) for everyone within depth steps of the start,
+        breadth first, the start excluded.
+        """
+        seen = {start}
+        found = []
+        frontier = [start]
+        for generation in range(1, depth + 1):
+            following = []
+            for person_id in frontier:
+                for relative in step(person_id):
+                    if relative not in seen:
+                        seen.add(relative)
+                        following.append(relative)
+                        found.append((relative, generation))
+            frontier = following
+        return found
+
+    def nuclear(self, person_id: int) -> List[int]:
+        """Returns the Ids of the parents, siblings, spouses and children."""
+        return (
+            self.parents(person_id)
+            + self.siblings(person_id)
+            + self.spouses[person_id]
+            + self.children[person_id]
+        )
+
+    def graph(self) -> FamilyGraph:
+        """Returns the whole tree as a complete FamilyGraph, built on first use."""
+        with self._graph_lock:
+            if self._graph is None:
+                graph = FamilyGraph()
+                for person_id in range(1, len(self) + 1):
+                    graph.add_person(
+                        {
+                            "Id": person_id,
+                            "Name": self.name(person_id),
+                            "Gender": "Male" if self.gender[person_id] == MALE else "Female",
+                            "Father": self.father[person_id],
+                            "Mother": self.mother[person_id],
+                        }
+                    )
+                for person_id in range(1, len(self) + 1):
+                    node = graph.index_of(person_id)
+                    graph.mark_complete(node)
+                    for spouse in self.spouses[person_id]:
+                        if spouse > person_id:
+                            graph.add_spouses(node, graph.index_of(spouse))
+                self._graph = graph
+            return self._graph
+
+    # --- Profiles ---
+
+    def profile(
+        self,
+        person_id: int,
+        fields: frozenset,
+        bio_format: Optional[str] = None,
+        nested: bool = True,
+    ) -> dict:
+        """
+        Returns the profile with the wanted fields.
+
+        :param person_id: The Id.
+        :param fields: The wanted fields, as from parse_fields.
+        :param bio_format: "wiki", "html", or "both"
+        :param nested: Whether relatives may be nested in the profile.
+        """
+        first_names = MALE_NAMES if self.gender[person_id] == MALE else FEMALE_NAMES
+        first_name = first_names[self.first_name[person_id]]
+        surname = SURNAMES[self.surname[person_id]]
+        current = surname
+        if self.gender[person_id] == FEMALE and self.spouses[person_id]:
+            current = SURNAMES[self.surname[self.spouses[person_id][0]]]
+        birth_year = self.birth[person_id][0]
+        death_year = self.death[person_id][0]
+        birth = "%04d-%02d-%02d" % self.birth[person_id]
+        death = "%04d-%02d-%02d" % self.death[person_id]
+        is_living = int(birth_year > 1940 and not death_year)
+        privacy = self.privacy[person_id]
+        touched = "2024%02d%02d%06d" % (person_id % 12 + 1, person_id % 28 + 1, person_id % 1000000)
+
+        values = {
+            "Id": person_id,
+            "PageId": person_id + PAGE_ID_OFFSET,
+            "Name": self.name(person_id),
+            "IsPerson": 1,
+            "FirstName": first_name,
+            "MiddleName": "",
+            "MiddleInitial": "",
+            "LastNameAtBirth": surname,
+            "LastNameCurrent": current,
+            "Nicknames": "",
+            "LastNameOther": "",
+            "RealName": first_name,
+            "Prefix": "",
+            "Suffix": "",
+            "BirthDate": birth,
+            "DeathDate": death,
+            "BirthLocation": PLACES[person_id % len(PLACES)] if birth_year else "",
+            "DeathLocation": PLACES[(person_id // 3) % len(PLACES)] if death_year else "",
+            "BirthDateDecade": f"{birth_year // 10 * 10}s" if birth_year else "unknown",
+            "DeathDateDecade": f"{death_year // 10 * 10}s" if death_year else "unknown",
+            "Gender": "Male" if self.gender[person_id] == MALE else "Female",
+            "Photo": None,
+            "IsLiving": is_living,
+            "Created": "20100101000000",
+            "Touched": touched,
+            "Privacy": privacy,
+            "Privacy_IsPrivate": privacy == 20,
+            "Privacy_IsPublic": privacy == 50,
+            "Privacy_IsOpen": privacy == 60,
+            "Privacy_IsAtLeastPublic": privacy >= 50,
+            "Privacy_IsSemiPrivate": 30 <= privacy <= 40,
+            "Privacy_IsSemiPrivateBio": privacy == 30,
+            "Manager": 1,
+            "Creator": 1,
+            "Father": self.father[person_id],
+            "Mother": self.mother[person_id],
+            "BioFather": self.father[person_id] or None,
+            "BioMother": self.mother[person_id] or None,
+            "HasChildren": int(bool(self.children[person_id])),
+            "NoChildren": 0,
+            "IsRedirect": 0,
+            "DataStatus": {"BirthDate": "guess" if not self.birth[person_id][2] else "certain"},
+            "PhotoData": None,
+            "Connected": 1,
+            "IsMember": 0,
+            "EditCount": 0,
+            "ResearchStatus": 0,
+        }
+        profile = {
+            field: values[field] for field in PROFILE_FIELDS if field in fields and field in values
+        }
+
+        if "Bio" in fields:
+            bio = (
+                f"== Biography ==\n{first_name} {surname} was born {birth}.\n\n"
+                f"== Sources ==\n<references />\n* Synthetic source {person_id}."
+            )
+            if bio_format in (None, "wiki", "both"):
+                profile["Bio"] = bio
+            if bio_format in ("html", "both"):
+                profile["bioHTML"] = (
+                    f"<h2>Biography</h2><p>{first_name} {surname} was born {birth}.</p>"
+                )
+
+        if nested:
+            relative_fields = fields - RELATIVE_FIELDS
+            for key, relatives in (
+                ("Parents", self.parents(person_id)),
+                ("Siblings", self.siblings(person_id)),
+                ("Spouses", self.spouses[person_id]),
+                ("Children", self.children[person_id]),
+            ):
+                if key in fields:
+                    profile[key] = {
+                        str(relative): self.profile(relative, relative_fields, bio_format, False)
+                        for relative in relatives
+                    }
+        return profile
+
+
+def parse_fields(fields: Optional[str], default: frozenset = DEFAULT_FIELDS) -> frozenset:
+    """
+    Returns the wanted fields of a request.
+
+    :param fields: The "fields" parameter, "*" or None.
+    :param default: The fields for None.
+    """
+    if fields is None:
+        return default
+    names = {field.strip() for field in fields.split(",") if field.strip()}
+    if "*" in names:
+        return frozenset(PROFILE_FIELDS) | RELATIVE_FIELDS
+    return frozenset(names)
+
+
+class MockAPI:
+    """
+    The request handling of the mock, separate from HTTP: answer() takes the
+    form fields of a POST and returns (HTTP status, headers, JSON body).
+    """
+
+    def __init__(
+        self,
+        tree: SyntheticTree,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: Optional[float] = None,
+        throttle_status: int = 200,
+        error_rate: float = 0.0,
+        session_ttl: Optional[float] = None,
+        seed: int = TREE_SEED_DEFAULT,
+    ) -> None:
+        """
+        :param tree: The people to serve.
+        :param latency: Seconds added to every answer.
+        :param jitter: Up to this many more seconds, at random.
+        :param rate_limit: Requests per second allowed (over a one second
+            window) before answers are throttled, or None for no limit.
+        :param throttle_status: 200 to throttle with the "Limit exceeded."
+            status, as the API does, or e.g. 429 to answer with that HTTP status.
+        :param error_rate: The fraction of requests answered with HTTP 503.
+        :param session_ttl: Seconds a login lasts, or None for ever.
+        :param seed: The seed of the random latency and errors.
+        """
+        self.tree = tree
+        self._latency = latency
+        self._jitter = jitter
+        self._rate_limit = rate_limit
+        self._throttle_status = throttle_status
+        self._error_rate = error_rate
+        self._session_ttl = session_ttl
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent: deque = deque()
+        # authcode -> user Id, and session cookie -> (user Id, expiry time).
+        self._authcodes: Dict[str, int] = {}
+        self._sessions: Dict[str, Tuple[int, float]] = {}
+        # The number of logins completed.
+        self.logins = 0
+        # Requests answered, by action.
+        self.counts: Dict[str, int] = {}
+
+    def _throttled(self) -> bool:
+        """Returns whether the request goes over the rate limit."""
+        if self._rate_limit is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and self._recent[0] <= now - 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self._rate_limit:
+                return True
+            self._recent.append(now)
+        return False
+
+    def answer(
+        self, form: Dict[str, str], cookies: Dict[str, str]
+    ) -> Tuple[int, Dict[str, str], object]:
+        """
+        Answers one request.
+
+        :param form: The form fields of the POST.
+        :param cookies: The cookies sent with it.
+        """
+        action = form.get("action", "")
+        with self._lock:
+            self.counts[action] = self.counts.get(action, 0) + 1
+            delay = self._latency + (self._rng.uniform(0, self._jitter) if self._jitter else 0.0)
+            failed = self._error_rate and self._rng.random() < self._error_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 503, {}, {"error": "Service unavailable"}
+        if self._throttled():
+            if self._throttle_status != 200:
+                return self._throttle_status, {"Retry-After": "1"}, {"error": "Too many requests"}
+            return 200, {}, [{"status": LIMIT_EXCEEDED_STATUS}]
+
+        viewer = self._viewer(cookies)
+        if action == "clientLogin":
+            return self._client_login(form, viewer)
+        handler = getattr(self, ACTIONS.get(action, ""), None)
+        if handler is None:
+            return 200, {}, [{"status": f"Unknown action: {action}"}]
+        return 200, {}, handler(form, viewer)
+
+    def _viewer(self, cookies: Dict[str, str]) -> Optional[int]:
+        """Returns the user Id the session cookie is logged in as, or None."""
+        with self._lock:
+            session = self._sessions.get(cookies.get("wikitree_wtb__session", ""))
+        if session is None or session[1] <= time.monotonic():
+            return None
+        return session[0]
+
+    # --- Login ---
+
+    def _client_login(
+        self, form: Dict[str, str], viewer: Optional[int]
+    ) -> Tuple[int, Dict[str, str], object]:
+        """The two steps of clientLogin: credentials, then the authcode; or checkLogin."""
+        if form.get("checkLogin"):
+            user_id = int(form["checkLogin"]) if form["checkLogin"].isdigit() else 0
+            result = "ok" if viewer is not None and viewer == user_id else "error"
+            return 200, {}, {"clientLogin": {"checkLogin": user_id, "result": result}}
+
+        if form.get("doLogin"):
+            if not form.get("wpEmail") or not form.get("wpPassword"):
+                return 200, {}, {"clientLogin": {"result": "Failed"}}
+            authcode = secrets.token_hex(8)
+            with self._lock:
+                self._authcodes[authcode] = 1
+            location = f"https://www.wikitree.com/index.php?authcode={authcode}"
+            return 302, {"Location": location}, {}
+
+        with self._lock:
+            user_id = self._authcodes.pop(form.get("authcode", ""), None)
+        if user_id is None:
+            return 200, {}, {"clientLogin": {"result": "Failed"}}
+        session = secrets.token_hex(16)
+        expiry = float("inf") if self._session_ttl is None else time.monotonic() + self._session_ttl
+        with self._lock:
+            self._sessions[session] = (user_id, expiry)
+            self.logins += 1
+        name = self.tree.name(user_id)
+        cookies = {
+            "wikitree_wtb__session": session,
+            "wikitree_wtb_Token": secrets.token_hex(16),
+            "wikidb_wtb_UserName": name,
+            "wikitree_wtb_UserID": str(user_id),
+        }
+        headers = {"Set-Cookie": [f"{key}={value}; Path=/" for key, value in cookies.items()]}
+        body = {"clientLogin": {"result": "Success", "userid": user_id, "username": name}}
+        return 200, headers, body
+
+    # --- Actions ---
+
+    def _get_person(self, form: Dict[str, str], viewer: Optional[int]) -> list:
+        person_id = self.tree.resolve(form.get("key", ""))
+        if not person_id:
+            return [{"user_name": form.get("key", ""), "status": "Invalid user_name/user_id"}]
+        fields = parse_fields(form.get("fields"))
+        profile = self.tree.profile(person_id, fields, form.get("bioFormat"))
+        return [
+            {
+                "user_id": person_id,
+                "user_name": self.tree.name(person_id),
+                "person": profile,
+                "status": 0,
+            }
+        ]
+
+    def _get_profile(self, form: Dict[str, str], viewer: Optional[int]) -> list:
+        key = form.get("key", "")
+        person_id = self.tree.resolve(key)
+        if not person_id and key.isdigit() and int(key) > PAGE_ID_OFFSET:
+            person_id = self.tree.resolve(int(key) - PAGE_ID_OFFSET)
+        if not person_id:
+            return [{"page_name": key, "status": "Invalid page name/id"}]
+        fields = parse_fields(form.get("fields"))
+        profile = self.tree.profile(person_id, fields, form.get("bioFormat"))
+        return [{"page_name": self.tree.name(person_id), "profile": profile, "status": 0}]
+
+    def _get_people(self, form: Dict[str, str], viewer: Optional[int]) -> list:
+        keys = [key for key in form.get("keys", "").split(",") if key.strip()]
+        if len(keys) > MAX_KEYS:
+            return [{"status": f"Too many keys: at most {MAX_KEYS} are allowed"}]
+        fields = parse_fields(form.get("fields"), DEFAULT_PEOPLE_FIELDS) - RELATIVE_FIELDS
+        bio_format = form.get("bioFormat")
+        ancestors = int(form.get("ancestors") or 0)
+        descendants = int(form.get("descendants") or 0)
+        nuclear = int(form.get("nuclear") or 0)
+        min_generation = int(form.get("minGeneration") or 0)
+        start = int(form.get("start") or 0)
+        limit = min(int(form.get("limit") or MAX_LIMIT), MAX_LIMIT)
+
+        tree = self.tree
+        result_by_key = {}
+        starting: List[int] = []
+        related: Dict[int, None] = {}
+        for key in keys:
+            person_id = tree.resolve(key)
+            if not person_id:
+                result_by_key[key] = {"status": "Invalid key"}
+                continue
+            result_by_key[key] = {"Id": person_id}
+            starting.append(person_id)
+            walks = []
+            if ancestors:
+                walks.append(tree.walk(person_id, ancestors, tree.parents))
+            if descendants:
+                walks.append(tree.walk(person_id, descendants, lambda node: tree.children[node]))
+            if nuclear:
+                walks.append(tree.walk(person_id, nuclear, tree.nuclear))
+            if form.get("siblings") in ("1", "true"):
+                walks.append([(sibling, 0) for sibling in tree.siblings(person_id)])
+            for walk in walks:
+                for relative, generation in walk:
+                    if generation >= min_generation:
+                        related[relative] = None
+
+        starting_set = set(starting)
+        page = [person_id for person_id in related if person_id not in starting_set]
+        page = page[start:start + limit]
+        people = {}
+        for person_id in starting + page:
+            people[str(person_id)] = tree.profile(person_id, fields, bio_format, False)
+        return [{"status": "", "resultByKey": result_by_key, "people": people}]
+
+    def _get_ancestors(self, form: Dict[str, str], viewer: Optional[int]) -> list:
+        person_id = self.tree.resolve(form.get("key", ""))
+        if not person_id:
+            return [{"user_name": form.get("key", ""), "status": "Invalid user_name/user_id"}]
+        fields = parse_fields(form.get("fields")) - RELATIVE_FIELDS
+        depth = int(form.get("depth") or 1)
+        walk = self.tree.walk(person_id, depth, self.tree.parents)
+        ids = [person_id] + [ancestor for ancestor, _ in walk]
+        return [
+            {
+                "user_id": person_id,
+                "user_name": self.tree.name(person_id),
+                "ancestors": [
+                    self.tree.profile(ancestor, fields, form.get("bioFormat"), False)
+                    for ancestor in ids
+                ],
+                "status": 0,
+            }
+        ]
+
+    def _get_descendants(self, form: Dict[str, str], viewer: Optional[int]) -> list:
+        key = form.get("key", "")
+        person_id = self.tree.resolve(key)
+        if not person_id:
+            return [{"key": key, "status": "Invalid user_name/user_id"}]
+        fields = parse_fields(form.get("fields")) - RELATIVE_FIELDS
+        depth = int(form.get("depth") or 1)
+        walk = self.tree.walk(person_id, depth, lambda node: self.tree.children[node])
+        ids = [person_id] + [descendant for descendant, _ in walk]
+        return [
+            {
+                "key": key,
+                "user_id": person_id,
+                "user_name": self.tree.name(person_id),
+                "descendants": [
+                    self.tree.profile(descendant, fields, form.get("bioFormat"), False)
+                    for descendant in ids
+                ],
+                "status": 0,
+            }
+        ]
+
+    def _get_relatives(self, form: Dict[str, str], viewer: Optional[int]) -> list:
+        fields = parse_fields(form.get("fields")) - RELATIVE_FIELDS
+        for flag, key in (
+            ("getParents", "Parents"),
+            ("getChildren", "Children"),
+            ("getSiblings", "Siblings"),
+            ("getSpouses", "Spouses"),
+        ):
+            if form.get(flag) in ("1", "true"):
+                fields = fields | {key}
+        items = []
+        for key in (form.get("keys") or form.get("key") or "").split(","):
+            person_id = self.tree.resolve(key)
+            if not person_id:
+                items.append({"key": key, "status": "Invalid key"})
+                continue
+            items.append(
+                {
+                    "key": key,
+                    "user_id": person_id,
+                    "user_name": self.tree.name(person_id),
+                    "person": self.tree.profile(person_id, fields, form.get("bioFormat")),
+                }
+            )
+        return [{"items": items, "status": 0}]
+
+    def _get_connections(self, form: Dict[str, str], viewer: Optional[int]) -> list:
+        keys = (form.get("keys") or "").split(",")
+        if len(keys) != 2 or not all(self.tree.resolve(key) for key in keys):
+            return [{"status": "Two valid keys are needed"}]
+        ignore_ids = [
+            int(person_id)
+            for person_id in (form.get("ignoreIds") or "").split(",")
+            if person_id.isdigit()
+        ]
+        solver = PathSolver(self.tree.graph())
+        return solver.get_connections(
+            self.tree.resolve(keys[0]),
+            self.tree.resolve(keys[1]),
+            int(form.get("relation") or 0),
+            ignore_ids,
+            form.get("nopath") in ("1", "true"),
+        )
+
+    def _search_person(self, form: Dict[str, str], viewer: Optional[int]) -> list:
+        last_name = (form.get("LastName") or "").lower()
+        first_name = (form.get("FirstName") or "").lower()
+        birth_year = (form.get("BirthDate") or "")[:4]
+        if not birth_year.isdigit():
+            birth_year = ""
+        tree = self.tree
+        candidates: Iterable[int]
+        if last_name:
+            candidates = next(
+                (ids for surname, ids in tree.by_surname.items() if surname.lower() == last_name),
+                [],
+            )
+        else:
+            candidates = range(1, len(tree) + 1)
+        matches = []
+        for person_id in candidates:
+            names = MALE_NAMES if tree.gender[person_id] == MALE else FEMALE_NAMES
+            if first_name and names[tree.first_name[person_id]].lower() != first_name:
+                continue
+            if int(birth_year or 0) and tree.birth[person_id][0] != int(birth_year):
+                continue
+            matches.append(person_id)
+        start = int(form.get("start") or 0)
+        limit = int(form.get("limit") or 10)
+        fields = parse_fields(form.get("fields")) - RELATIVE_FIELDS
+        return [
+            {
+                "matches": [
+                    tree.profile(person_id, fields, None, False)
+                    for person_id in matches[start:start + limit]
+                ],
+                "total": len(matches),
+                "start": start,
+                "limit": limit,
+                "status": 0,
+            }
+        ]
+
+    def _get_watchlist(self, form: Dict[str, str], viewer: Optional[int]) -> list:
+        if viewer is None:
+            return [{"status": "Permission denied: you must be logged in"}]
+        tree = self.tree
+        watched = range(WATCHLIST_EVERY, len(tree) + 1, WATCHLIST_EVERY)
+        fields = parse_fields(form.get("fields")) - RELATIVE_FIELDS
+        order = form.get("order") or "user_id"
+        profiles = None
+        if order == "page_touched":
+            profiles = [
+                tree.profile(person_id, fields | {"Touched"}, None, False) for person_id in watched
+            ]
+            profiles.sort(key=lambda profile: profile["Touched"], reverse=True)
+            if "Touched" not in fields:
+                for profile in profiles:
+                    del profile["Touched"]
+            ordered = None
+        elif order == "user_name":
+            ordered = sorted(watched, key=tree.name)
+        elif order == "user_birth_date":
+            ordered = sorted(watched, key=lambda person_id: tree.birth[person_id])
+        elif order == "user_death_date":
+            ordered = sorted(watched, key=lambda person_id: tree.death[person_id])
+        else:
+            ordered = list(watched)
+        offset = int(form.get("offset") or 0)
+        limit = int(form.get("limit") or 100)
+        if profiles is None:
+            profiles = [
+                tree.profile(person_id, fields, None, False)
+                for person_id in ordered[offset:offset + limit]
+            ]
+        else:
+            profiles = profiles[offset:offset + limit]
+        return [{"watchlistCount": len(watched), "watchlist": profiles, "status": 0}]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Hands the POSTs to the MockAPI of the server."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle's algorithm the
+    # body would wait for the client's delayed ACK on a kept-alive connection.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        length = int(self.headers.get("Content-Length") or 0)
+        form = dict(parse_qsl(self.rfile.read(length).decode("utf-8"), keep_blank_values=True))
+        cookies = {}
+        for cookie in (self.headers.get("Cookie") or "").split(";"):
+            name, _, value = cookie.strip().partition("=")
+            if name:
+                cookies[name] = value
+
+        status, headers, body = self.server.api.answer(form, cookies)
+        data = json.dumps(body, separators=(",", ":")).encode("utf-8")
+        compress = "gzip" in (self.headers.get("Accept-Encoding") or "")
+        if compress:
+            data = gzip.compress(data, compresslevel=1)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+        if self.close_connection:
+            # Without the header, the client may send its next request on
+            # this connection while it is being closed.
+            self.send_header("Connection", "close")
+        for name, value in headers.items():
+            for item in value if isinstance(value, list) else [value]:
+                self.send_header(name, item)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockAPIServer:
+    """
+    Serves a MockAPI over HTTP, from a daemon thread, on 127.0.0.1. Use it as
+    a context manager, or call start() and stop().
+    """
+
+    def __init__(
+        self,
+        size: int = TREE_SIZE_DEFAULT,
+        seed: int = TREE_SEED_DEFAULT,
+        port: int = 0,
+        **options,
+    ) -> None:
+        """
+        :param size: The number of people in the synthetic tree.
+        :param seed: The seed of the tree.
+        :param port: The port to listen on, or 0 for any free one.
+        :param options: The options of MockAPI: latency, jitter, rate_limit,
+            throttle_status, error_rate and session_ttl.
+        """
+        self.api = MockAPI(SyntheticTree(size, seed), seed=seed, **options)
+        self._port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """Return the URL to use as API_URL."""
+        return f"http://127.0.0.1:{self._server.server_address[1]}{API_PATH}"
+
+    def start(self) -> "MockAPIServer":
+        """Starts serving."""
+        self._server = ThreadingHTTPServer(("127.0.0.1", self._port), _Handler)
+        self._server.daemon_threads = True
+        self._server.api = self.api
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        LOGGER.info("Mock WikiTree API with %d people at %s", len(self.api.tree), self.url)
+        return self
+
+    def stop(self) -> None:
+        """Stops serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockAPIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def _serve_in_process(queue, size: int, seed: int, options: dict) -> None:
+    """The body of the process started by start_mock_process."""
+    server = MockAPIServer(size, seed, **options).start()
+    queue.put(server.url)
+    threading.Event().wait()
+
+
+def start_mock_process(
+    size: int = TREE_SIZE_DEFAULT, seed: int = TREE_SEED_DEFAULT, **options
+) -> Tuple[multiprocessing.Process, str]:
+    """
+    Starts a MockAPIServer in a process of its own, so that it does not
+    compete with the client under test for the GIL. Returns the process,
+    to terminate() when done, and the URL to use as API_URL.
+
+    :param size: The number of people in the synthetic tree.
+    :param seed: The seed of the tree.
+    :param options: The options of MockAPI.
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve_in_process, args=(queue, size, seed, options), daemon=True
+    )
+    process.start()
+    return process, queue.get()
+
+
+def main() -> None:
+    """Runs the mock server from the command line."""
+    parser = argparse.ArgumentParser(description="Offline mock of the WikiTree API")
+    parser.add_argument("--size", type=int, default=TREE_SIZE_DEFAULT, help="people in the tree")
+    parser.add_argument("--seed", type=int, default=TREE_SEED_DEFAULT, help="seed of the tree")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to answers")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds")
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests per second")
+    parser.add_argument("--throttle-status", type=int, default=200, help="200 or e.g. 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 answers")
+    parser.add_argument("--session-ttl", type=float, default=None, help="seconds a login lasts")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockAPIServer(
+        args.size,
+        args.seed,
+        args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        throttle_status=args.throttle_status,
+        error_rate=args.error_rate,
+        session_ttl=args.session_ttl,
+    ).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
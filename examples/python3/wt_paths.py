@@ -0,0 +1,356 @@
+"""
+This module defines a local solver for relationship paths between profiles.
+
+getConnections finds how two profiles are related, but every query is a
+round trip to the server. PathSolver answers the same queries from a
+FamilyGraph, with a bidirectional breadth first search, and returns the
+result in the same shape as getConnections:
+
+    solver = PathSolver(graph, session=wt_session)
+    result = solver.get_connections("Adams-35", "Windsor-1", ConnectionRelation.NO_SPOUSES)
+    print(result[0]["pathLength"])
+
+A query that would need part of the tree the graph does not hold (a profile
+whose relatives are not all known) is passed on to the API through the
+session, or raises IncompleteGraphError without one.
+"""
+
+# Standard Imports
+from dataclasses import dataclass
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+# Local imports
+from wt_graph import GENDER_FEMALE, NO_NODE, FamilyGraph
+from wt_session import (
+    CONNECTION_RELATION_DEFAULT,
+    INVERSE_PATH_TYPES,
+    PATH_CHILD,
+    PATH_PARENT,
+    PATH_SIBLING,
+    PATH_SPOUSE,
+    ConnectionRelation,
+    WTSession,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+# The pathStatus of locally found steps. The graph does not keep the
+# certainty of relationships; 0 is what the API uses when it is not known.
+LOCAL_PATH_STATUS = 0
+
+# The fields of the path profiles when a query goes to the API.
+PATH_FIELDS = "Id,Name"
+
+# A step function yields (neighbour, pathType of the step to the neighbour).
+Step = Callable[[int], Iterator[Tuple[int, str]]]
+
+
+class IncompleteGraphError(Exception):
+    """Raised when the graph does not hold enough of the tree to answer a query."""
+
+
+@dataclass
+class PathStats:
+    """Counters of how PathSolver queries were answered."""
+
+    local: int = 0
+    remote: int = 0
+
+
+class PathSolver:
+    """
+    Finds relationship paths in a FamilyGraph, with the relation modes of
+    getConnections:
+
+    * SHORTEST, NO_SPOUSES: through parents, children, siblings and (for
+      SHORTEST) spouses.
+    * COMMON_ANCESTOR, AU_DNA: up from both profiles to a common ancestor.
+      auDNA is shared through any common ancestor, so both are the same here.
+    * COMMON_DESCENDANT: down from both profiles to a common descendant.
+    * FATHERS, MOTHERS: through father or mother links only.
+    * Y_DNA: through father links only, between two male profiles.
+    * MT_DNA: through mother links only; every mother link passes mtDNA on.
+    * ANCESTOR_OR_SHORTEST: COMMON_ANCESTOR if there is such a path,
+      otherwise SHORTEST.
+
+    The search only trusts the graph where it is complete: going up needs a
+    loaded profile, and going down or sideways needs the profile (and, for
+    siblings, its parents) to be marked complete.
+    """
+
+    def __init__(self, graph: FamilyGraph, session: Optional[WTSession] = None) -> None:
+        """
+        :param graph: The family graph to search.
+        :param session: Optional session used for queries the graph cannot answer.
+        """
+        self._graph = graph
+        self._session = session
+        self._stats = PathStats()
+
+    @property
+    def stats(self) -> PathStats:
+        """Return the counters of how queries were answered."""
+        return self._stats
+
+    # --- Steps ---
+
+    def _up(self, node: int) -> Iterator[Tuple[int, str]]:
+        for parent in self._graph.parents(node):
+            yield parent, PATH_CHILD
+
+    def _down(self, node: int) -> Iterator[Tuple[int, str]]:
+        for child in self._graph.children(node):
+            yield child, PATH_PARENT
+
+    def _fathers(self, node: int) -> Iterator[Tuple[int, str]]:
+        father = self._graph.father(node)
+        if father != NO_NODE:
+            yield father, PATH_CHILD
+        for child in self._graph.children(node):
+            if self._graph.father(child) == node:
+                yield child, PATH_PARENT
+
+    def _mothers(self, node: int) -> Iterator[Tuple[int, str]]:
+        mother = self._graph.mother(node)
+        if mother != NO_NODE:
+            yield mother, PATH_CHILD
+        for child in self._graph.children(node):
+            if self._graph.mother(child) == node:
+                yield child, PATH_PARENT
+
+    def _blood(self, node: int) -> Iterator[Tuple[int, str]]:
+        yield from self._up(node)
+        yield from self._down(node)
+        for sibling in self._graph.siblings(node):
+            yield sibling, PATH_SIBLING
+
+    def _all(self, node: int) -> Iterator[Tuple[int, str]]:
+        yield from self._blood(node)
+        for spouse in self._graph.spouses(node):
+            yield spouse, PATH_SPOUSE
+
+    # --- Completeness ---
+
+    def _loaded(self, node: int) -> bool:
+        return self._graph.is_loaded(node)
+
+    def _complete(self, node: int) -> bool:
+        return self._graph.is_loaded(node) and self._graph.is_complete(node)
+
+    def _complete_with_siblings(self, node: int) -> bool:
+        return self._complete(node) and all(
+            self._graph.is_complete(parent) for parent in self._graph.parents(node)
+        )
+
+    def _mode(self, relation: ConnectionRelation) -> Tuple[Step, Callable[[int], bool], bool]:
+        """Returns the step and readiness functions of a relation, and whether it is directed."""
+        if relation == ConnectionRelation.SHORTEST:
+            return self._all, self._complete_with_siblings, False
+        if relation == ConnectionRelation.NO_SPOUSES:
+            return self._blood, self._complete_with_siblings, False
+        if relation in (ConnectionRelation.COMMON_ANCESTOR, ConnectionRelation.AU_DNA):
+            return self._up, self._loaded, True
+        if relation == ConnectionRelation.COMMON_DESCENDANT:
+            return self._down, self._complete, True
+        if relation in (ConnectionRelation.FATHERS, ConnectionRelation.Y_DNA):
+            return self._fathers, self._complete, False
+        if relation in (ConnectionRelation.MOTHERS, ConnectionRelation.MT_DNA):
+            return self._mothers, self._complete, False
+        raise ValueError(f"No local search for relation {relation}")
+
+    # --- Search ---
+
+    def _search(
+        self,
+        source: int,
+        target: int,
+        step: Step,
+        ready: Callable[[int], bool],
+        directed: bool,
+        ignored: Set[int],
+    ) -> Optional[List[Tuple[int, Optional[str]]]]:
+        """
+        Bidirectional breadth first search. Returns the path as a list of
+        (node, pathType of the step to it), or None if there is none.
+
+        Both ends expand with the same step function: for the directed
+        relations a path is up* then down* (or the reverse), so the search
+        from the target runs up (or down) just like the one from the source.
+        An undirected search is over as soon as either side runs out, but a
+        directed one carries on with the other side. Raises
+        IncompleteGraphError when it needs to expand a node that is not ready.
+        """
+        if source == target:
+            return [(source, None)]
+
+        # node -> (neighbour towards the end, pathType, distance from the end)
+        forward: Dict[int, Tuple[int, Optional[str], int]] = {source: (NO_NODE, None, 0)}
+        backward: Dict[int, Tuple[int, Optional[str], int]] = {target: (NO_NODE, None, 0)}
+        forward_frontier = [source]
+        backward_frontier = [target]
+
+        while forward_frontier or backward_frontier:
+            if not (forward_frontier and backward_frontier) and not directed:
+                break
+            is_forward = bool(forward_frontier) and (
+                not backward_frontier or len(forward_frontier) <= len(backward_frontier)
+            )
+            if is_forward:
+                frontier, seen, other = forward_frontier, forward, backward
+            else:
+                frontier, seen, other = backward_frontier, backward, forward
+
+            next_frontier = []
+            best = None
+            for node in frontier:
+                if not ready(node):
+                    raise IncompleteGraphError(self._graph.id(node))
+                distance = seen[node][2] + 1
+                for neighbour, path_type in step(node):
+                    if neighbour in seen or neighbour in ignored:
+                        continue
+                    if not is_forward:
+                        # The path runs from the neighbour to this node.
+                        path_type = INVERSE_PATH_TYPES[path_type]
+                    seen[neighbour] = (node, path_type, distance)
+                    next_frontier.append(neighbour)
+                    if neighbour in other:
+                        length = distance + other[neighbour][2]
+                        if best is None or length < best[0]:
+                            best = (length, neighbour)
+
+            # The first layer in which the searches meet holds a shortest path.
+            if best is not None:
+                return self._join(best[1], forward, backward)
+
+            if is_forward:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+
+        return None
+
+    @staticmethod
+    def _join(
+        meeting: int,
+        forward: Dict[int, Tuple[int, Optional[str], int]],
+        backward: Dict[int, Tuple[int, Optional[str], int]],
+    ) -> List[Tuple[int, Optional[str]]]:
+        """Joins the two halves of the path at the meeting node."""
+        path = []
+        node = meeting
+        while node != NO_NODE:
+            previous, path_type, _ = forward[node]
+            path.append((node, path_type))
+            node = previous
+        path.reverse()
+
+        node = meeting
+        while True:
+            following, path_type, _ = backward[node]
+            if following == NO_NODE:
+                break
+            path.append((following, path_type))
+            node = following
+        return path
+
+    def _solve(
+        self,
+        source: int,
+        target: int,
+        relation: ConnectionRelation,
+        ignored: Set[int],
+    ) -> Tuple[Optional[List[Tuple[int, Optional[str]]]], ConnectionRelation]:
+        """Returns the path (or None) and the relation it was found with."""
+        if relation == ConnectionRelation.ANCESTOR_OR_SHORTEST:
+            path, _ = self._solve(source, target, ConnectionRelation.COMMON_ANCESTOR, ignored)
+            if path is not None:
+                return path, ConnectionRelation.COMMON_ANCESTOR
+            return self._solve(source, target, ConnectionRelation.SHORTEST, ignored)
+
+        if relation == ConnectionRelation.Y_DNA:
+            for node in (source, target):
+                if not self._graph.is_loaded(node):
+                    raise IncompleteGraphError(self._graph.id(node))
+                if self._graph.gender(node) == GENDER_FEMALE:
+                    return None, relation
+
+        step, ready, directed = self._mode(relation)
+        return self._search(source, target, step, ready, directed, ignored), relation
+
+    def _result(
+        self,
+        source: int,
+        target: int,
+        relation: ConnectionRelation,
+        path_type: ConnectionRelation,
+        ignore_ids: List[int],
+        path: Optional[List[Tuple[int, Optional[str]]]],
+        nopath: bool,
+    ) -> List[dict]:
+        """Returns the result in the shape getConnections returns it."""
+        entries = []
+        if path is not None and not nopath:
+            for node, step_type in path:
+                entry = {"Id": self._graph.id(node), "Name": self._graph.name(node)}
+                if step_type is not None:
+                    entry["pathType"] = step_type
+                    entry["pathStatus"] = LOCAL_PATH_STATUS
+                entries.append(entry)
+
+        return [
+            {
+                "status": "",
+                "userid1": self._graph.id(source),
+                "userid2": self._graph.id(target),
+                "relation": relation.value,
+                "ignoreids": ignore_ids,
+                "path": entries,
+                "pathType": path_type.value,
+                "pathLength": len(path) if path is not None else 0,
+            }
+        ]
+
+    def get_connections(
+        self,
+        key1: Union[str, int],
+        key2: Union[str, int],
+        relation: Union[ConnectionRelation, int] = CONNECTION_RELATION_DEFAULT,
+        ignore_ids: Optional[Iterable[int]] = None,
+        nopath: bool = False,
+    ) -> List[dict]:
+        """
+        Returns the relationship path between two profiles, like the
+        getConnections API call. pathLength counts the profiles in the path,
+        both ends included, and is 0 if there is no path.
+
+        :param key1: First WikiTree_ID or User_ID
+        :param key2: Second WikiTree_ID or User_ID
+        :param relation: The kind of path to find, see ConnectionRelation
+        :param ignore_ids: User_IDs the path must not go through
+        :param nopath: Whether to leave the path out of the result
+        """
+        relation = ConnectionRelation(relation)
+        ignore_ids = sorted({int(person_id) for person_id in ignore_ids or ()})
+        try:
+            source = self._graph.index_of(key1)
+            target = self._graph.index_of(key2)
+            for key, node in ((key1, source), (key2, target)):
+                if node == NO_NODE:
+                    raise IncompleteGraphError(key)
+            ignored = {self._graph.index_of(person_id) for person_id in ignore_ids}
+            ignored -= {NO_NODE, source, target}
+
+            path, path_type = self._solve(source, target, relation, ignored)
+        except IncompleteGraphError as error:
+            if self._session is None:
+                raise
+            LOGGER.debug("Not enough of the tree for %s,%s near %s.", key1, key2, error)
+            self._stats.remote += 1
+            return self._session.get_connections(
+                key1, key2, relation, ignore_ids, nopath, fields=PATH_FIELDS
+            )
+
+        self._stats.local += 1
+        return self._result(source, target, relation, path_type, ignore_ids, path, nopath)
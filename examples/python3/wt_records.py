@@ -0,0 +1,647 @@
+"""
+This module defines typed records for person profiles.
+
+The API returns profiles as plain dictionaries, so every user of them digs
+through keys and parses dates, DataStatus and privacy over and over. A
+RecordSet turns API results into Person records instead:
+
+    records = RecordSet()
+    records.ingest(wt_session.get_people(keys, fields="*"))
+    person = records["Hamill-277"]
+    print(person.first_name, person.birth_date.year, person.father.name)
+    if person.data_status.is_guess("BirthDate"):
+        ...
+
+Records use __slots__, keep the core fields (Id, Name, dates, Gender,
+parents, Privacy, Touched) in slots rather than a dictionary, and decode
+dates, DataStatus and privacy flags on first access only, keeping the
+result. Relatives nested in a profile
+(Parents, Children, Siblings, Spouses) become records of their own, and the
+profile keeps only their Ids, so every person is held once however many
+profiles mention them.
+"""
+
+# Standard Imports
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# Local imports
+from wt_graph import RELATIVE_KEYS, iter_profiles, relative_id
+
+# DataStatus values. See getProfile.md.
+STATUS_GUESS = "guess"
+STATUS_CERTAIN = "certain"
+STATUS_BEFORE = "before"
+STATUS_AFTER = "after"
+STATUS_BLANK = "blank"
+
+# Privacy levels. See https://www.wikitree.com/wiki/Help:Privacy
+PRIVACY_UNLISTED = 10
+PRIVACY_PRIVATE = 20
+PRIVACY_SEMI_PRIVATE_BIO = 30
+PRIVACY_SEMI_PRIVATE = 40
+PRIVACY_PUBLIC = 50
+PRIVACY_OPEN = 60
+
+# The Privacy_* fields, with the bit each is kept in.
+PRIVACY_FIELDS = {
+    "Privacy_IsPrivate": 1,
+    "Privacy_IsPublic": 2,
+    "Privacy_IsOpen": 4,
+    "Privacy_IsAtLeastPublic": 8,
+    "Privacy_IsSemiPrivate": 16,
+    "Privacy_IsSemiPrivateBio": 32,
+}
+
+# The field holding the rendered bio, with bioFormat "html" or "both".
+BIO_HTML_FIELD = "bioHTML"
+
+# The fields kept in slots of their own, by the slot they are kept in. The
+# values of the other fields go in a list, laid out as in _layout().
+CORE_FIELDS = {
+    "Id": "_id",
+    "Name": "_name",
+    "Gender": "_gender",
+    "Father": "_father",
+    "Mother": "_mother",
+    "BirthDate": "_raw_birth_date",
+    "DeathDate": "_raw_death_date",
+    "Privacy": "_raw_privacy",
+    "Touched": "_touched",
+}
+
+# Marks a value that has not been decoded yet.
+_UNSET = object()
+
+# Marks a core field the API did not return.
+_MISSING = object()
+
+# Field name -> position in the values list, for each sequence of other
+# fields seen, shared by every record with those fields.
+_LAYOUTS: Dict[Tuple[str, ...], Dict[str, int]] = {}
+
+
+def _layout(names: Tuple[str, ...]) -> Dict[str, int]:
+    """Returns the shared layout of a sequence of field names."""
+    layout = _LAYOUTS.get(names)
+    if layout is None:
+        layout = _LAYOUTS.setdefault(names, {name: index for index, name in enumerate(names)})
+    return layout
+
+
+class PartialDate(NamedTuple):
+    """A date as the API gives it, where the month and day may be unknown (0)."""
+
+    year: int
+    month: int = 0
+    day: int = 0
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> Optional["PartialDate"]:
+        """
+        Returns the date of a "YYYY-MM-DD" string, or None if it is missing,
+        unparsable or all zeros.
+
+        :param value: The date, as returned by the API.
+        """
+        if not value:
+            return None
+        try:
+            year, month, day = (int(part) for part in value.split("-"))
+        except ValueError:
+            return None
+        if not (year or month or day):
+            return None
+        return cls(year, month, day)
+
+    @property
+    def is_exact(self) -> bool:
+        """Return whether the month and day are known."""
+        return bool(self.year and self.month and self.day)
+
+    def __str__(self) -> str:
+        return f"{self.year:04d}-{self.month:02d}-{self.day:02d}"
+
+
+class DataStatus:
+    """
+    The DataStatus of a profile: how certain each of its fields is.
+    See "DataStatus Details" in getProfile.md.
+    """
+
+    __slots__ = ("_statuses",)
+
+    def __init__(self, statuses: Optional[dict]) -> None:
+        """
+        :param statuses: The DataStatus field of the profile.
+        """
+        self._statuses = statuses if isinstance(statuses, dict) else {}
+
+    def get(self, field: str) -> Any:
+        """Returns the raw status of a field, "" if not set."""
+        return self._statuses.get(field, "")
+
+    def is_guess(self, field: str) -> bool:
+        """Returns whether a field is marked as a guess ("about")."""
+        return self.get(field) == STATUS_GUESS
+
+    def is_certain(self, field: str) -> bool:
+        """Returns whether a field is marked as certain."""
+        return self.get(field) == STATUS_CERTAIN
+
+    def is_before(self, field: str) -> bool:
+        """Returns whether a date field is marked "before"."""
+        return self.get(field) == STATUS_BEFORE
+
+    def is_after(self, field: str) -> bool:
+        """Returns whether a date field is marked "after"."""
+        return self.get(field) == STATUS_AFTER
+
+    def is_blank(self, field: str) -> bool:
+        """Returns whether a field is marked as deliberately blank."""
+        return self.get(field) == STATUS_BLANK
+
+    def confidence(self, field: str) -> int:
+        """
+        Returns the confidence of a parent relationship (Father, Mother,
+        BioFather or BioMother): 5 non-biological, 10 uncertain, 20 confident,
+        30 confirmed with DNA, or 0 if not set.
+        """
+        try:
+            return int(self.get(field) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def __repr__(self) -> str:
+        return f"DataStatus({self._statuses!r})"
+
+
+class Person:
+    """
+    One person profile. The fields of the API result are available by name,
+    person["FirstName"], and the common ones as attributes.
+
+    The CORE_FIELDS are kept in slots, as returned, and the values of the
+    other fields in a list whose layout (the position of each field) is
+    shared by the records with the same fields, so a record takes less
+    memory than the profile dictionary it was made from.
+    """
+
+    __slots__ = (
+        *CORE_FIELDS.values(),
+        "_layout",
+        "_values",
+        "_records",
+        "_relatives",
+        "_birth_date",
+        "_death_date",
+        "_data_status",
+        "_privacy_flags",
+        "_bio",
+    )
+
+    def __init__(
+        self,
+        fields: dict,
+        records: Optional["RecordSet"] = None,
+        relatives: Optional[Dict[str, Tuple[int, ...]]] = None,
+    ) -> None:
+        """
+        :param fields: The fields of the profile, without nested relatives.
+        :param records: The RecordSet the relatives are looked up in.
+        :param relatives: The Ids of the nested relatives, by relative key.
+        """
+        for slot in CORE_FIELDS.values():
+            setattr(self, slot, _MISSING)
+        # The fields that are not CORE_FIELDS: their shared layout and their
+        # values, or None if there are none.
+        self._layout: Optional[Dict[str, int]] = None
+        self._values: Optional[List[Any]] = None
+        self._set_fields(fields)
+        self._records = records
+        # Relative key -> Ids, for the relatives nested in the profile.
+        self._relatives = relatives or None
+        self._reset()
+
+    def _reset(self) -> None:
+        """Forgets the decoded values."""
+        self._birth_date = _UNSET
+        self._death_date = _UNSET
+        self._data_status = _UNSET
+        self._privacy_flags = _UNSET
+        self._bio = _UNSET
+
+    def _set_fields(self, fields: dict) -> None:
+        """Stores fields, each in its slot or in the values of the others."""
+        new_fields = {}
+        for field, value in fields.items():
+            slot = CORE_FIELDS.get(field)
+            if slot is not None:
+                setattr(self, slot, value)
+            elif self._layout is not None and field in self._layout:
+                self._values[self._layout[field]] = value
+            else:
+                new_fields[field] = value
+        if new_fields:
+            self._layout = _layout(tuple(self._layout or ()) + tuple(new_fields))
+            self._values = (self._values or []) + list(new_fields.values())
+
+    def _update(self, fields: dict, relatives: Dict[str, Tuple[int, ...]]) -> None:
+        """Merges a newer version of the profile in."""
+        self._set_fields(fields)
+        if relatives:
+            if self._relatives is None:
+                self._relatives = {}
+            self._relatives.update(relatives)
+        self._reset()
+
+    # --- Fields ---
+
+    def __getitem__(self, field: str) -> Any:
+        value = self.get(field, _MISSING)
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
+
+    def __contains__(self, field: str) -> bool:
+        return self.get(field, _MISSING) is not _MISSING
+
+    def get(self, field: str, default: Any = None) -> Any:
+        """Returns a field of the profile, or default if it was not returned."""
+        slot = CORE_FIELDS.get(field)
+        if slot is not None:
+            value = getattr(self, slot)
+            return default if value is _MISSING else value
+        if self._layout is None or field not in self._layout:
+            return default
+        return self._values[self._layout[field]]
+
+    def to_dict(self) -> dict:
+        """Returns the fields of the profile as a new dictionary, without relatives."""
+        fields = {}
+        for field, slot in CORE_FIELDS.items():
+            value = getattr(self, slot)
+            if value is not _MISSING:
+                fields[field] = value
+        if self._layout is not None:
+            fields.update(zip(self._layout, self._values))
+        return fields
+
+    @property
+    def id(self) -> Optional[int]:
+        """Return the Id (User ID)."""
+        return relative_id(self.get("Id"))
+
+    @property
+    def page_id(self) -> Optional[int]:
+        """Return the PageId."""
+        return relative_id(self.get("PageId"))
+
+    @property
+    def name(self) -> Optional[str]:
+        """Return the WikiTree ID."""
+        return self.get("Name")
+
+    @property
+    def first_name(self) -> Optional[str]:
+        """Return the first name."""
+        return self.get("FirstName")
+
+    @property
+    def middle_name(self) -> Optional[str]:
+        """Return the middle name."""
+        return self.get("MiddleName")
+
+    @property
+    def real_name(self) -> Optional[str]:
+        """Return the preferred first name."""
+        return self.get("RealName")
+
+    @property
+    def last_name_at_birth(self) -> Optional[str]:
+        """Return the last name at birth."""
+        return self.get("LastNameAtBirth")
+
+    @property
+    def last_name_current(self) -> Optional[str]:
+        """Return the current last name."""
+        return self.get("LastNameCurrent")
+
+    @property
+    def gender(self) -> Optional[str]:
+        """Return "Male", "Female" or "" (unknown)."""
+        return self.get("Gender")
+
+    @property
+    def is_living(self) -> bool:
+        """Return whether the person is considered living."""
+        return bool(int(self.get("IsLiving") or 0))
+
+    @property
+    def touched(self) -> Optional[str]:
+        """Return when the profile was last modified, YYYYMMDDHHMMSS."""
+        return self.get("Touched")
+
+    @property
+    def father_id(self) -> Optional[int]:
+        """Return the Id of the father, or None."""
+        return relative_id(self.get("Father"))
+
+    @property
+    def mother_id(self) -> Optional[int]:
+        """Return the Id of the mother, or None."""
+        return relative_id(self.get("Mother"))
+
+    @property
+    def bio(self) -> Optional[str]:
+        """
+        Return the biography, as rendered HTML if the BioLoader of the
+        RecordSet loads bioFormat "html". A profile fetched without it gets
+        it from the BioLoader, if there is one, on first access, and keeps
+        it, or the fact that it could not be seen.
+        """
+        if self._bio is _UNSET:
+            loader = self._records.bio_loader if self._records is not None else None
+            if "Bio" not in self and BIO_HTML_FIELD not in self:
+                if loader is None or self.id is None:
+                    return None
+                lazy = loader.request(self.id, self.touched)
+                self._set_fields(lazy.fields)
+                self._bio = lazy.text
+            elif loader is not None and loader.bio_format == "html" and BIO_HTML_FIELD in self:
+                self._bio = self[BIO_HTML_FIELD]
+            else:
+                self._bio = self.get("Bio", self.get(BIO_HTML_FIELD))
+        return self._bio
+
+    def derived(self, name: str) -> Optional[str]:
+        """
+        Returns a derived field, e.g. "ShortName" or "LongName", requested as
+        "Derived.ShortName".
+
+        :param name: The name of the derived field, without "Derived.".
+        """
+        derived = self.get("Derived")
+        if isinstance(derived, dict) and name in derived:
+            return derived[name]
+        return self.get(f"Derived.{name}")
+
+    # --- Decoded on first access ---
+
+    @property
+    def birth_date(self) -> Optional[PartialDate]:
+        """Return the date of birth, or None."""
+        if self._birth_date is _UNSET:
+            self._birth_date = PartialDate.parse(self.get("BirthDate"))
+        return self._birth_date
+
+    @property
+    def death_date(self) -> Optional[PartialDate]:
+        """Return the date of death, or None."""
+        if self._death_date is _UNSET:
+            self._death_date = PartialDate.parse(self.get("DeathDate"))
+        return self._death_date
+
+    @property
+    def data_status(self) -> DataStatus:
+        """Return how certain the fields of the profile are."""
+        if self._data_status is _UNSET:
+            self._data_status = DataStatus(self.get("DataStatus"))
+        return self._data_status
+
+    @property
+    def privacy(self) -> Optional[int]:
+        """Return the privacy level, see the PRIVACY_ constants."""
+        try:
+            return int(self.get("Privacy"))
+        except (TypeError, ValueError):
+            return None
+
+    def _privacy_flag(self, field: str) -> bool:
+        """
+        Returns one of the Privacy_* booleans, from the field if the API
+        returned it and from Privacy otherwise.
+        """
+        if self._privacy_flags is _UNSET:
+            flags = 0
+            privacy = self.privacy
+            for name, bit in PRIVACY_FIELDS.items():
+                if name in self:
+                    value = bool(self[name])
+                elif privacy is not None:
+                    value = _privacy_from_level(name, privacy)
+                else:
+                    value = False
+                if value:
+                    flags |= bit
+            self._privacy_flags = flags
+        return bool(self._privacy_flags & PRIVACY_FIELDS[field])
+
+    @property
+    def is_private(self) -> bool:
+        """Return whether the profile is Private."""
+        return self._privacy_flag("Privacy_IsPrivate")
+
+    @property
+    def is_public(self) -> bool:
+        """Return whether the profile is Public."""
+        return self._privacy_flag("Privacy_IsPublic")
+
+    @property
+    def is_open(self) -> bool:
+        """Return whether the profile is Open."""
+        return self._privacy_flag("Privacy_IsOpen")
+
+    @property
+    def is_at_least_public(self) -> bool:
+        """Return whether the profile is Public or Open."""
+        return self._privacy_flag("Privacy_IsAtLeastPublic")
+
+    @property
+    def is_semi_private(self) -> bool:
+        """Return whether the profile is one of the Semi-Private levels."""
+        return self._privacy_flag("Privacy_IsSemiPrivate")
+
+    @property
+    def is_semi_private_bio(self) -> bool:
+        """Return whether the profile is Semi-Private with a public biography."""
+        return self._privacy_flag("Privacy_IsSemiPrivateBio")
+
+    # --- Relatives ---
+
+    def _lookup(self, person_id: Optional[int]) -> Optional["Person"]:
+        if person_id is None or self._records is None:
+            return None
+        return self._records.get(person_id)
+
+    def _relative_records(self, key: str) -> List["Person"]:
+        """Returns the records of the relatives nested under key."""
+        if self._relatives is None or self._records is None:
+            return []
+        return [
+            person
+            for person in (self._records.get(person_id) for person_id in self._relatives.get(key, ()))
+            if person is not None
+        ]
+
+    def has_relatives(self, key: str) -> bool:
+        """
+        Returns whether the relatives under key ("Parents", "Children",
+        "Siblings" or "Spouses") were returned with the profile.
+        """
+        return self._relatives is not None and key in self._relatives
+
+    @property
+    def father(self) -> Optional["Person"]:
+        """Return the father's record, if it is in the RecordSet."""
+        return self._lookup(self.father_id)
+
+    @property
+    def mother(self) -> Optional["Person"]:
+        """Return the mother's record, if it is in the RecordSet."""
+        return self._lookup(self.mother_id)
+
+    @property
+    def parents(self) -> List["Person"]:
+        """Return the records of the known parents."""
+        return [parent for parent in (self.father, self.mother) if parent is not None]
+
+    @property
+    def children(self) -> List["Person"]:
+        """Return the records of the children, if they were returned."""
+        return self._relative_records("Children")
+
+    @property
+    def spouses(self) -> List["Person"]:
+        """Return the records of the spouses, if they were returned."""
+        return self._relative_records("Spouses")
+
+    @property
+    def siblings(self) -> List["Person"]:
+        """Return the records of the siblings, if they were returned."""
+        return self._relative_records("Siblings")
+
+    def __repr__(self) -> str:
+        return f"Person({self.id}, {self.name!r})"
+
+
+def _privacy_from_level(field: str, privacy: int) -> bool:
+    """Returns a Privacy_* boolean from the privacy level."""
+    if field == "Privacy_IsPrivate":
+        return privacy == PRIVACY_PRIVATE
+    if field == "Privacy_IsPublic":
+        return privacy == PRIVACY_PUBLIC
+    if field == "Privacy_IsOpen":
+        return privacy == PRIVACY_OPEN
+    if field == "Privacy_IsAtLeastPublic":
+        return privacy >= PRIVACY_PUBLIC
+    if field == "Privacy_IsSemiPrivate":
+        return PRIVACY_SEMI_PRIVATE_BIO <= privacy <= PRIVACY_SEMI_PRIVATE
+    return privacy == PRIVACY_SEMI_PRIVATE_BIO
+
+
+class RecordSet:
+    """
+    A set of Person records, by Id and WikiTree ID. Adding a profile that is
+    already there merges the newer fields into the existing record, so that
+    references to it stay valid.
+    """
+
+    def __init__(self, bio_loader=None) -> None:
+        """
+        :param bio_loader: Optional BioLoader for the bios of records fetched without them.
+        """
+        self._by_id: Dict[int, Person] = {}
+        self._by_name: Dict[str, Person] = {}
+        self._bio_loader = bio_loader
+
+    @property
+    def bio_loader(self):
+        """Return the BioLoader, or None."""
+        return self._bio_loader
+
+    def prefetch_bios(self, people: Iterable[Person]) -> None:
+        """
+        Requests the bios of records, so that the first Person.bio read
+        fetches them all at once. Does nothing without a BioLoader.
+
+        :param people: The records whose bios will be read.
+        """
+        if self._bio_loader is None:
+            return
+        for person in people:
+            if "Bio" not in person and BIO_HTML_FIELD not in person and person.id is not None:
+                self._bio_loader.request(person.id, person.touched)
+
+    def add(self, profile: dict, person_id: Optional[int] = None) -> Optional[Person]:
+        """
+        Adds one profile, and any relatives nested in it, and returns its
+        record, or None if it has no Id.
+
+        :param profile: The profile, as returned by the API.
+        :param person_id: The Id, if the profile itself doesn't have one.
+        """
+        person_id = relative_id(profile.get("Id", person_id))
+        if person_id is None:
+            return None
+
+        fields = {}
+        relatives = {}
+        for key, value in profile.items():
+            if key not in RELATIVE_KEYS:
+                fields[key] = value
+            elif isinstance(value, dict):
+                ids = []
+                for relative_key, relative in value.items():
+                    if isinstance(relative, dict):
+                        record = self.add(relative, relative_id(relative_key))
+                        if record is not None:
+                            ids.append(record.id)
+                relatives[key] = tuple(ids)
+
+        person = self._by_id.get(person_id)
+        if person is None:
+            person = Person(fields, self, relatives)
+            self._by_id[person_id] = person
+        else:
+            person._update(fields, relatives)  # pylint: disable=protected-access
+        if person.name:
+            self._by_name[person.name] = person
+        return person
+
+    def ingest(self, payload) -> int:
+        """
+        Adds every profile in an API result and returns how many were added.
+        Understands the same results as FamilyGraph.ingest.
+
+        :param payload: The API result.
+        """
+        count = 0
+        for profile in iter_profiles(payload):
+            if self.add(profile) is not None:
+                count += 1
+        return count
+
+    def get(self, key: Union[str, int]) -> Optional[Person]:
+        """
+        Returns the record of an Id or WikiTree ID, or None.
+
+        :param key: Wanted WikiTree_ID or User_ID
+        """
+        if isinstance(key, int) or (isinstance(key, str) and key.isdigit()):
+            return self._by_id.get(int(key))
+        return self._by_name.get(key)
+
+    def __getitem__(self, key: Union[str, int]) -> Person:
+        person = self.get(key)
+        if person is None:
+            raise KeyError(key)
+        return person
+
+    def __contains__(self, key: Union[str, int]) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[Person]:
+        return iter(self._by_id.values())
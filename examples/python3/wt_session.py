@@ -9,25 +9,45 @@ It requires python3 and the requests library.
 """
 
 # Standard Imports
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from enum import Enum
 from getpass import getpass
+from json import loads
 from json.decoder import JSONDecodeError
 import logging
 from pprint import pprint
+import queue
+import random
 import re
 import sys
-from typing import Optional, Union
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 # Third party imports
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Local imports
+from wt_stream import STREAM_CHUNK_SIZE, JSONStreamDecoder, StreamEntry
 
-logging.basicConfig(level=logging.ERROR)
 LOGGER = logging.getLogger(__name__)
-LOGGER.setLevel(logging.ERROR)
 
 # Define the WikiTree API endpoint
 API_URL = "https://api.wikitree.com/api.php"
 
+# HTTP transport defaults: connections kept open to the API, and the seconds
+# allowed to connect and to wait for each read of the response.
+POOL_SIZE_DEFAULT = 32
+CONNECT_TIMEOUT_DEFAULT = 10.0
+READ_TIMEOUT_DEFAULT = 60.0
+
+# The status the API returns when a client is being throttled.
+LIMIT_EXCEEDED_STATUS = "Limit exceeded."
+
 VALID_SEARCH_ARGS = [
     "FirstName",
     "LastName",
@@ -85,6 +105,751 @@ class WatchlistOrder(Enum):
 WATCHLIST_ORDER_DEFAULT = WatchlistOrder.USER_ID
 
 
+class ConnectionRelation(Enum):
+    """An enumeration for all valid getConnections relation values."""
+
+    SHORTEST = 0
+    NO_SPOUSES = 1
+    COMMON_ANCESTOR = 2
+    COMMON_DESCENDANT = 3
+    FATHERS = 4
+    MOTHERS = 5
+    Y_DNA = 6
+    MT_DNA = 7
+    AU_DNA = 8
+    ANCESTOR_OR_SHORTEST = 11
+
+
+# The default getConnections relation.
+CONNECTION_RELATION_DEFAULT = ConnectionRelation.SHORTEST
+
+# The pathType of a getConnections path step, which describes the previous
+# profile in the path in relation to the current one.
+PATH_CHILD = "child"
+PATH_PARENT = "parent"
+PATH_SPOUSE = "spouse"
+PATH_SIBLING = "sibling"
+
+# The pathType of the same step taken the other way.
+INVERSE_PATH_TYPES = {
+    PATH_CHILD: PATH_PARENT,
+    PATH_PARENT: PATH_CHILD,
+    PATH_SPOUSE: PATH_SPOUSE,
+    PATH_SIBLING: PATH_SIBLING,
+}
+
+# The maximum number of keys in a single getPeople call, with and without
+# any of ancestors, descendants or nuclear set. See getPeople.md.
+GET_PEOPLE_MAX_KEYS = 1000
+GET_PEOPLE_MAX_KEYS_WITH_RELATIVES = 100
+
+# The maximum (and default) number of related profiles in a getPeople page.
+GET_PEOPLE_MAX_LIMIT = 1000
+
+# The default number of threads used to fetch getPeople chunks in parallel.
+MAX_WORKERS_DEFAULT = 8
+
+# The query methods map may call: those taking a single key as their first
+# argument and returning the result of one API call.
+MAP_METHODS = frozenset(
+    [
+        "get_ancestors",
+        "get_bio",
+        "get_connected_dna_tests_by_profile",
+        "get_connected_profiles_by_dna_test",
+        "get_connections",
+        "get_descendants",
+        "get_dna_tests_by_test_taker",
+        "get_person",
+        "get_photos",
+        "get_profile",
+        "get_relatives",
+    ]
+)
+
+# The default number of pages fetched ahead of the consumer by iter_people.
+PREFETCH_PAGES_DEFAULT = 2
+
+# The default time, in seconds, that coalesced getPerson/getProfile calls
+# wait for company before being sent as one getPeople call.
+COALESCE_WINDOW_DEFAULT = 0.005
+
+# Fields that getPerson/getProfile can return but getPeople cannot.
+RELATIVE_FIELDS = {"Parents", "Children", "Siblings", "Spouses"}
+
+# Rate limiter defaults, in requests per second. The rate starts at
+# RATE_DEFAULT, halves on each throttled response and grows by RATE_INCREASE
+# after every RATE_SUCCESS_RUN successful ones, within RATE_MIN..RATE_MAX.
+RATE_DEFAULT = 10.0
+RATE_MIN = 0.2
+RATE_MAX = 50.0
+RATE_INCREASE = 1.0
+RATE_DECREASE = 0.5
+RATE_SUCCESS_RUN = 20
+
+# The circuit breaker opens after this many throttled or failed requests in a
+# row, and lets a request through again after this many seconds.
+BREAKER_THRESHOLD = 8
+BREAKER_TIMEOUT = 60.0
+
+# The default number of retries of a throttled or failed request, and the
+# bounds, in seconds, of the jittered exponential backoff between them.
+RETRIES_DEFAULT = 3
+RETRY_BACKOFF_BASE = 1.0
+RETRY_BACKOFF_MAX = 30.0
+
+
+def merge_people_results(results: Iterable) -> list:
+    """
+    Merges several getPeople results into one, in the same shape as a single
+    getPeople result. The status is the first non-empty status found.
+
+    :param results: The getPeople results to merge.
+    """
+    merged = {"status": "", "resultByKey": {}, "people": {}}
+    for result in results:
+        if not isinstance(result, list) or not result:
+            continue
+        item = result[0]
+        if item.get("status") and not merged["status"]:
+            merged["status"] = item["status"]
+        merged["resultByKey"].update(item.get("resultByKey") or {})
+        merged["people"].update(item.get("people") or {})
+    return [merged]
+
+
+def count_related(item: dict) -> int:
+    """
+    Returns the number of related profiles in a page of getPeople: the
+    people that are not the profiles of its keys, which are on every page.
+
+    :param item: The getPeople result item.
+    """
+    key_ids = {
+        str(answer["Id"])
+        for answer in (item.get("resultByKey") or {}).values()
+        if isinstance(answer, dict) and answer.get("Id")
+    }
+    return sum(1 for person_id in item.get("people") or {} if person_id not in key_ids)
+
+
+def prefetch(iterable: Iterable, size: int = PREFETCH_PAGES_DEFAULT) -> Iterator:
+    """
+    Iterates over iterable in a background thread, keeping at most size
+    items ready ahead of the consumer. Exceptions raised by the iterable
+    are re-raised in the consumer. Closing the returned generator stops
+    the background thread.
+
+    :param iterable: The iterable to consume in the background.
+    :param size: The maximum number of items held ahead of the consumer.
+    """
+    done = object()
+    items = queue.Queue(maxsize=max(1, size))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Wait for room, but give up if the consumer has gone away.
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except Exception as error:  # pylint: disable=broad-except
+            put((done, error))
+            return
+        put((done, None))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def response_status(data) -> Union[str, int, None]:
+    """
+    Returns the "status" of an API response, whether the response is a list
+    of result items (as most actions return) or a single dictionary.
+
+    :param data: The decoded API response.
+    """
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        return data[0].get("status")
+    if isinstance(data, dict):
+        return data.get("status")
+    return None
+
+
+class RequestEvent(NamedTuple):
+    """
+    One request sent to the API, as reported to the hooks of a session. The
+    times are in seconds: opening a connection (0 when one was reused),
+    waiting for the server (up to the response headers), reading the body and
+    decoding the JSON. Streamed responses are decoded as they are read, and
+    their decode time is not measured.
+    """
+
+    action: str
+    attempt: int
+    status_code: int = 0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    connect: float = 0.0
+    wait: float = 0.0
+    download: float = 0.0
+    decode: float = 0.0
+    throttled: bool = False
+    limit_exceeded: bool = False
+    error: Optional[str] = None
+
+
+class MapResult(NamedTuple):
+    """The outcome of one call made by WTSession.map."""
+
+    key: Union[str, int, Tuple]
+    result: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """Returns whether the call succeeded."""
+        return self.error is None
+
+
+# A map progress callback, called with the number of calls done so far and
+# the total number of calls, if known.
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+def canonical_pair(key1: Union[str, int], key2: Union[str, int]) -> Tuple:
+    """
+    Returns the pair of keys in a fixed order, so that (a, b) and (b, a) are
+    the same pair.
+    """
+    return (key1, key2) if str(key1) <= str(key2) else (key2, key1)
+
+
+def group_pairs(pairs: Iterable[Tuple]) -> Dict[Tuple, List[Tuple]]:
+    """
+    Returns the distinct canonical pairs, in order of first appearance, each
+    with the pairs asked for that it answers.
+
+    :param pairs: (key1, key2) pairs.
+    """
+    groups: Dict[Tuple, List[Tuple]] = {}
+    for key1, key2 in pairs:
+        groups.setdefault(canonical_pair(key1, key2), []).append((key1, key2))
+    return groups
+
+
+def answer_pairs(map_result: "MapResult", pairs: List[Tuple]) -> Iterator["MapResult"]:
+    """
+    Yields a MapResult for each of the pairs answered by the getConnections
+    call for their canonical pair, reversing the result where needed.
+
+    :param map_result: The outcome of the call for the canonical pair.
+    :param pairs: The pairs asked for.
+    """
+    for pair in pairs:
+        if pair == map_result.key or map_result.result is None:
+            yield map_result._replace(key=pair)
+        else:
+            yield map_result._replace(key=pair, result=reverse_connection(map_result.result))
+
+
+def reverse_connection(result: list) -> list:
+    """
+    Returns a getConnections result for the keys the other way round: the
+    user ids swapped and the path reversed, each step's pathType turned
+    around. A pathType with no known inverse is left as it is.
+
+    :param result: The getConnections result.
+    """
+    reversed_result = []
+    for item in result:
+        item = dict(item)
+        item["userid1"], item["userid2"] = item.get("userid2"), item.get("userid1")
+        path = item.get("path") or []
+        new_path = []
+        for index in range(len(path) - 1, -1, -1):
+            entry = {"Id": path[index].get("Id"), "Name": path[index].get("Name")}
+            if new_path:
+                # The step into this entry was the step out of it, before.
+                step = path[index + 1]
+                path_type = step.get("pathType")
+                entry["pathType"] = INVERSE_PATH_TYPES.get(path_type, path_type)
+                entry["pathStatus"] = step.get("pathStatus")
+            new_path.append(entry)
+        item["path"] = new_path
+        reversed_result.append(item)
+    return reversed_result
+
+
+def is_throttled(status_code: int, data) -> bool:
+    """
+    Returns whether a response means we are sending too much: an HTTP 429 or
+    5xx, or a "Limit exceeded." status from the API.
+
+    :param status_code: The HTTP status code.
+    :param data: The decoded API response.
+    """
+    return (
+        status_code == 429
+        or status_code >= 500
+        or response_status(data) == LIMIT_EXCEEDED_STATUS
+    )
+
+
+def retry_delay(attempt: int) -> float:
+    """
+    Returns the seconds to wait before retry number attempt (from 0), drawn
+    uniformly up to an exponentially growing, capped bound.
+
+    :param attempt: The number of the retry, from 0.
+    """
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is refused because the circuit breaker is open."""
+
+
+class RateLimiter:
+    """
+    A client side token bucket rate limiter, shared by every thread and task
+    sending requests for one appId.
+
+    The rate adapts to the server (additive increase, multiplicative
+    decrease): it is cut on each throttled response and raised slowly after a
+    run of successful ones. After too many throttled or failed requests in a
+    row the circuit breaker opens and requests are refused, with
+    CircuitOpenError, until it has cooled down.
+
+    All methods are thread-safe, and reserve() never blocks, so the same
+    limiter can serve threads and asyncio tasks at the same time.
+    """
+
+    _shared: Dict[str, "RateLimiter"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        rate: float = RATE_DEFAULT,
+        min_rate: float = RATE_MIN,
+        max_rate: float = RATE_MAX,
+        increase: float = RATE_INCREASE,
+        decrease: float = RATE_DECREASE,
+        success_run: int = RATE_SUCCESS_RUN,
+        breaker_threshold: int = BREAKER_THRESHOLD,
+        breaker_timeout: float = BREAKER_TIMEOUT,
+    ) -> None:
+        """
+        :param rate: The starting rate, in requests per second.
+        :param min_rate: The lowest the rate is cut to.
+        :param max_rate: The highest the rate is raised to.
+        :param increase: Requests per second added after a run of successes.
+        :param decrease: Factor the rate is multiplied by when throttled.
+        :param success_run: Number of successes in a row that raise the rate.
+        :param breaker_threshold: Failures in a row that open the breaker.
+        :param breaker_timeout: Seconds the breaker stays open.
+        """
+        self._rate = rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._increase = increase
+        self._decrease = decrease
+        self._success_run = success_run
+        self._breaker_threshold = breaker_threshold
+        self._breaker_timeout = breaker_timeout
+
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._successes = 0
+        self._failures = 0
+        self._open_until = 0.0
+
+    @classmethod
+    def shared(cls, app_id: str, **kwargs) -> "RateLimiter":
+        """
+        Returns the rate limiter shared by every session using app_id,
+        creating it with the given arguments if necessary.
+
+        :param app_id: The appId the limiter is for.
+        """
+        with cls._shared_lock:
+            limiter = cls._shared.get(app_id)
+            if limiter is None:
+                limiter = cls._shared[app_id] = cls(**kwargs)
+            return limiter
+
+    @property
+    def rate(self) -> float:
+        """Return the current rate, in requests per second."""
+        return self._rate
+
+    @property
+    def is_open(self) -> bool:
+        """Returns whether the circuit breaker is refusing requests."""
+        return time.monotonic() < self._open_until
+
+    def reserve(self) -> float:
+        """
+        Takes a token and returns how many seconds to wait before using it.
+        Raises CircuitOpenError if the circuit breaker is open.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._open_until:
+                raise CircuitOpenError(
+                    f"Too many throttled requests, retry in {self._open_until - now:.0f}s"
+                )
+
+            # Refill, allowing a burst of at most one second's worth.
+            burst = max(1.0, self._rate)
+            self._tokens = min(burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+
+            # The token may be borrowed from the future, in which case the
+            # caller waits until it would have been there.
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    def acquire(self) -> float:
+        """Blocks until a request may be sent. Returns the seconds waited."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def on_success(self) -> None:
+        """Records a successful request."""
+        with self._lock:
+            self._failures = 0
+            self._successes += 1
+            if self._successes >= self._success_run:
+                self._successes = 0
+                self._rate = min(self._max_rate, self._rate + self._increase)
+
+    def on_throttle(self) -> None:
+        """Records a throttled request, slowing down."""
+        with self._lock:
+            self._rate = max(self._min_rate, self._rate * self._decrease)
+            # Drop any saved up burst.
+            self._tokens = min(self._tokens, 0.0)
+            self._record_failure()
+        LOGGER.info("Request throttled, rate now %.2f/s", self._rate)
+
+    def on_failure(self) -> None:
+        """Records a request that failed without an answer from the server."""
+        with self._lock:
+            self._record_failure()
+
+    def _record_failure(self) -> None:
+        """Counts a failure and opens the breaker if needed. The lock must be held."""
+        self._successes = 0
+        self._failures += 1
+        if self._failures >= self._breaker_threshold:
+            self._open_until = time.monotonic() + self._breaker_timeout
+            # Let one request through after the timeout; another failure
+            # opens the breaker again straight away.
+            self._failures = self._breaker_threshold - 1
+            LOGGER.error(
+                "Circuit breaker open for %.0f seconds after repeated failures.",
+                self._breaker_timeout,
+            )
+
+
+# Seconds spent opening connections by the current thread, since its last post().
+_CONNECT_TIMES = threading.local()
+
+
+class _ConnectTimer:
+    """Adds the time spent in connect() to the thread's connect time."""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            elapsed = time.perf_counter() - started
+            _CONNECT_TIMES.seconds = getattr(_CONNECT_TIMES, "seconds", 0.0) + elapsed
+
+
+class _TimedHTTPConnection(_ConnectTimer, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_ConnectTimer, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """An HTTPAdapter whose connections record how long they take to open."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class HTTPTransport:
+    """
+    The HTTP connection pool and cookie jar a WTSession sends requests with.
+
+    Connections to the API are kept alive and reused, up to pool_size of
+    them, and responses are requested compressed.
+
+    Thread safety: post() may be called from any number of threads at once.
+    Connections are handed out by urllib3's thread-safe pool, and when all
+    pool_size of them are busy a thread waits for one rather than opening a
+    throwaway connection. The cookie jar does its own locking. The session
+    headers and adapters are only set up here and never changed afterwards.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = POOL_SIZE_DEFAULT,
+        connect_timeout: float = CONNECT_TIMEOUT_DEFAULT,
+        read_timeout: float = READ_TIMEOUT_DEFAULT,
+        keep_alive: bool = True,
+    ) -> None:
+        """
+        :param pool_size: The maximum number of connections kept open.
+        :param connect_timeout: Seconds allowed to open a connection.
+        :param read_timeout: Seconds allowed between bytes of the response.
+        :param keep_alive: Whether to reuse connections between requests.
+        """
+        self._timeout = (connect_timeout, read_timeout)
+        self._session = requests.Session()
+
+        # Retries are up to WTSession, which knows about rate limits.
+        adapter = _TimedHTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, pool_block=True, max_retries=0
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        self._session.headers["Accept-Encoding"] = "gzip, deflate"
+        if not keep_alive:
+            self._session.headers["Connection"] = "close"
+
+    @property
+    def cookies(self) -> requests.cookies.RequestsCookieJar:
+        """Return the cookie jar, which holds the login cookies."""
+        return self._session.cookies
+
+    @property
+    def connect_time(self) -> float:
+        """
+        Return the seconds the last post() of the calling thread spent
+        opening connections, 0 if it reused a pooled one.
+        """
+        return getattr(_CONNECT_TIMES, "seconds", 0.0)
+
+    def post(
+        self, url: str, data: dict, allow_redirects: bool = True, stream: bool = False
+    ) -> requests.Response:
+        """
+        POSTs the data and returns the response.
+
+        :param url: The URL to post to.
+        :param data: The form data.
+        :param allow_redirects: Whether to follow redirections.
+        :param stream: Whether to leave the body on the socket, to be read
+                       with iter_content. The response must then be closed.
+        """
+        _CONNECT_TIMES.seconds = 0.0
+        return self._session.post(
+            url, data=data, allow_redirects=allow_redirects, timeout=self._timeout, stream=stream
+        )
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self._session.close()
+
+
+def can_coalesce(action: str, key: Union[str, int], fields: Optional[str]) -> bool:
+    """
+    Returns whether a getPerson/getProfile call can be answered by getPeople
+    with the same result. That needs an explicit list of fields without any
+    relatives, and a key that getPeople understands: getProfile takes Page IDs
+    and Free-Space pages, getPeople does not.
+
+    :param action: "getPerson" or "getProfile"
+    :param key: The key of the call
+    :param fields: The fields of the call
+    """
+    if fields is None or fields == "*":
+        return False
+    if RELATIVE_FIELDS.intersection(field.strip() for field in fields.split(",")):
+        return False
+    if action == "getProfile":
+        key = str(key)
+        if key.isdigit() or key.startswith("Space:"):
+            return False
+    return True
+
+
+def split_people_result(action: str, keys: Iterable[Union[str, int]], result: list) -> Dict[str, list]:
+    """
+    Splits a getPeople result into one result per key, each shaped like the
+    result of the getPerson or getProfile call for that key.
+
+    :param action: "getPerson" or "getProfile"
+    :param keys: The keys of the getPeople call
+    :param result: The getPeople result
+    """
+    item = result[0] if isinstance(result, list) and result else {}
+    result_by_key = item.get("resultByKey") or {}
+    people = item.get("people") or {}
+
+    results = {}
+    for key in keys:
+        key = str(key)
+        key_result = result_by_key.get(key) or {}
+        person = people.get(str(key_result.get("Id")))
+        status = key_result.get("status") or item.get("status") or "No data returned"
+        if action == "getPerson":
+            if person is None:
+                results[key] = [{"user_name": key, "status": status}]
+            else:
+                results[key] = [
+                    {
+                        "user_id": key_result["Id"],
+                        "user_name": person.get("Name", key),
+                        "person": person,
+                        "status": 0,
+                    }
+                ]
+        else:
+            if person is None:
+                results[key] = [{"page_name": key, "status": status}]
+            else:
+                results[key] = [
+                    {"page_name": person.get("Name", key), "profile": person, "status": 0}
+                ]
+    return results
+
+
+class RequestCoalescer:
+    """
+    Collects single-key getPerson/getProfile calls made at about the same time,
+    from any number of threads, and sends them as one getPeople call.
+
+    A call waits up to window seconds for others with the same action, fields
+    and bio_format, then each caller gets its own part of the getPeople result,
+    in the same shape as getPerson/getProfile would have returned.
+    """
+
+    def __init__(
+        self,
+        session: "WTSession",
+        window: float = COALESCE_WINDOW_DEFAULT,
+        max_batch: int = GET_PEOPLE_MAX_KEYS,
+    ) -> None:
+        """
+        :param session: The session used to send the getPeople calls.
+        :param window: Seconds to wait for more calls before sending.
+        :param max_batch: Number of calls that triggers an immediate send.
+        """
+        self._session = session
+        self._window = window
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple, List[Tuple[str, Future]]] = {}
+
+    def submit(
+        self,
+        action: str,
+        key: Union[str, int],
+        fields: str,
+        bio_format: Optional[str] = None,
+    ) -> list:
+        """
+        Queues one getPerson/getProfile call and waits for its result.
+
+        :param action: "getPerson" or "getProfile"
+        :param key: Wanted WikiTree_ID or User_ID
+        :param fields: Comma separated list of required fields
+        :param bio_format: "wiki", "html", or "both"
+        """
+        group = (action, fields, bio_format)
+        future = Future()
+        full_batch = None
+
+        with self._lock:
+            batch = self._pending.get(group)
+            if batch is None:
+                batch = self._pending[group] = []
+                timer = threading.Timer(self._window, self._flush, (group, batch))
+                timer.daemon = True
+                timer.start()
+            batch.append((str(key), future))
+            if len(batch) >= self._max_batch:
+                full_batch = self._pending.pop(group)
+
+        if full_batch is not None:
+            self._send(group, full_batch)
+
+        return future.result()
+
+    def _flush(self, group: Tuple, batch: List[Tuple[str, Future]]) -> None:
+        """Sends the batch, unless it was already sent for being full."""
+        with self._lock:
+            if self._pending.get(group) is not batch:
+                return
+            del self._pending[group]
+        self._send(group, batch)
+
+    def _send(self, group: Tuple, batch: List[Tuple[str, Future]]) -> None:
+        """Sends one getPeople call and hands each caller its result."""
+        action, fields, bio_format = group
+        keys = [key for key, _ in batch]
+        try:
+            post_data_list = self._session._get_people_post_data(
+                keys, fields=fields, bio_format=bio_format
+            )
+            result = merge_people_results(
+                self._session._do_post(post_data) for post_data in post_data_list
+            )
+            results = split_people_result(action, keys, result)
+        except Exception as error:  # pylint: disable=broad-except
+            for _, future in batch:
+                future.set_exception(error)
+            return
+
+        for key, future in batch:
+            future.set_result(results[key])
+
+
 class WTSession:
     """
     A class to manage a session on the WikiTree API.
@@ -94,13 +859,51 @@ class WTSession:
     Provides convenience functions for each of the API calls.
     """
 
-    def __init__(self, app_id: str) -> None:
-        """Just default some values."""
+    def __init__(
+        self,
+        app_id: str,
+        coalesce_window: Optional[float] = None,
+        cache=None,
+        store=None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retries: int = RETRIES_DEFAULT,
+        transport: Optional[HTTPTransport] = None,
+        field_plan=None,
+        hooks=None,
+        login=None,
+    ) -> None:
+        """
+        Just default some values.
+
+        :param app_id: The appId to send with every request.
+        :param coalesce_window: If set, getPerson/getProfile calls made within
+                                this many seconds of each other are sent as
+                                one getPeople call. See RequestCoalescer.
+        :param cache: An optional response cache, such as
+                      wt_cache.ResponseCache, consulted before each request.
+        :param store: An optional profile store, such as wt_store.ProfileStore,
+                      consulted by get_people before the API.
+        :param rate_limiter: The rate limiter to use. Defaults to the one
+                             shared by all sessions with the same app_id.
+        :param retries: Number of times a throttled or failed request is retried.
+        :param transport: The HTTP transport to send requests with. Defaults to
+                          an HTTPTransport with the default pool and timeouts.
+        :param field_plan: An optional field plan, such as wt_fields.FieldPlan,
+                           narrowing the fields of calls made without any.
+        :param hooks: Optional instrumentation hooks, such as wt_metrics.Metrics,
+                      told about every request, rate limit wait and cache lookup.
+        :param login: An optional saved login, such as wt_login.SharedLogin,
+                      that logs the session in before its calls and again
+                      when the login stops working.
+
+        A WTSession may be shared by any number of threads, see HTTPTransport.
+        Only authenticate must not run while other requests are in flight.
+        """
         self._email = ""
         self._authenticated = False
 
-        # CHANGE: Create the session immediately so unauthenticated calls work.
-        self._session = requests.Session()
+        # CHANGE: Create the transport immediately so unauthenticated calls work.
+        self._transport = transport if transport is not None else HTTPTransport()
 
         self._authcode = None
         self._wt_cookie = None
@@ -110,6 +913,21 @@ class WTSession:
         # CHANGE: Support appId (helps avoid "Limit exceeded." for no-appId traffic)
         self._app_id = app_id
 
+        self._cache = cache
+        self._store = store
+        self._field_plan = field_plan
+        self._hooks = hooks
+        self._login = login
+
+        if rate_limiter is None:
+            rate_limiter = RateLimiter.shared(app_id)
+        self._rate_limiter = rate_limiter
+        self._retries = retries
+
+        self._coalescer = None
+        if coalesce_window is not None:
+            self._coalescer = RequestCoalescer(self, window=coalesce_window)
+
     @property
     def user_name(self) -> str:
         """Return the user name of the authenticated user."""
@@ -143,9 +961,10 @@ class WTSession:
         # We use a Session to hold the state (via cookie jar) for the API queries
         LOGGER.debug("Starting Session")
 
-        # NOTE: We already created a Session in __init__.
-        # Keeping this line is fine, it simply starts a fresh session for auth.
-        self._session = requests.Session()
+        # NOTE: We keep the transport created in __init__, with its warm
+        # connections, and only drop any cookies of an earlier login. The
+        # login cookies then land in the same jar all later calls use.
+        self._transport.cookies.clear()
 
         # Step 1 - POST the clientLogin action with our member credentials.
         #
@@ -170,7 +989,8 @@ class WTSession:
             "appId": self._app_id,
         }
 
-        response = self._session.post(
+        self._rate_limiter.acquire()
+        response = self._transport.post(
             API_URL,
             data=post_data,
             allow_redirects=False,
@@ -221,7 +1041,8 @@ class WTSession:
             # CHANGE: include appId on this step too
             "appId": self._app_id,
         }
-        response = self._session.post(
+        self._rate_limiter.acquire()
+        response = self._transport.post(
             API_URL,
             data=post_data,
             allow_redirects=False,
@@ -244,7 +1065,7 @@ class WTSession:
         #   'wikidb_wtb_UserName': '<<WikiTree ID>>',
         #   'wikitree_wtb_UserID': '<<WikiTree user_id>>'
         # }
-        self._wt_cookie = self._session.cookies.get_dict()
+        self._wt_cookie = self._transport.cookies.get_dict()
 
         # CHANGE: get_dict() returns {} when empty, not None
         if not self._wt_cookie:
@@ -281,6 +1102,75 @@ class WTSession:
 
         return self._authenticated
 
+    def export_login(self) -> Optional[dict]:
+        """
+        Returns the login of the session, to be saved and put in another
+        session with import_login, or None if it is not logged in. It holds
+        the login cookies, which let anyone act as the user: keep it safe.
+        """
+        if not self._authenticated:
+            return None
+        return {
+            "user_id": self._user_id,
+            "user_name": self._user_name,
+            "cookies": [
+                {
+                    "name": cookie.name,
+                    "value": cookie.value,
+                    "domain": cookie.domain,
+                    "path": cookie.path,
+                    "expires": cookie.expires,
+                    "secure": cookie.secure,
+                }
+                for cookie in self._transport.cookies
+            ],
+        }
+
+    def import_login(self, state: dict) -> None:
+        """
+        Logs the session in with a login from export_login, without any
+        request. Use check_login to find out whether it still works.
+
+        :param state: The login.
+        """
+        cookies = self._transport.cookies
+        cookies.clear()
+        for cookie in state["cookies"]:
+            cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+                expires=cookie.get("expires"),
+                secure=cookie.get("secure", False),
+            )
+        self._wt_cookie = cookies.get_dict()
+        self._user_id = state.get("user_id", "")
+        self._user_name = state.get("user_name", "")
+        self._authenticated = True
+
+    def check_login(self) -> bool:
+        """
+        Uses clientLogin with checkLogin to return whether the API still has
+        the session logged in. Logins end when they expire or the user logs out.
+        """
+        if not self._authenticated:
+            return False
+        post_data = {
+            "action": "clientLogin",
+            "checkLogin": self._user_id,
+            "appId": self._app_id,
+        }
+        self._rate_limiter.acquire()
+        try:
+            response = self._transport.post(API_URL, data=post_data, allow_redirects=False)
+            data = loads(response.content)
+        except (requests.RequestException, ValueError) as error:
+            LOGGER.info("checkLogin failed: %s", error)
+            return False
+        result = data.get("clientLogin") if isinstance(data, dict) else None
+        return isinstance(result, dict) and result.get("result") == "ok"
+
     def _do_post(self, post_data: dict, need_auth: bool = False) -> dict:
         """
         A convenience function to do the actual POST. Returns empty dictionary
@@ -294,28 +1184,237 @@ class WTSession:
         """
         data = {}
 
+        if self._login is not None and not self._login.ensure(self) and need_auth:
+            return data
         if need_auth and not self._authenticated:
             return data
 
         # CHANGE: Always include appId to reduce rate limiting for no-appId traffic.
         # Copy the dict so we do not mutate the caller's object.
+        post_payload = self._payload(post_data)
+
+        # Logged in and anonymous views of a profile differ, so they are
+        # cached separately.
+        viewer = self._viewer
+        action = post_payload["action"]
+        if self._cache is not None:
+            body = self._cache.get(post_payload, viewer)
+            if self._hooks is not None:
+                self._hooks.on_cache(action, body is not None)
+            if body is not None:
+                return self._planned(loads(body))
+
+        # Throttled (429, 5xx, "Limit exceeded.") and failed requests are
+        # retried after a jittered backoff. If all attempts are throttled,
+        # the last response is returned, but not cached.
+        for attempt in range(self._retries + 1):
+            self._acquire(action)
+            started = time.perf_counter()
+            try:
+                response = self._transport.post(
+                    url=API_URL,
+                    data=post_payload,
+                    # auth=("wikitree", "wikitree"),
+                )
+            except requests.RequestException as error:
+                self._rate_limiter.on_failure()
+                self._report(action, attempt, error=type(error).__name__)
+                if attempt == self._retries:
+                    raise
+                LOGGER.info("Request failed (%s), retrying.", error)
+                time.sleep(retry_delay(attempt))
+                continue
+            received = time.perf_counter()
+
+            error = None
+            try:
+                data = loads(response.content)
+            except (JSONDecodeError, UnicodeDecodeError) as decode_error:
+                LOGGER.warning(
+                    "%s returned a response that is not JSON (HTTP %s, %d bytes): %s",
+                    action,
+                    response.status_code,
+                    len(response.content),
+                    decode_error,
+                )
+                error = type(decode_error).__name__
+                data = {}
+            throttled = is_throttled(response.status_code, data)
+            if self._hooks is not None:
+                self._report_response(action, attempt, response, started, received, data, error)
+
+            if not throttled:
+                self._rate_limiter.on_success()
+                break
+
+            self._rate_limiter.on_throttle()
+            if attempt < self._retries:
+                time.sleep(retry_delay(attempt))
+
+        # A call that needs a login and failed because the login expired is
+        # retried once, logged in again. The retry does not need_auth, so it
+        # is not renewed again. A throttled answer says nothing of the login.
+        if (
+            need_auth
+            and not throttled
+            and self._login is not None
+            and self._login.logged_out(self, data)
+        ):
+            if self._login.renew(self):
+                return self._do_post(post_data)
+            return {}
+
+        if self._cache is not None and data and not throttled and response.status_code == 200:
+            self._cache.put(post_payload, response.content, viewer)
+
+        return self._planned(data)
+
+    def _acquire(self, action: str) -> None:
+        """Waits for the rate limiter, telling the hooks how long it took."""
+        waited = self._rate_limiter.acquire()
+        if waited > 0 and self._hooks is not None:
+            self._hooks.on_rate_wait(action, waited)
+
+    def _report(self, action: str, attempt: int, **fields) -> None:
+        """Tells the hooks about a request."""
+        if self._hooks is not None:
+            self._hooks.on_request(RequestEvent(action, attempt, **fields))
+
+    def _report_response(
+        self,
+        action: str,
+        attempt: int,
+        response: requests.Response,
+        started: float,
+        received: float,
+        data,
+        error: Optional[str],
+    ) -> None:
+        """
+        Tells the hooks about a request that got a response. requests measures
+        the time up to the response headers (connecting included); the rest of
+        post() is the body download.
+        """
+        connect = getattr(self._transport, "connect_time", 0.0)
+        headers = response.elapsed.total_seconds()
+        request_body = response.request.body if response.request is not None else None
+        self._report(
+            action,
+            attempt,
+            status_code=response.status_code,
+            request_bytes=len(request_body or b""),
+            response_bytes=len(response.content),
+            connect=connect,
+            wait=max(0.0, headers - connect),
+            download=max(0.0, received - started - headers),
+            decode=time.perf_counter() - received,
+            throttled=is_throttled(response.status_code, data),
+            limit_exceeded=response_status(data) == LIMIT_EXCEEDED_STATUS,
+            error=error,
+        )
+
+    def _payload(self, post_data: dict) -> dict:
+        """
+        Returns a copy of the post data with the appId added and, if there is
+        a field plan and the call has no fields of its own, the planned fields.
+        This happens before the cache is consulted, so that the fields are
+        part of the cache key.
+        """
         post_payload = dict(post_data)
         post_payload.setdefault("appId", self._app_id)
+        if self._field_plan is not None and "fields" not in post_payload:
+            fields = self._field_plan.fields_for(post_payload["action"])
+            if fields is not None:
+                post_payload["fields"] = fields
+        return post_payload
+
+    def _planned(self, data):
+        """Returns the result, wrapped for the field plan to record what is read."""
+        if self._field_plan is None:
+            return data
+        return self._field_plan.wrap(data)
 
-        response = self._session.post(
-            url=API_URL,
-            data=post_payload,
-            # auth=("wikitree", "wikitree"),
-        )
+    def _stream_post(self, post_data: dict) -> Iterator[StreamEntry]:
+        """
+        Like _do_post, but decodes the response as it is read off the socket
+        and yields the entries of its "people" or "descendants" container one
+        at a time, as (container, key, value). The response is not cached.
 
-        try:
-            # print(response.status_code)
-            data = response.json()
-        except JSONDecodeError:
-            # print("No data returned.")
-            pass
+        Throttled and failed requests are retried as in _do_post, as long as
+        nothing has been yielded yet.
+
+        :param post_data: A dictionary with at least the "action" key and
+                          other keys as necessary.
+        """
+        post_payload = self._payload(post_data)
+        action = post_payload["action"]
 
-        return data
+        for attempt in range(self._retries + 1):
+            self._acquire(action)
+            try:
+                response = self._transport.post(url=API_URL, data=post_payload, stream=True)
+            except requests.RequestException as error:
+                self._rate_limiter.on_failure()
+                self._report(action, attempt, error=type(error).__name__)
+                if attempt == self._retries:
+                    raise
+                LOGGER.info("Request failed (%s), retrying.", error)
+                time.sleep(retry_delay(attempt))
+                continue
+
+            connect = getattr(self._transport, "connect_time", 0.0)
+            decoder = JSONStreamDecoder()
+            yielded = False
+            # Only the time spent reading the socket counts as download, not
+            # the time the caller spends between entries.
+            download = 0.0
+            size = 0
+            try:
+                with response:
+                    if not is_throttled(response.status_code, None):
+                        chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+                        while True:
+                            started = time.perf_counter()
+                            chunk = next(chunks, None)
+                            download += time.perf_counter() - started
+                            if chunk is None:
+                                break
+                            size += len(chunk)
+                            for container, key, value in decoder.feed(chunk):
+                                yielded = True
+                                yield container, key, self._planned(value)
+                        for container, key, value in decoder.close():
+                            yielded = True
+                            yield container, key, self._planned(value)
+                        if yielded or not is_throttled(response.status_code, decoder.header):
+                            break
+            finally:
+                if self._hooks is not None:
+                    request_body = response.request.body if response.request is not None else None
+                    self._report(
+                        action,
+                        attempt,
+                        status_code=response.status_code,
+                        request_bytes=len(request_body or b""),
+                        response_bytes=size,
+                        connect=connect,
+                        wait=max(0.0, response.elapsed.total_seconds() - connect),
+                        download=download,
+                        throttled=is_throttled(response.status_code, decoder.header),
+                        limit_exceeded=decoder.header.get("status") == LIMIT_EXCEEDED_STATUS,
+                    )
+
+            self._rate_limiter.on_throttle()
+            if attempt == self._retries:
+                LOGGER.error("%s was throttled, giving up.", post_data["action"])
+                return
+            time.sleep(retry_delay(attempt))
+
+        self._rate_limiter.on_success()
+
+        status = decoder.header.get("status")
+        if status:
+            LOGGER.error("%s failed: %s", post_data["action"], status)
 
     def get_ancestors(
         self,
@@ -396,6 +1495,46 @@ class WTSession:
 
         return self._do_post(post_data)
 
+    def get_connections(
+        self,
+        key1: Union[str, int],
+        key2: Union[str, int],
+        relation: Union[ConnectionRelation, int] = CONNECTION_RELATION_DEFAULT,
+        ignore_ids: Optional[Iterable[int]] = None,
+        nopath: bool = False,
+        fields: Optional[str] = None,
+    ):
+        """
+        Uses the getConnections API call to return the relationship path
+        between two profiles.
+
+        :param key1: First WikiTree_ID or User_ID
+        :param key2: Second WikiTree_ID or User_ID
+        :param relation: The kind of path to find, see ConnectionRelation
+        :param ignore_ids: User_IDs the path must not go through
+        :param nopath: Whether to return only the pathLength, not the path
+        :param fields: Comma separated list of fields of the path profiles
+        """
+        try:
+            connection_relation = ConnectionRelation(relation).value
+        except ValueError:
+            LOGGER.error("Invalid connection relation (%s), choosing default.", relation)
+            connection_relation = CONNECTION_RELATION_DEFAULT.value
+
+        post_data = {
+            "action": "getConnections",
+            "keys": f"{key1},{key2}",
+            "relation": connection_relation,
+        }
+        if ignore_ids:
+            post_data["ignoreIds"] = ",".join(str(person_id) for person_id in ignore_ids)
+        if nopath:
+            post_data["nopath"] = 1
+        if fields is not None:
+            post_data["fields"] = fields
+
+        return self._do_post(post_data)
+
     def get_descendants(
         self,
         key: Union[str, int],
@@ -438,6 +1577,258 @@ class WTSession:
 
         return self._do_post(post_data)
 
+    def _get_people_post_data(
+        self,
+        keys: Iterable[Union[str, int]],
+        fields: Optional[str] = None,
+        bio_format: Optional[str] = None,
+        siblings: bool = False,
+        ancestors: int = 0,
+        descendants: int = 0,
+        nuclear: int = 0,
+        min_generation: Optional[int] = None,
+        limit: Optional[int] = None,
+        start: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Builds the post data for get_people, one dictionary per chunk of keys.
+        Duplicate keys are dropped and each chunk is kept under the getPeople
+        key limit.
+        """
+        unique_keys = list(dict.fromkeys(str(key) for key in keys))
+        if ancestors or descendants or nuclear:
+            chunk_size = GET_PEOPLE_MAX_KEYS_WITH_RELATIVES
+        else:
+            chunk_size = GET_PEOPLE_MAX_KEYS
+
+        post_data_list = []
+        for index in range(0, len(unique_keys), chunk_size):
+            post_data = {
+                "action": "getPeople",
+                "keys": ",".join(unique_keys[index:index + chunk_size]),
+            }
+            if fields is not None:
+                post_data["fields"] = fields
+            if bio_format is not None:
+                post_data["bioFormat"] = bio_format
+            if siblings:
+                post_data["siblings"] = 1
+            if ancestors:
+                post_data["ancestors"] = ancestors
+            if descendants:
+                post_data["descendants"] = descendants
+            if nuclear:
+                post_data["nuclear"] = nuclear
+            if min_generation is not None:
+                post_data["minGeneration"] = min_generation
+            if limit is not None:
+                post_data["limit"] = limit
+            if start is not None:
+                post_data["start"] = start
+            post_data_list.append(post_data)
+
+        return post_data_list
+
+    @property
+    def _viewer(self) -> Optional[str]:
+        """Who is logged in, as cached and stored responses are keyed."""
+        return str(self._user_id) if self._authenticated else None
+
+    def _get_stored_people(
+        self,
+        keys: Iterable[Union[str, int]],
+        fields: Optional[str],
+    ) -> Tuple[list, List[str], str]:
+        """
+        Looks the keys up in the profile store. Returns the profiles found, as
+        a getPeople result, the keys still to fetch and the fields to fetch
+        them with, so they can be stored too.
+        """
+        found, missing = self._store.get(keys, fields, self._viewer)
+        result = [
+            {
+                "status": "",
+                "resultByKey": {key: {"Id": person["Id"]} for key, person in found.items()},
+                "people": {str(person["Id"]): person for person in found.values()},
+            }
+        ]
+        return result, missing, self._store.fetch_fields(fields)
+
+    def _put_stored_people(self, results: list, fields: str) -> None:
+        """Adds the profiles of the getPeople results to the profile store."""
+        for result in results:
+            if isinstance(result, list) and result:
+                self._store.put((result[0].get("people") or {}).values(), fields, self._viewer)
+
+    def _post_all(self, post_data_list: List[dict], max_workers: int) -> list:
+        """Posts each of the post data, in parallel, and returns the results in order."""
+        if len(post_data_list) <= 1 or max_workers <= 1:
+            return [self._do_post(post_data) for post_data in post_data_list]
+
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(post_data_list))
+        ) as executor:
+            return list(executor.map(self._do_post, post_data_list))
+
+    def get_people(
+        self,
+        keys: Iterable[Union[str, int]],
+        fields: Optional[str] = None,
+        bio_format: Optional[str] = None,
+        siblings: bool = False,
+        ancestors: int = 0,
+        descendants: int = 0,
+        nuclear: int = 0,
+        min_generation: Optional[int] = None,
+        limit: Optional[int] = None,
+        start: Optional[int] = None,
+        max_workers: int = MAX_WORKERS_DEFAULT,
+        use_store: bool = True,
+    ) -> list:
+        """
+        Uses the getPeople API call to return any number of person profiles.
+
+        The keys are split into chunks of at most 1000 keys (100 if any of
+        ancestors, descendants or nuclear is set), the chunks are fetched in
+        parallel and the results merged into a single getPeople result.
+
+        If the session has a profile store, plain lookups (no relatives, no
+        bio_format) are answered from it where possible, and what has to be
+        fetched is added to it. Fetched profiles then also have the Id, Name
+        and Touched fields.
+
+        :param keys: Wanted WikiTree_IDs or User_IDs
+        :param fields: Comma separated list of required fields
+        :param bio_format: "wiki", "html", or "both"
+        :param siblings: Whether to get the siblings
+        :param ancestors: Number of generations of ancestors
+        :param descendants: Number of generations of descendants
+        :param nuclear: Number of generations of nuclear relatives
+        :param min_generation: Generation number to start at for relatives
+        :param limit: Maximum number of related profiles per chunk
+        :param start: Starting position in the related profiles of each chunk
+        :param max_workers: Number of chunks fetched at the same time
+        :param use_store: Whether to use the profile store, if there is one
+        """
+        stored = None
+        if (
+            use_store
+            and self._store is not None
+            and bio_format is None
+            and not (siblings or ancestors or descendants or nuclear)
+        ):
+            stored, keys, fields = self._get_stored_people(keys, fields)
+
+        post_data_list = self._get_people_post_data(
+            keys,
+            fields=fields,
+            bio_format=bio_format,
+            siblings=siblings,
+            ancestors=ancestors,
+            descendants=descendants,
+            nuclear=nuclear,
+            min_generation=min_generation,
+            limit=limit,
+            start=start,
+        )
+        results = self._post_all(post_data_list, max_workers)
+
+        if stored is not None:
+            self._put_stored_people(results, fields)
+            results.append(stored)
+
+        return merge_people_results(results)
+
+    def _get_people_pages(
+        self,
+        keys: Iterable[Union[str, int]],
+        page_size: int = GET_PEOPLE_MAX_LIMIT,
+        **kwargs,
+    ) -> Iterator[dict]:
+        """
+        Yields the getPeople result item of each page, one chunk of keys at a
+        time. When any of ancestors, descendants or nuclear is set, each chunk
+        is paged through with start/limit until a page comes back with fewer
+        than page_size related profiles.
+        """
+        paged = bool(
+            kwargs.get("ancestors") or kwargs.get("descendants") or kwargs.get("nuclear")
+        )
+        if paged:
+            kwargs["limit"] = page_size
+
+        for post_data in self._get_people_post_data(keys, **kwargs):
+            start = 0
+            while True:
+                if paged:
+                    post_data["start"] = start
+                result = self._do_post(post_data)
+                if not isinstance(result, list) or not result:
+                    LOGGER.error("getPeople returned no data for: %s", post_data["keys"])
+                    break
+                item = result[0]
+                if item.get("status"):
+                    LOGGER.error("getPeople failed: %s", item["status"])
+                    break
+                yield item
+
+                if not paged or count_related(item) < page_size:
+                    break
+                start += page_size
+
+    def iter_people(
+        self,
+        keys: Iterable[Union[str, int]],
+        fields: Optional[str] = None,
+        bio_format: Optional[str] = None,
+        siblings: bool = False,
+        ancestors: int = 0,
+        descendants: int = 0,
+        nuclear: int = 0,
+        min_generation: Optional[int] = None,
+        page_size: int = GET_PEOPLE_MAX_LIMIT,
+        prefetch_pages: int = PREFETCH_PAGES_DEFAULT,
+    ) -> Iterator[dict]:
+        """
+        Uses the getPeople API call to yield person profiles one at a time,
+        following the start/limit pagination of the related profiles.
+
+        Pages are fetched in a background thread, at most prefetch_pages ahead
+        of the caller, so the next page is on its way while the current one is
+        being processed. Each profile is yielded once, even if it is related
+        to more than one of the keys.
+
+        :param keys: Wanted WikiTree_IDs or User_IDs
+        :param fields: Comma separated list of required fields
+        :param bio_format: "wiki", "html", or "both"
+        :param siblings: Whether to get the siblings
+        :param ancestors: Number of generations of ancestors
+        :param descendants: Number of generations of descendants
+        :param nuclear: Number of generations of nuclear relatives
+        :param min_generation: Generation number to start at for relatives
+        :param page_size: Number of related profiles per page, at most 1000
+        :param prefetch_pages: Number of pages fetched ahead of the caller
+        """
+        pages = self._get_people_pages(
+            keys,
+            page_size=page_size,
+            fields=fields,
+            bio_format=bio_format,
+            siblings=siblings,
+            ancestors=ancestors,
+            descendants=descendants,
+            nuclear=nuclear,
+            min_generation=min_generation,
+        )
+
+        seen_ids = set()
+        for item in prefetch(pages, prefetch_pages):
+            for person_id, person in (item.get("people") or {}).items():
+                if person_id in seen_ids:
+                    continue
+                seen_ids.add(person_id)
+                yield person
+
     def get_person(
         self,
         key: Union[str, int],
@@ -451,6 +1842,9 @@ class WTSession:
         :param fields: Comma separated list of required fields
         :param bio_format: "wiki", "html", or "both"
         """
+        if self._coalescer is not None and can_coalesce("getPerson", key, fields):
+            return self._coalescer.submit("getPerson", key, fields, bio_format)
+
         post_data = {
             "action": "getPerson",
             "key": key,
@@ -519,6 +1913,9 @@ class WTSession:
         :param fields: Comma separated list of required fields
         :param bio_format: "wiki", "html", or "both"
         """
+        if self._coalescer is not None and can_coalesce("getProfile", key, fields):
+            return self._coalescer.submit("getProfile", key, fields, bio_format)
+
         post_data = {
             "action": "getProfile",
             "key": key,
@@ -654,6 +2051,211 @@ class WTSession:
                 LOGGER.error("Invalid search argument, ignoring: %s", key)
         return self._do_post(post_data)
 
+    def stream_descendants(
+        self,
+        key: Union[str, int],
+        depth: int = 1,
+        fields: Optional[str] = None,
+        bio_format: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """
+        Uses the getDescendants API call to yield person profiles one at a
+        time, decoding the response as it arrives, so that memory use does not
+        grow with the size of the response. Use it for deep trees, especially
+        with bios; get_descendants is simpler for small ones.
+
+        :param key: Wanted WikiTree_ID or User_ID
+        :param depth: Number of generations
+        :param fields: Comma separated list of required fields
+        :param bio_format: "wiki", "html", or "both"
+        """
+        post_data = {
+            "action": "getDescendants",
+            "key": key,
+            "depth": depth,
+            "resolveRedirect": 1,
+        }
+        if fields is not None:
+            post_data["fields"] = fields
+        if bio_format is not None:
+            post_data["bioFormat"] = bio_format
+
+        for _, _, person in self._stream_post(post_data):
+            yield person
+
+    def stream_people(
+        self,
+        keys: Iterable[Union[str, int]],
+        fields: Optional[str] = None,
+        bio_format: Optional[str] = None,
+        siblings: bool = False,
+        ancestors: int = 0,
+        descendants: int = 0,
+        nuclear: int = 0,
+        min_generation: Optional[int] = None,
+        limit: Optional[int] = None,
+        start: Optional[int] = None,
+    ) -> Iterator[dict]:
+        """
+        Uses the getPeople API call to yield person profiles one at a time,
+        decoding each response as it arrives, so that memory use stays flat
+        however large a page is (e.g. 1000 profiles with fields="*" and bios).
+        The chunks of keys are requested one after the other; unlike
+        iter_people, it does not page through the related profiles.
+
+        Unlike get_people, it uses neither the cache nor the profile store,
+        and profiles are yielded as the API sends them.
+
+        :param keys: Wanted WikiTree_IDs or User_IDs
+        :param fields: Comma separated list of required fields
+        :param bio_format: "wiki", "html", or "both"
+        :param siblings: Whether to get the siblings
+        :param ancestors: Number of generations of ancestors
+        :param descendants: Number of generations of descendants
+        :param nuclear: Number of generations of nuclear relatives
+        :param min_generation: Generation number to start at for relatives
+        :param limit: Maximum number of related profiles per chunk
+        :param start: Starting position in the related profiles of each chunk
+        """
+        for post_data in self._get_people_post_data(
+            keys,
+            fields=fields,
+            bio_format=bio_format,
+            siblings=siblings,
+            ancestors=ancestors,
+            descendants=descendants,
+            nuclear=nuclear,
+            min_generation=min_generation,
+            limit=limit,
+            start=start,
+        ):
+            for _, _, person in self._stream_post(post_data):
+                yield person
+
+    def _map_method(self, method_name: str) -> Callable:
+        """Returns the query method called method_name, for map. See MAP_METHODS."""
+        if method_name not in MAP_METHODS:
+            raise ValueError(f"Not a query method map can call: {method_name}")
+        return getattr(self, method_name)
+
+    def map(
+        self,
+        method_name: str,
+        keys: Iterable[Union[str, int]],
+        max_workers: int = MAX_WORKERS_DEFAULT,
+        ordered: bool = True,
+        progress: Optional[ProgressCallback] = None,
+        **kwargs,
+    ) -> Iterator[MapResult]:
+        """
+        Calls a query method, such as "get_relatives" or "get_photos", once for
+        each key, max_workers calls at a time, and yields a MapResult for each.
+        The methods that take a single key are allowed, see MAP_METHODS.
+
+        An exception raised by one call is captured in its MapResult instead of
+        stopping the others. Results are yielded as they arrive, in the order
+        of the keys if ordered is set, and only a few calls are queued ahead,
+        so keys may be a long iterator. All calls share the session's
+        connections and rate limiter.
+
+        :param method_name: The name of the method, e.g. "get_bio"
+        :param keys: The keys to call it with, passed as its first argument
+        :param max_workers: Number of calls made at the same time
+        :param ordered: Whether to yield results in the order of the keys
+        :param progress: Called with (done, total) after each call
+        :param kwargs: Other arguments passed to every call
+        """
+        method = self._map_method(method_name)
+        return self._map(
+            lambda key: method(key, **kwargs), keys, max_workers, ordered, progress, method_name
+        )
+
+    def _map(
+        self,
+        function: Callable,
+        keys: Iterable,
+        max_workers: int,
+        ordered: bool,
+        progress: Optional[ProgressCallback],
+        name: str,
+    ) -> Iterator[MapResult]:
+        """The engine of map: calls function(key) for each key, see map."""
+        total = len(keys) if hasattr(keys, "__len__") else None
+        max_pending = max(1, max_workers) * 2
+
+        def call(key) -> MapResult:
+            try:
+                return MapResult(key, function(key))
+            except Exception as error:  # pylint: disable=broad-except
+                LOGGER.info("%s(%s) failed: %s", name, key, error)
+                return MapResult(key, error=error)
+
+        done_count = 0
+        keys = iter(keys)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            pending = deque()
+            while True:
+                # Keep the queue topped up.
+                for key in keys:
+                    pending.append(executor.submit(call, key))
+                    if len(pending) >= max_pending:
+                        break
+                if not pending:
+                    break
+
+                if ordered:
+                    finished = [pending.popleft()]
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    finished = [future for future in pending if future in done]
+                    for future in finished:
+                        pending.remove(future)
+
+                for future in finished:
+                    done_count += 1
+                    if progress is not None:
+                        progress(done_count, total)
+                    yield future.result()
+
+    def get_connections_many(
+        self,
+        pairs: Iterable[Tuple[Union[str, int], Union[str, int]]],
+        relation: Union[ConnectionRelation, int] = CONNECTION_RELATION_DEFAULT,
+        nopath: bool = True,
+        ignore_ids: Optional[Iterable[int]] = None,
+        fields: Optional[str] = None,
+        max_workers: int = MAX_WORKERS_DEFAULT,
+        ordered: bool = False,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Iterator[MapResult]:
+        """
+        Uses the getConnections API call for many pairs of profiles, max_workers
+        calls at a time, and yields a MapResult for each pair, keyed by the pair.
+
+        (a, b) and (b, a), and repeated pairs, are only asked for once; the
+        result for the reversed pair has its path turned around. By default
+        only the pathLength is asked for, which is much cheaper for the server;
+        set nopath to False to get the paths. Results are yielded as they
+        arrive unless ordered is set. progress counts the distinct pairs.
+
+        :param pairs: (key1, key2) pairs of WikiTree_IDs or User_IDs
+        :param relation: The kind of path to find, see ConnectionRelation
+        :param nopath: Whether to return only the pathLength, not the path
+        :param ignore_ids: User_IDs the paths must not go through
+        :param fields: Comma separated list of fields of the path profiles
+        :param max_workers: Number of calls made at the same time
+        :param ordered: Whether to yield results in the order the pairs first appear
+        :param progress: Called with (done, total) after each call
+        """
+        groups = group_pairs(pairs)
+        ignore_ids = list(ignore_ids or ())
+
+        def call(pair: Tuple) -> list:
+            return self.get_connections(pair[0], pair[1], relation, ignore_ids, nopath, fields)
+
+        for map_result in self._map(call, groups, max_workers, ordered, progress, "get_connections"):
+            yield from answer_pairs(map_result, groups[map_result.key])
+
 
 def main():
     """
@@ -0,0 +1,424 @@
+"""
+This module defines a persistent, on-disk store of WikiTree person profiles.
+
+Pass a ProfileStore to WTSession and get_people answers from the store
+whenever it holds the wanted profile with (at least) the wanted fields:
+
+    store = ProfileStore("profiles.sqlite")
+    wt_session = WTSession(app_id="MyApp", store=store)
+    result = wt_session.get_people(keys, fields="Id,Name,BirthDate,Touched")
+
+Every stored profile keeps its Touched timestamp, so the store can be brought
+up to date cheaply with revalidate(): it asks getPeople for only the Id and
+Touched fields and downloads again only the profiles that have changed, and
+sync_watchlist() fetches only the watchlist profiles changed since the
+previous sync.
+
+It uses SQLite from the python standard library.
+"""
+
+# Standard Imports
+from dataclasses import dataclass
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Local imports
+from wt_session import WatchlistOrder
+
+LOGGER = logging.getLogger(__name__)
+
+# The fields every stored profile is fetched with, on top of those asked for.
+# Touched is what revalidate() compares.
+STORE_FIELDS = ("Id", "Name", "Touched")
+
+# The fields getPeople returns when none are given.
+DEFAULT_PEOPLE_FIELDS = ("Id", "Name")
+
+# All fields.
+ALL_FIELDS = "*"
+
+# The number of profiles checked per getPeople call by revalidate().
+REVALIDATE_BATCH_DEFAULT = 1000
+
+# The number of watchlist profiles fetched per getWatchlist call by sync_watchlist().
+WATCHLIST_PAGE_DEFAULT = 1000
+
+# The state entry holding the Touched watermark of the last watchlist sync.
+WATCHLIST_WATERMARK = "watchlist_touched"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    viewer TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT,
+    touched TEXT,
+    fields TEXT NOT NULL,
+    data TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    PRIMARY KEY (viewer, id)
+);
+CREATE INDEX IF NOT EXISTS profiles_name ON profiles (viewer, name);
+CREATE TABLE IF NOT EXISTS state (
+    viewer TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (viewer, name)
+);
+"""
+
+# Stores a row of profile_rows, replacing any stored version.
+INSERT_PROFILE = "INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+
+def normalize_fields(fields: Optional[str]) -> str:
+    """
+    Returns the fields as a sorted, comma separated string, always including
+    STORE_FIELDS, or "*" for all fields.
+
+    :param fields: Comma separated list of fields, "*" or None.
+    """
+    if fields is not None and fields.strip() == ALL_FIELDS:
+        return ALL_FIELDS
+    names = set(STORE_FIELDS)
+    if fields is None:
+        names.update(DEFAULT_PEOPLE_FIELDS)
+    else:
+        names.update(field.strip() for field in fields.split(",") if field.strip())
+    return ",".join(sorted(names))
+
+
+def profile_rows(
+    people: Iterable[dict], fields: Optional[str] = None, viewer: Optional[str] = None
+) -> List[tuple]:
+    """
+    Returns the rows of the profiles table for profiles, for INSERT_PROFILE.
+
+    :param people: The profiles, as returned by the API.
+    :param fields: The fields they were fetched with.
+    :param viewer: Who is logged in, or None if nobody is.
+    """
+    stored_fields = normalize_fields(fields)
+    viewer = viewer or ""
+    now = time.time()
+    return [
+        (
+            viewer,
+            int(person["Id"]),
+            person.get("Name"),
+            person.get("Touched"),
+            stored_fields,
+            json.dumps(person, separators=(",", ":")),
+            now,
+        )
+        for person in people
+        if person.get("Id") is not None
+    ]
+
+
+def fields_cover(stored: str, wanted: str) -> bool:
+    """
+    Returns whether a profile stored with the stored fields has all of the
+    wanted fields. Both must have gone through normalize_fields.
+
+    :param stored: The fields the profile was stored with.
+    :param wanted: The fields asked for.
+    """
+    if stored == ALL_FIELDS:
+        return True
+    if wanted == ALL_FIELDS:
+        return False
+    return set(wanted.split(",")) <= set(stored.split(","))
+
+
+@dataclass
+class RevalidateStats:
+    """The outcome of ProfileStore.revalidate."""
+
+    checked: int = 0
+    changed: int = 0
+    removed: int = 0
+
+
+@dataclass
+class WatchlistSyncStats:
+    """The outcome of ProfileStore.sync_watchlist."""
+
+    pages: int = 0
+    changed: int = 0
+    watermark: Optional[str] = None
+
+
+class ProfileStore:
+    """
+    A SQLite backed store of person profiles, keyed by Id and Name.
+
+    Profiles are stored per viewer (the logged in user id, or "" when nobody
+    is logged in), because privacy changes what the API returns. The store
+    can be shared between threads.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """
+        :param path: The SQLite database file, or ":memory:".
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def fetch_fields(fields: Optional[str]) -> str:
+        """
+        Returns the fields to fetch profiles with, for the wanted fields, so
+        that they can be stored.
+
+        :param fields: Comma separated list of required fields
+        """
+        return normalize_fields(fields)
+
+    def get(
+        self,
+        keys: Iterable[Union[str, int]],
+        fields: Optional[str] = None,
+        viewer: Optional[str] = None,
+    ) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        Looks up profiles by Id or Name. Returns the profiles found, by key,
+        and the keys that are missing or were stored with too few fields.
+
+        :param keys: Wanted WikiTree_IDs or User_IDs
+        :param fields: Comma separated list of required fields
+        :param viewer: Who is logged in, or None if nobody is.
+        """
+        wanted = normalize_fields(fields)
+        viewer = viewer or ""
+        found = {}
+        missing = []
+
+        with self._lock:
+            for key in keys:
+                key = str(key)
+                if key.isdigit():
+                    row = self._connection.execute(
+                        "SELECT fields, data FROM profiles WHERE viewer = ? AND id = ?",
+                        (viewer, int(key)),
+                    ).fetchone()
+                else:
+                    row = self._connection.execute(
+                        "SELECT fields, data FROM profiles WHERE viewer = ? AND name = ?",
+                        (viewer, key),
+                    ).fetchone()
+                if row is None or not fields_cover(row[0], wanted):
+                    missing.append(key)
+                else:
+                    found[key] = json.loads(row[1])
+
+        return found, missing
+
+    def put(
+        self,
+        people: Iterable[dict],
+        fields: Optional[str] = None,
+        viewer: Optional[str] = None,
+    ) -> int:
+        """
+        Stores profiles, replacing any stored version. Returns the number of
+        profiles stored.
+
+        :param people: The profiles, as returned by the API.
+        :param fields: The fields they were fetched with.
+        :param viewer: Who is logged in, or None if nobody is.
+        """
+        rows = profile_rows(people, fields, viewer)
+
+        with self._lock, self._connection:
+            self._connection.executemany(INSERT_PROFILE, rows)
+        return len(rows)
+
+    def remove(self, ids: Iterable[int], viewer: Optional[str] = None) -> None:
+        """
+        Removes profiles by Id.
+
+        :param ids: The Ids of the profiles.
+        :param viewer: Who is logged in, or None if nobody is.
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM profiles WHERE viewer = ? AND id = ?",
+                [(viewer or "", int(person_id)) for person_id in ids],
+            )
+
+    def touched(self, viewer: Optional[str] = None) -> Iterator[Tuple[int, Optional[str], str]]:
+        """
+        Yields the Id, Touched timestamp and stored fields of every profile.
+
+        :param viewer: Who is logged in, or None if nobody is.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, touched, fields FROM profiles WHERE viewer = ? ORDER BY id",
+                (viewer or "",),
+            ).fetchall()
+        yield from rows
+
+    def get_state(self, name: str, viewer: Optional[str] = None) -> Optional[str]:
+        """
+        Returns a value saved with set_state, or None.
+
+        :param name: The name of the value.
+        :param viewer: Who is logged in, or None if nobody is.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM state WHERE viewer = ? AND name = ?", (viewer or "", name)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def set_state(self, name: str, value: Optional[str], viewer: Optional[str] = None) -> None:
+        """
+        Saves a value with the profiles, e.g. the watermark of a sync.
+
+        :param name: The name of the value.
+        :param value: The value.
+        :param viewer: Who is logged in, or None if nobody is.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO state VALUES (?, ?, ?)", (viewer or "", name, value)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def revalidate(self, session, batch_size: int = REVALIDATE_BATCH_DEFAULT) -> RevalidateStats:
+        """
+        Brings the profiles stored for the session's viewer up to date.
+
+        For each batch of stored profiles, getPeople is asked for only the Id
+        and Touched fields. The profiles whose Touched has changed are fetched
+        again with the fields they were stored with. Profiles the API no longer
+        returns (deleted or merged away) are removed.
+
+        :param session: The WTSession used to query the API.
+        :param batch_size: Number of profiles checked per getPeople call.
+        """
+        viewer = str(session.user_id) if session.authenticated else None
+        stats = RevalidateStats()
+        rows = list(self.touched(viewer))
+
+        for index in range(0, len(rows), batch_size):
+            batch = rows[index:index + batch_size]
+            result = session.get_people(
+                [person_id for person_id, _, _ in batch],
+                fields="Id,Touched",
+                use_store=False,
+            )
+            if result[0]["status"]:
+                LOGGER.error("Revalidation stopped, getPeople failed: %s", result[0]["status"])
+                break
+            result_by_key = result[0]["resultByKey"]
+            people = result[0]["people"]
+            stats.checked += len(batch)
+
+            # Group the changed profiles by the fields they were stored with,
+            # so each group can be fetched again in one go.
+            changed: Dict[str, List[int]] = {}
+            removed = []
+            for person_id, touched, fields in batch:
+                person = people.get(str(person_id))
+                if person is None:
+                    # Only trust a definite answer for this key: an error
+                    # status, or a redirection to another Id.
+                    if str(person_id) in result_by_key:
+                        removed.append(person_id)
+                elif person.get("Touched") != touched:
+                    changed.setdefault(fields, []).append(person_id)
+
+            for fields, ids in changed.items():
+                result = session.get_people(ids, fields=fields, use_store=False)
+                stats.changed += self.put(result[0]["people"].values(), fields, viewer)
+
+            if removed:
+                self.remove(removed, viewer)
+                stats.removed += len(removed)
+
+        LOGGER.debug("Revalidated profile store: %s", stats)
+
+        return stats
+
+    def sync_watchlist(
+        self,
+        session,
+        fields: Optional[str] = None,
+        page_size: int = WATCHLIST_PAGE_DEFAULT,
+        full: bool = False,
+    ) -> WatchlistSyncStats:
+        """
+        Stores the watchlist profiles changed since the last sync.
+
+        The watchlist is paged through ordered by page_touched, newest first,
+        and paging stops at the first profile whose Touched is not newer than
+        the watermark of the last sync. Changed profiles replace their stored
+        version. The newest Touched seen becomes the new watermark, saved only
+        once the sync has completed, so an interrupted sync is simply done
+        again. Profiles taken off the watchlist are not noticed; run a full
+        sync now and then for that.
+
+        :param session: The logged in WTSession used to query the API.
+        :param fields: Comma separated list of fields to store, or None for
+            the getWatchlist defaults.
+        :param page_size: Number of profiles per getWatchlist call.
+        :param full: Whether to ignore the watermark and go through the whole watchlist.
+        """
+        viewer = str(session.user_id) if session.authenticated else None
+        watermark = None if full else self.get_state(WATCHLIST_WATERMARK, viewer)
+        fetch_fields = None if fields is None else normalize_fields(fields)
+        stats = WatchlistSyncStats(watermark=watermark)
+
+        offset = 0
+        done = False
+        while not done:
+            result = session.get_watchlist(
+                limit=page_size,
+                offset=offset,
+                order=WatchlistOrder.PAGE_TOUCHED,
+                get_space=False,
+                fields=fetch_fields,
+            )
+            item = result[0] if isinstance(result, list) and result else {}
+            if not isinstance(item, dict) or not isinstance(item.get("watchlist"), list):
+                LOGGER.error("Watchlist sync stopped, getWatchlist failed: %s", result)
+                return stats
+            page = item["watchlist"]
+            stats.pages += 1
+
+            changed = []
+            for person in page:
+                touched = person.get("Touched")
+                if watermark is not None and touched is not None and touched <= watermark:
+                    done = True
+                    break
+                changed.append(person)
+                if touched is not None and (stats.watermark is None or touched > stats.watermark):
+                    stats.watermark = touched
+            stats.changed += self.put(changed, fetch_fields, viewer)
+
+            offset += len(page)
+            if len(page) < page_size:
+                done = True
+
+        if stats.watermark is not None:
+            self.set_state(WATCHLIST_WATERMARK, stats.watermark, viewer)
+        LOGGER.debug("Synced watchlist: %s", stats)
+
+        return stats
@@ -0,0 +1,293 @@
+"""
+This module defines an incremental JSON decoder for large API responses.
+
+A getPeople page of 1000 profiles with all fields and bios is many megabytes,
+and decoding it in one go holds the whole body and the whole object tree in
+memory at once. JSONStreamDecoder is fed the body a chunk at a time, as it
+comes off the socket, and hands out each entry of the "people" (or
+"descendants") container as soon as it is complete:
+
+    decoder = JSONStreamDecoder()
+    for chunk in chunks:
+        for container, key, person in decoder.feed(chunk):
+            ...
+    for container, key, person in decoder.close():
+        ...
+    print(decoder.header["status"])
+
+Only the entry being decoded is held, so memory stays flat however large the
+response. Everything else in the result items (status, resultByKey, ...) is
+collected in the header. The end of each value is found by a scan that picks
+up where the previous chunk left off, so a value split over many chunks is
+still read in linear time and decoded once.
+
+WTSession.stream_people and WTSession.stream_descendants use it.
+"""
+
+# Standard Imports
+import codecs
+from json import JSONDecoder
+from json.decoder import JSONDecodeError
+import re
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+# The containers, in the result items, whose entries are streamed.
+STREAMED_CONTAINERS = frozenset(["people", "descendants"])
+
+# The number of bytes read off the socket at a time.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# The number of consumed characters after which the buffer is trimmed.
+COMPACT_SIZE = 64 * 1024
+
+# Parser states: what comes next.
+_VALUE = 0  # a value
+_KEY = 1  # an object key, or the end of the object
+_COLON = 2  # the colon after a key
+_NEXT = 3  # a comma, or the end of the container
+_END = 4  # nothing, the document is complete
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# What the scan for the end of a value skips inside strings, and stops at
+# outside them.
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+_STRUCTURE = re.compile(r'["\[\]{}]')
+
+# The state of the scan for the end of a value: (depth of nested containers,
+# whether in a string, whether the last character was a backslash).
+_ScanState = Tuple[int, bool, bool]
+_SCAN_START: _ScanState = (0, False, False)
+
+# An entry handed out: (container name, key or index in it, value).
+StreamEntry = Tuple[str, Union[str, int], Any]
+
+
+def _scan_value(text: str, pos: int, state: _ScanState) -> Tuple[int, _ScanState]:
+    """
+    Looks for the end of an array, object or string value in text, from pos,
+    carrying on from state. Returns the position just past the end, or -1 and
+    the state to carry on from in the next text.
+
+    :param text: The text to scan.
+    :param pos: Where to start: the value's first character, or 0 to carry on.
+    :param state: _SCAN_START, or the state returned by the previous scan.
+    """
+    depth, in_string, escaped = state
+    length = len(text)
+    while pos < length:
+        if escaped:
+            pos += 1
+            escaped = False
+        elif in_string:
+            pos = _STRING_BODY.match(text, pos).end()
+            if pos == length:
+                break
+            # The closing quote, or a backslash ending the text.
+            escaped = text[pos] == "\\"
+            pos += 1
+            if not escaped:
+                in_string = False
+                if depth == 0:
+                    return pos, _SCAN_START
+        else:
+            match = _STRUCTURE.search(text, pos)
+            if match is None:
+                break
+            pos = match.end()
+            char = match.group()
+            if char == '"':
+                in_string = True
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return pos, _SCAN_START
+    return -1, (depth, in_string, escaped)
+
+
+class _Container:
+    """An open array or object on the parser's stack."""
+
+    __slots__ = ("is_object", "key", "streamed")
+
+    def __init__(self, is_object: bool, streamed: bool) -> None:
+        self.is_object = is_object
+        # The key of the current value, or its index in an array.
+        self.key: Union[str, int, None] = None if is_object else 0
+        self.streamed = streamed
+
+
+class JSONStreamDecoder:
+    """
+    Decodes a JSON API response incrementally.
+
+    The top level (a list of result items, or a single item) and the result
+    items are walked structurally. Inside an item, a container named in
+    containers is walked too, and each of its entries is decoded with the
+    standard decoder and handed out. Any other field of an item is decoded
+    whole and kept in header.
+
+    While a value is incomplete, the chunks fed are only scanned for its end
+    and held aside, and are added to the buffer once it has arrived.
+    """
+
+    def __init__(self, containers: Iterable[str] = STREAMED_CONTAINERS) -> None:
+        """
+        :param containers: The names of the containers whose entries are streamed.
+        """
+        self._containers = frozenset(containers)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        # The text fed since the value at _pos turned out to be incomplete,
+        # and the state of the scan for its end, or None.
+        self._pending: List[str] = []
+        self._scan_state: Optional[_ScanState] = None
+        self._stack: List[_Container] = []
+        self._state = _VALUE
+        # The fields of the result items that are not streamed.
+        self.header: dict = {}
+
+    def feed(self, data: bytes) -> Iterator[StreamEntry]:
+        """
+        Adds a chunk of the body and yields the entries it completes.
+
+        :param data: The next bytes of the body.
+        """
+        text = self._text.decode(data)
+        self._pending.append(text)
+        if self._scan_state is not None:
+            end, self._scan_state = _scan_value(text, 0, self._scan_state)
+            if end < 0:
+                return iter(())
+            self._scan_state = None
+        self._take_pending()
+        return self._parse(final=False)
+
+    def close(self) -> Iterator[StreamEntry]:
+        """
+        Yields the last entries, once the whole body has been fed. Raises
+        ValueError if the body is not complete, valid JSON.
+        """
+        self._pending.append(self._text.decode(b"", final=True))
+        self._scan_state = None
+        self._take_pending()
+        yield from self._parse(final=True)
+        if self._state != _END:
+            raise ValueError("Incomplete JSON response")
+
+    def _take_pending(self) -> None:
+        """Adds the text held aside to the buffer."""
+        self._buffer += "".join(self._pending)
+        self._pending = []
+
+    def _decode(self, final: bool) -> Tuple[Any, int]:
+        """
+        Decodes the value at the current position. Returns (value, end), or
+        (None, -1) if more data is needed to tell.
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except JSONDecodeError:
+            if final:
+                raise
+            return None, -1
+        # A number running up to the end of the buffer may go on in the next chunk.
+        if end == len(self._buffer) and not final:
+            return None, -1
+        return value, end
+
+    def _close_container(self) -> None:
+        """Closes the innermost container."""
+        self._stack.pop()
+        self._state = _NEXT if self._stack else _END
+
+    def _parse(self, final: bool) -> Iterator[StreamEntry]:
+        """Parses as far as the buffer allows, yielding completed entries."""
+        buffer = self._buffer
+        while True:
+            self._pos = _WHITESPACE.match(buffer, self._pos).end()
+            if self._pos >= len(buffer):
+                break
+            char = buffer[self._pos]
+            top = self._stack[-1] if self._stack else None
+
+            if self._state == _END:
+                raise ValueError(f"Unexpected data after the JSON response at {self._pos}")
+
+            if self._state == _NEXT:
+                if char == ",":
+                    self._pos += 1
+                    if top.is_object:
+                        self._state = _KEY
+                    else:
+                        top.key += 1
+                        self._state = _VALUE
+                elif char == ("}" if top.is_object else "]"):
+                    self._pos += 1
+                    self._close_container()
+                else:
+                    raise ValueError(f"Unexpected {char!r} in the JSON response at {self._pos}")
+
+            elif self._state == _KEY:
+                if char == "}":
+                    self._pos += 1
+                    self._close_container()
+                    continue
+                key, end = self._decode(final)
+                if end < 0:
+                    break
+                top.key = key
+                self._pos = end
+                self._state = _COLON
+
+            elif self._state == _COLON:
+                if char != ":":
+                    raise ValueError(f"Expected ':' in the JSON response at {self._pos}")
+                self._pos += 1
+                self._state = _VALUE
+
+            else:
+                if char == "]" and top is not None and not top.is_object and top.key == 0:
+                    # An empty array.
+                    self._pos += 1
+                    self._close_container()
+                    continue
+
+                # The result items are the top level object, or the objects
+                # in the top level list.
+                depth = len(self._stack)
+                item_depth = 1 if depth and self._stack[0].is_object else 2
+                streamed = (
+                    depth == item_depth and top.is_object and top.key in self._containers
+                )
+                if char in "[{" and (depth < item_depth or streamed):
+                    self._stack.append(_Container(char == "{", streamed))
+                    self._pos += 1
+                    self._state = _KEY if char == "{" else _VALUE
+                    continue
+
+                if char in '[{"':
+                    end, state = _scan_value(buffer, self._pos, _SCAN_START)
+                    if end < 0:
+                        if not final:
+                            self._scan_state = state
+                        break
+                    value, end = self._decoder.raw_decode(buffer, self._pos)
+                else:
+                    value, end = self._decode(final)
+                    if end < 0:
+                        break
+                self._pos = end
+                self._state = _NEXT if self._stack else _END
+                if top is not None and top.streamed:
+                    yield self._stack[-2].key, top.key, value
+                elif top is not None and top.is_object:
+                    self.header[top.key] = value
+
+        if self._pos > COMPACT_SIZE:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
@@ -0,0 +1,391 @@
+"""
+This module defines a breadth first tree expansion engine on top of WTSession.
+
+getAncestors and getDescendants take one key and stop at the server's depth
+limit, so expanding a large tree one profile at a time costs a request per
+person. TreeExpander instead works a generation at a time: it gathers the
+whole frontier of the next generation, drops everyone already seen, and
+fetches the rest with chunked, parallel getPeople calls.
+
+    expander = TreeExpander(wt_session, Direction.ANCESTORS, max_depth=30,
+                            checkpoint_path="hamill.json")
+    stats = expander.expand(["Hamill-277"])
+
+Progress is saved to the checkpoint after every generation. Running the same
+code again, with the same checkpoint and keys, carries on from there rather
+than starting over; the keys only start a new checkpoint.
+"""
+
+# Standard Imports
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+import json
+import logging
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# Local imports
+from wt_graph import GRAPH_FIELDS, NO_NODE, FamilyGraph
+from wt_session import GET_PEOPLE_MAX_KEYS_WITH_RELATIVES, MAX_WORKERS_DEFAULT, WTSession
+
+LOGGER = logging.getLogger(__name__)
+
+# The default maximum number of profiles an expansion visits.
+MAX_NODES_DEFAULT = 100000
+
+# The fields every expansion needs, whatever else is asked for.
+REQUIRED_FIELDS = ("Id", "Name", "Father", "Mother")
+
+
+class Direction(Enum):
+    """An enumeration of the ways a tree can be expanded."""
+
+    ANCESTORS = "ancestors"
+    DESCENDANTS = "descendants"
+    NUCLEAR = "nuclear"
+
+
+@dataclass
+class ExpansionStats:
+    """The outcome of TreeExpander.expand."""
+
+    # Generations expanded, including the starting one.
+    levels: int = 0
+    # Profiles visited.
+    nodes: int = 0
+    # Profiles fetched from the API in this run.
+    fetched: int = 0
+    # Id -> number of times a visited profile was reached again (pedigree
+    # collapse, or the same person reached through two relatives).
+    collapses: Dict[int, int] = field(default_factory=dict)
+    # (parent Id, child Id) links that would make someone their own ancestor.
+    cycles: List[Tuple[int, int]] = field(default_factory=list)
+    # Whether max_nodes stopped the expansion.
+    truncated: bool = False
+
+
+# Called with the profiles of each generation and its number.
+PeopleCallback = Callable[[List[dict], int], None]
+
+
+def _with_required_fields(fields: str) -> str:
+    """Returns the fields with REQUIRED_FIELDS added."""
+    if fields.strip() == "*":
+        return fields
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    names.extend(name for name in REQUIRED_FIELDS if name not in names)
+    return ",".join(names)
+
+
+def _parent_ids(person: dict) -> Tuple[int, int]:
+    """Returns the father and mother Ids of a profile, 0 if not known."""
+    ids = []
+    for key in ("Father", "Mother"):
+        try:
+            ids.append(max(0, int(person.get(key) or 0)))
+        except (TypeError, ValueError):
+            ids.append(0)
+    return ids[0], ids[1]
+
+
+class TreeExpander:
+    """
+    Expands a tree from a set of starting profiles, one generation at a time,
+    following ancestors, descendants or nuclear relatives (parents, children,
+    siblings and spouses).
+
+    Every profile is visited once. Reaching a visited profile again is counted
+    as a collapse; if it would make someone their own ancestor it is recorded
+    as a cycle. Either way the profile is not expanded a second time, so bad
+    data cannot make the expansion loop.
+    """
+
+    def __init__(
+        self,
+        session: WTSession,
+        direction: Union[Direction, str] = Direction.ANCESTORS,
+        fields: str = GRAPH_FIELDS,
+        max_depth: Optional[int] = None,
+        max_nodes: int = MAX_NODES_DEFAULT,
+        checkpoint_path: Optional[str] = None,
+        max_workers: int = MAX_WORKERS_DEFAULT,
+    ) -> None:
+        """
+        :param session: The session used to query the API.
+        :param direction: Which relatives to follow.
+        :param fields: Comma separated list of fields to fetch for each profile.
+                       Id, Name, Father and Mother are always added.
+        :param max_depth: Number of generations to expand, or None for all.
+        :param max_nodes: Maximum number of profiles to visit.
+        :param checkpoint_path: Optional file to save progress to and resume from.
+        :param max_workers: Number of getPeople chunks fetched at the same time.
+        """
+        self._session = session
+        self._direction = Direction(direction)
+        self._fields = _with_required_fields(fields)
+        self._max_depth = max_depth
+        self._max_nodes = max_nodes
+        self._checkpoint_path = checkpoint_path
+        self._max_workers = max_workers
+
+        # Id -> generation, for every visited profile.
+        self._visited: Dict[int, int] = {}
+        # Id -> (father Id, mother Id), for every visited profile.
+        self._parents: Dict[int, Tuple[int, int]] = {}
+        # The Ids of the last generation visited, not yet expanded.
+        self._frontier: List[int] = []
+        self._level = 0
+        self._stats = ExpansionStats()
+        # The starting keys of the expansion saved in the checkpoint, if any.
+        self._start_keys: Optional[List[str]] = None
+
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self._load_checkpoint()
+
+    @property
+    def visited(self) -> Dict[int, int]:
+        """Return the generation of every visited profile, by Id."""
+        return self._visited
+
+    # --- Checkpoints ---
+
+    def _load_checkpoint(self) -> None:
+        """Restores the state saved by _save_checkpoint."""
+        with open(self._checkpoint_path, encoding="utf-8") as file:
+            state = json.load(file)
+        if state["direction"] != self._direction.value:
+            raise ValueError(
+                f"Checkpoint {self._checkpoint_path} is for {state['direction']}, "
+                f"not {self._direction.value}"
+            )
+        self._visited = {int(key): level for key, level in state["visited"].items()}
+        self._parents = {int(key): tuple(value) for key, value in state["parents"].items()}
+        self._frontier = state["frontier"]
+        self._level = state["level"]
+        self._start_keys = state.get("keys")
+        self._stats = ExpansionStats(
+            levels=state["level"] + 1,
+            nodes=len(self._visited),
+            collapses={int(key): count for key, count in state["collapses"].items()},
+            cycles=[tuple(cycle) for cycle in state["cycles"]],
+            truncated=state["truncated"],
+        )
+        LOGGER.info(
+            "Resuming from %s at generation %d, %d profiles visited.",
+            self._checkpoint_path,
+            self._level,
+            len(self._visited),
+        )
+
+    def _save_checkpoint(self) -> None:
+        """Saves the state after a generation, atomically."""
+        if self._checkpoint_path is None:
+            return
+        state = {
+            "direction": self._direction.value,
+            "keys": self._start_keys,
+            "level": self._level,
+            "frontier": self._frontier,
+            "visited": self._visited,
+            "parents": self._parents,
+            "collapses": self._stats.collapses,
+            "cycles": self._stats.cycles,
+            "truncated": self._stats.truncated,
+        }
+        temporary_path = self._checkpoint_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, separators=(",", ":"))
+        os.replace(temporary_path, self._checkpoint_path)
+
+    # --- Fetching ---
+
+    def _fetch(self, ids: List[Union[str, int]], graph: Optional[FamilyGraph]) -> Dict[str, dict]:
+        """
+        Returns the profiles of the Ids, by Id. Profiles already loaded in
+        the graph are taken from it rather than fetched.
+        """
+        people = {}
+        wanted = []
+        for person_id in ids:
+            node = graph.index_of(person_id) if graph is not None else NO_NODE
+            if node != NO_NODE and graph.is_loaded(node):
+                people[str(graph.id(node))] = graph.person(node)
+            else:
+                wanted.append(person_id)
+
+        if wanted:
+            result = self._session.get_people(
+                wanted, fields=self._fields, max_workers=self._max_workers
+            )
+            if result[0]["status"]:
+                LOGGER.error("getPeople failed: %s", result[0]["status"])
+            people.update(result[0]["people"])
+            self._stats.fetched += len(result[0]["people"])
+        return people
+
+    def _fetch_relatives(self, ids: List[int]) -> Dict[str, dict]:
+        """
+        Returns the profiles of the Ids and of their children (descendants) or
+        nuclear relatives, by Id, using getPeople in chunks of 100, in parallel.
+        """
+        relation = {self._direction.value: 1}
+        chunks = [
+            ids[index:index + GET_PEOPLE_MAX_KEYS_WITH_RELATIVES]
+            for index in range(0, len(ids), GET_PEOPLE_MAX_KEYS_WITH_RELATIVES)
+        ]
+
+        def fetch_chunk(chunk: List[int]) -> List[dict]:
+            # iter_people follows the pagination, should a chunk have more
+            # than a page of relatives.
+            return list(
+                self._session.iter_people(chunk, fields=self._fields, prefetch_pages=1, **relation)
+            )
+
+        people = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self._max_workers, len(chunks)))) as executor:
+            for chunk_people in executor.map(fetch_chunk, chunks):
+                for person in chunk_people:
+                    people[str(person["Id"])] = person
+        self._stats.fetched += len(people)
+        return people
+
+    # --- Expanding ---
+
+    def _is_ancestor(self, candidate: int, person_id: int) -> bool:
+        """Returns whether candidate is a known ancestor of person_id."""
+        seen = set()
+        stack = [person_id]
+        while stack:
+            current = stack.pop()
+            for parent in self._parents.get(current, (0, 0)):
+                if parent == candidate:
+                    return True
+                if parent and parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+        return False
+
+    def _revisit(self, person_id: int, parent: int = 0, child: int = 0) -> None:
+        """Records reaching a visited profile again, through a parent/child link."""
+        self._stats.collapses[person_id] = self._stats.collapses.get(person_id, 0) + 1
+        if parent and child and self._is_ancestor(child, parent):
+            LOGGER.warning("Cycle: %d would be an ancestor of itself via %d", child, parent)
+            self._stats.cycles.append((parent, child))
+
+    def _visit(self, people: Dict[str, dict], graph: Optional[FamilyGraph], on_people) -> List[int]:
+        """
+        Marks the new profiles as visited at the current generation, up to
+        max_nodes, hands them over and returns their Ids.
+        """
+        new_people = []
+        for person in people.values():
+            person_id = int(person["Id"])
+            if person_id in self._visited:
+                continue
+            if len(self._visited) >= self._max_nodes:
+                self._stats.truncated = True
+                break
+            self._visited[person_id] = self._level
+            self._parents[person_id] = _parent_ids(person)
+            new_people.append(person)
+
+        if graph is not None:
+            graph.ingest(new_people)
+        if on_people is not None and new_people:
+            on_people(new_people, self._level)
+
+        return [int(person["Id"]) for person in new_people]
+
+    def _next_generation(self, graph: Optional[FamilyGraph]) -> Dict[str, dict]:
+        """Returns the unvisited profiles one generation on from the frontier."""
+        if self._direction == Direction.ANCESTORS:
+            wanted = []
+            for child in self._frontier:
+                for parent in self._parents.get(child, (0, 0)):
+                    if not parent:
+                        continue
+                    if parent in self._visited:
+                        self._revisit(parent, parent=parent, child=child)
+                    elif parent not in wanted:
+                        wanted.append(parent)
+            return self._fetch(wanted, graph)
+
+        people = self._fetch_relatives(self._frontier)
+        frontier = set(self._frontier)
+        new_people = {}
+        for person_id, person in people.items():
+            person_id = int(person_id)
+            if person_id in frontier:
+                continue
+            if person_id in self._visited:
+                if self._direction == Direction.DESCENDANTS:
+                    father, mother = _parent_ids(person)
+                    parent = father if father in frontier else mother
+                    self._revisit(person_id, parent=parent, child=person_id)
+                else:
+                    self._revisit(person_id)
+                continue
+            new_people[str(person_id)] = person
+        return new_people
+
+    def expand(
+        self,
+        keys: Optional[Iterable[Union[str, int]]] = None,
+        graph: Optional[FamilyGraph] = None,
+        on_people: Optional[PeopleCallback] = None,
+    ) -> ExpansionStats:
+        """
+        Expands the tree from the starting keys, or from where the checkpoint
+        left off. Returns the statistics of the expansion.
+
+        With a checkpoint, the keys may be given again on every run: the
+        first run starts from them and later ones carry on from the
+        checkpoint. Keys other than those the checkpoint was started with
+        raise ValueError.
+
+        :param keys: Starting WikiTree_IDs or User_IDs, or None to resume.
+        :param graph: Optional FamilyGraph the profiles are added to. Profiles
+                      already loaded in it are not fetched again.
+        :param on_people: Optional function called with the new profiles of
+                          each generation and the generation number.
+        """
+        if keys is not None:
+            keys = list(keys)
+            if self._checkpoint_path is not None and self._visited:
+                # Resume rather than start again over the visited profiles.
+                if self._start_keys is not None and sorted(map(str, keys)) != sorted(
+                    self._start_keys
+                ):
+                    raise ValueError(
+                        f"Checkpoint {self._checkpoint_path} was started from "
+                        f"{self._start_keys}, not {keys}"
+                    )
+                keys = None
+            elif self._checkpoint_path is not None:
+                self._start_keys = [str(key) for key in keys]
+
+        if keys is not None:
+            self._level = 0
+            self._frontier = self._visit(self._fetch(keys, graph), graph, on_people)
+            self._stats.levels = 1
+            self._save_checkpoint()
+
+        while self._frontier and not self._stats.truncated:
+            if self._max_depth is not None and self._level >= self._max_depth:
+                break
+            people = self._next_generation(graph)
+            self._level += 1
+            self._frontier = self._visit(people, graph, on_people)
+            if self._frontier:
+                self._stats.levels = self._level + 1
+            self._save_checkpoint()
+            LOGGER.debug(
+                "Generation %d: %d new profiles, %d visited.",
+                self._level,
+                len(self._frontier),
+                len(self._visited),
+            )
+
+        self._stats.nodes = len(self._visited)
+        return self._stats